@@ -1,40 +1,71 @@
 import json
-from openai import OpenAI
-from tools import discover_tools
+import time
+import contextvars
+from openai import DEFAULT_MAX_RETRIES
+from concurrent.futures import ThreadPoolExecutor
+from tools import tool_registry
 from config_utils import load_config
+from client_pool import client_pool
+from model_factory import ModelFactory, tool_calls_until_completion, get_tool_concurrency
+from streaming import StreamAccumulator, call_metrics, notify_call_observers
+from context_compaction import ContextCompactor, format_compaction
+from usage_stats import record_compaction, timed_tool_call
 
 class OpenRouterAgent:
-    def __init__(self, config_path="config.yaml", silent=False):
+    def __init__(self, config_path="config.yaml", silent=False, stream=None, on_delta=None):
         # Load configuration
         self.config = load_config(config_path)
         
         # Silent mode for orchestrator (suppresses debug output)
         self.silent = silent
         
-        # Initialize OpenAI client with OpenRouter
-        self.client = OpenAI(
-            base_url=self.config['openrouter']['base_url'],
-            api_key=self.config['openrouter']['api_key']
-        )
+        # Token streaming: on_delta receives content as it is generated
+        self.stream = stream if stream is not None else bool(self.config.get('agent', {}).get('stream', False))
+        self.on_delta = on_delta
         
-        # Discover tools dynamically
-        self.discovered_tools = discover_tools(self.config, silent=self.silent)
+        # Shared OpenRouter client (pooled keep-alive connections); this agent
+        # does not go through resilience.py, so it keeps the SDK's own retries
+        self.client = client_pool.get_client(self.config).with_options(max_retries=DEFAULT_MAX_RETRIES)
         
-        # Build OpenRouter tools array
-        self.tools = [tool.to_openrouter_schema() for tool in self.discovered_tools.values()]
+        # Shared tools with pre-built OpenRouter schemas (discovered once per process)
+        toolset = tool_registry.toolset(self.config, silent=self.silent)
+        self.discovered_tools = toolset.tools
+        self.tools = toolset.schemas
+        self.tool_mapping = toolset.mapping
         
-        # Build tool mapping
-        self.tool_mapping = {name: tool.execute for name, tool in self.discovered_tools.items()}
+        # Keeps the growing history under a budget derived from the model's context window
+        model_name = self.config['openrouter']['model']
+        context_window = next((model['context_window'] for model in ModelFactory.MODEL_CONFIGS.values()
+                               if model['model_name'] == model_name), 128000)
+        self.compactor = ContextCompactor(context_window, self.config.get('agent', {}).get('compaction'))
     
     
     def call_llm(self, messages):
         """Make OpenRouter API call with tools"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.config['openrouter']['model'],
-                messages=messages,
-                tools=self.tools
-            )
+            model = self.config['openrouter']['model']
+            started = time.perf_counter()
+            if self.stream:
+                accumulator = StreamAccumulator(self.on_delta, started)
+                for chunk in self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=list(self.tools),
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ):
+                    accumulator.add(chunk)
+                response = accumulator.build()
+                metrics = call_metrics(model, response, started, accumulator.ttft, streamed=True)
+            else:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    tools=list(self.tools)
+                )
+                metrics = call_metrics(model, response, started, None, streamed=False)
+            metrics["cost"] = ModelFactory.estimate_cost(metrics)
+            notify_call_observers(metrics)
             return response
         except Exception as e:
             raise Exception(f"LLM call failed: {str(e)}")
@@ -48,7 +79,8 @@ class OpenRouterAgent:
             
             # Call appropriate tool from tool_mapping
             if tool_name in self.tool_mapping:
-                tool_result = self.tool_mapping[tool_name](**tool_args)
+                with timed_tool_call(tool_name):
+                    tool_result = self.tool_mapping[tool_name](**tool_args)
             else:
                 tool_result = {"error": f"Unknown tool: {tool_name}"}
             
@@ -68,6 +100,18 @@ class OpenRouterAgent:
                 "content": json.dumps({"error": f"Tool execution failed: {str(e)}"})
             }
     
+    def handle_tool_calls(self, tool_calls):
+        """Run one turn's tool calls concurrently; results keep the original order"""
+        if len(tool_calls) == 1:
+            return [self.handle_tool_call(tool_calls[0])]
+        
+        max_workers = min(len(tool_calls), get_tool_concurrency(self.config))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Each worker runs in a copy of our context so tool timings reach the run ledger
+            futures = [executor.submit(contextvars.copy_context().run, self.handle_tool_call, tool_call)
+                       for tool_call in tool_calls]
+            return [future.result() for future in futures]
+    
     def run(self, user_input: str):
         """Run the agent with user input and return FULL conversation content"""
         # Initialize messages with system prompt and user input
@@ -94,6 +138,13 @@ class OpenRouterAgent:
             if not self.silent:
                 print(f"🔄 Agent iteration {iteration}/{max_iterations}")
             
+            # Shrink old tool results and turns once the history nears its token budget
+            messages, compaction = self.compactor.compact(messages)
+            if compaction is not None:
+                record_compaction(compaction)
+                if not self.silent:
+                    print(f"🗜️  Context compacted: {format_compaction(compaction)}")
+            
             # Call LLM
             response = self.call_llm(messages)
             
@@ -113,24 +164,18 @@ class OpenRouterAgent:
             if assistant_message.tool_calls:
                 if not self.silent:
                     print(f"🔧 Agent making {len(assistant_message.tool_calls)} tool call(s)")
-                # Handle each tool call
-                task_completed = False
-                for tool_call in assistant_message.tool_calls:
-                    if not self.silent:
+                # Handle this turn's tool calls concurrently
+                tool_calls = tool_calls_until_completion(assistant_message.tool_calls)
+                if not self.silent:
+                    for tool_call in tool_calls:
                         print(f"   📞 Calling tool: {tool_call.function.name}")
-                    tool_result = self.handle_tool_call(tool_call)
-                    messages.append(tool_result)
-                    
-                    # Check if this was the task completion tool
-                    if tool_call.function.name == "mark_task_complete":
-                        task_completed = True
-                        if not self.silent:
-                            print("✅ Task completion tool called - exiting loop")
-                        # Return FULL conversation content, not just completion message
-                        return "\n\n".join(full_response_content)
+                messages.extend(self.handle_tool_calls(tool_calls))
                 
-                # If task was completed, we already returned above
-                if task_completed:
+                # Check if the task completion tool was called
+                if tool_calls[-1].function.name == "mark_task_complete":
+                    if not self.silent:
+                        print("✅ Task completion tool called - exiting loop")
+                    # Return FULL conversation content, not just completion message
                     return "\n\n".join(full_response_content)
             else:
                 if not self.silent:
@@ -0,0 +1,210 @@
+"""
+Shared asyncio runtime for the async agent engine
+
+The sync APIs (ModelAwareAgent.run, TaskOrchestrator.orchestrate, ...) are thin
+wrappers that submit their coroutine to one long-lived event loop running on a
+background thread. Keeping a single loop per process lets async HTTP clients
+and their connection pools be reused between calls instead of being bound to
+a loop that asyncio.run() would tear down after every call.
+
+Deadlines: run_with_deadline() bounds a coroutine (an agent, a whole run)
+and records its deadline in a context variable, so everything it calls -
+including tools in worker threads - can size its own timeouts from
+time_left() and give up with it instead of outliving the run.
+
+Blocking work (tools, file writes, process pool waits) runs in the loop's
+default executor, a thread pool of DEFAULT_THREADS threads. A run reserves
+extra threads for its agents' tool calls with reserve_threads(), so one
+run's searches waiting on fetch deadlines cannot starve the rest.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, Optional
+from tracing import in_worker
+
+# Seconds a cancelled run_sync() call (Ctrl-C) gets to unwind before the exception propagates
+CANCEL_GRACE = 5.0
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+_deadline: contextvars.ContextVar = contextvars.ContextVar('deadline', default=None)
+
+# Threads for blocking work when no run has reserved more
+DEFAULT_THREADS = 32
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_size = 0
+_reserved_threads = 0
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when work would run past the current deadline"""
+    pass
+
+
+def time_left(default: Optional[float] = None) -> Optional[float]:
+    """Seconds until the innermost deadline (never negative), or default when there is none"""
+    expires = _deadline.get()
+    if expires is None:
+        return default
+    remaining = max(0.0, expires - time.monotonic())
+    return remaining if default is None else min(remaining, default)
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current deadline has passed"""
+    expires = _deadline.get()
+    if expires is not None and time.monotonic() >= expires:
+        raise DeadlineExceeded("deadline exceeded")
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Set a deadline `seconds` from now for the block (an enclosing earlier deadline still wins)"""
+    if seconds is None:
+        yield
+        return
+    current = _deadline.get()
+    value = time.monotonic() + seconds
+    token = _deadline.set(value if current is None else min(current, value))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+async def run_with_deadline(coro: Awaitable[Any], seconds: Optional[float]) -> Any:
+    """
+    Await coro, cancelling it once `seconds` (or an enclosing deadline) runs out
+
+    Raises:
+        asyncio.TimeoutError: The deadline passed; coro has been cancelled
+    """
+    with deadline(seconds):
+        # wait_for's task copies this context, so coro sees the deadline
+        return await asyncio.wait_for(coro, timeout=time_left())
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared runtime loop, starting its thread on first use"""
+    global _loop, _loop_thread, _executor, _executor_size
+
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=run_loop, name="superheavy-async-runtime", daemon=True)
+            thread.start()
+            started.wait()
+
+            _loop = loop
+            _loop_thread = thread
+            _executor, _executor_size = None, 0
+            _resize_executor()
+
+    return _loop
+
+
+def _resize_executor():
+    """Install a default executor sized for DEFAULT_THREADS plus the reserved threads (call with _loop_lock held)"""
+    global _executor, _executor_size
+    size = DEFAULT_THREADS + _reserved_threads
+    if _loop is None or size <= _executor_size:
+        return
+    previous = _executor
+    _executor, _executor_size = ThreadPoolExecutor(max_workers=size, thread_name_prefix="superheavy-worker"), size
+    _loop.set_default_executor(_executor)
+    if previous is not None:
+        # Calls already queued there still run; its threads exit once it is drained
+        previous.shutdown(wait=False)
+
+
+@contextmanager
+def reserve_threads(count: int) -> Iterator[None]:
+    """
+    Grow the runtime's thread pool by `count` threads while the block runs
+
+    The pool never shrinks (idle threads cost little), it only grows when
+    concurrent runs together reserve more than it has.
+    """
+    global _reserved_threads
+    get_loop()
+    with _loop_lock:
+        _reserved_threads += count
+        _resize_executor()
+    try:
+        yield
+    finally:
+        with _loop_lock:
+            _reserved_threads -= count
+
+
+def in_runtime_thread() -> bool:
+    """True when called from the runtime loop's own thread"""
+    return _loop_thread is not None and threading.current_thread() is _loop_thread
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """
+    Run a coroutine on the shared runtime loop and block until it finishes
+
+    The caller's contextvars are carried over to the task, so per-run context
+    set in the calling thread is visible to the coroutine. If the wait is
+    interrupted (Ctrl-C), the coroutine is cancelled too - cancelling its
+    in-flight requests - and given CANCEL_GRACE seconds to clean up.
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+
+    Raises:
+        RuntimeError: If called from inside the runtime loop (would deadlock)
+    """
+    if in_runtime_thread():
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the async runtime thread; await the coroutine instead")
+
+    loop = get_loop()
+    context = contextvars.copy_context()
+
+    # Tasks snapshot the current context when created, so create it inside ours
+    finished = threading.Event()
+    future = asyncio.run_coroutine_threadsafe(_in_context(context, coro, finished), loop)
+    try:
+        return future.result()
+    except BaseException:
+        if not future.done():
+            future.cancel()
+            finished.wait(CANCEL_GRACE)
+        raise
+
+
+async def _in_context(context: contextvars.Context, coro: Awaitable[Any], finished: threading.Event) -> Any:
+    """Await coro inside a task created from the given context"""
+    try:
+        return await context.run(asyncio.ensure_future, coro)
+    finally:
+        finished.set()
+
+
+async def to_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable in the runtime's thread pool (asyncio.to_thread for 3.8)"""
+    loop = asyncio.get_running_loop()
+    # Runs in a copy of our context; time spent waiting for a worker is traced as queue time
+    call = functools.partial(in_worker(func, "thread pool queue"), *args, **kwargs)
+    return await loop.run_in_executor(None, call)
@@ -0,0 +1,245 @@
+"""
+Batch mode: run a JSONL file of queries through the orchestrator
+
+    python batch.py queries.jsonl --output results.jsonl --concurrency 4
+
+Each input line is {"id": "...", "query": "..."} or just a JSON string (its
+id is then derived from the text). Queries run concurrently on the shared
+async runtime with one TaskOrchestrator each, so they share one client pool
+and one LLM call scheduler: openrouter.scheduler's concurrency and token
+limits are the budget for the whole batch, not per query.
+
+Every finished query is appended to the output JSONL with its answer and
+metrics as soon as it is done. On restart, queries already recorded there
+as successful are skipped; failed ones run again.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set
+from async_runtime import run_sync, to_thread
+from client_pool import warm_up
+from config_utils import check_required_env_vars, load_config, merge_config
+from orchestrator import TaskOrchestrator, format_agent_inclusion
+from usage_stats import format_usage
+
+
+def query_id(query: str) -> str:
+    """Stable id for a query given without one"""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()[:12]
+
+
+def load_queries(path: str) -> List[Dict[str, str]]:
+    """Read {"id", "query"} entries from a JSONL file (duplicate ids are skipped)"""
+    queries, seen = [], set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"query": entry}
+            if not isinstance(entry, dict) or not str(entry.get('query') or '').strip():
+                raise ValueError(f"{path}:{number}: expected a JSON string or an object with a 'query'")
+            query = entry['query'].strip()
+            qid = str(entry.get('id') or query_id(query))
+            if qid in seen:
+                print(f"⚠️  {path}:{number}: duplicate id {qid}, skipped")
+                continue
+            seen.add(qid)
+            queries.append({"id": qid, "query": query})
+    return queries
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids recorded as successful in an existing output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; that query runs again
+                continue
+            if record.get('status') == 'success':
+                done.add(record['id'])
+    return done
+
+
+def remaining_queries(queries: List[Dict[str, str]], output_path: str) -> List[Dict[str, str]]:
+    """The queries not yet recorded as successful in output_path (what a resumed run still has to do)"""
+    done = completed_ids(output_path)
+    return [entry for entry in queries if entry['id'] not in done]
+
+
+class BatchRunner:
+    """Runs queries `concurrency` at a time and appends one result record per query"""
+
+    def __init__(self, output_path: str, concurrency: int = 4, config_path: str = "config.yaml",
+                 agent_model: Optional[str] = None, config_overrides: Optional[Dict[str, Any]] = None):
+        self.output_path = output_path
+        self.concurrency = max(1, concurrency)
+        self.config_path = config_path
+        self.agent_model = agent_model
+        self.config_overrides = config_overrides or {}
+        self.total = 0
+        self.finished = 0
+        self.failed = 0
+        self.started: Optional[float] = None
+
+    def run(self, queries: List[Dict[str, str]]) -> Dict[str, Any]:
+        return run_sync(self.run_async(queries))
+
+    async def run_async(self, queries: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Run the queries and return batch totals (finished, failed, queries per hour)"""
+        self.total, self.finished, self.failed = len(queries), 0, 0
+        self.started = time.monotonic()
+        await to_thread(self._end_partial_line)
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for entry in queries:
+            pending.put_nowait(entry)
+
+        async def worker():
+            while not pending.empty():
+                entry = pending.get_nowait()
+                record = await self.run_query(entry)
+                await to_thread(self._append, record)
+                self._report(record)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(queries)))))
+        return self.totals()
+
+    async def run_query(self, entry: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Run one query through a fresh orchestrator; errors become a failed
+        record, and so do runs where every agent failed or the synthesis fell
+        back to concatenating responses (they run again on resume)
+        """
+        orchestrator = TaskOrchestrator(self.config_path, silent=True, agent_model=self.agent_model,
+                                        config_overrides=self.config_overrides)
+        record = {"id": entry['id'], "query": entry['query'], "started_at": time.time()}
+        started = time.monotonic()
+        try:
+            answer = await orchestrator.orchestrate_async(entry['query'])
+            if not any(agent['status'] in ("success", "partial") for agent in orchestrator.last_agents):
+                record.update(status="error", error="no agent produced a result", answer=answer)
+            elif orchestrator.last_synthesis_failed:
+                record.update(status="error", error="synthesis failed; answer is the agents' responses concatenated",
+                              answer=answer)
+            else:
+                record.update(status="success", answer=answer)
+        except Exception as e:
+            record.update(status="error", error=str(e) or type(e).__name__)
+        record.update(
+            wall_time=round(time.monotonic() - started, 2),
+            output_path=orchestrator.last_output_path,
+            agents=orchestrator.last_agents,
+            usage=orchestrator.last_usage,
+        )
+        return record
+
+    def _end_partial_line(self):
+        # A line cut short by a crash must not swallow the first new record
+        if not os.path.exists(self.output_path) or not os.path.getsize(self.output_path):
+            return
+        with open(self.output_path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    def _append(self, record: Dict[str, Any]):
+        # One line per query, flushed so a crash loses at most the queries still running
+        with open(self.output_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _report(self, record: Dict[str, Any]):
+        self.finished += 1
+        if record['status'] != "success":
+            self.failed += 1
+            print(f"❌ [{self.finished}/{self.total}] {record['id']} failed after {record['wall_time']:.1f}s: {record['error']}")
+            return
+        details = [f"{record['wall_time']:.1f}s"]
+        if record['agents']:
+            details.append(format_agent_inclusion(record['agents']))
+        if record['usage']:
+            details.append(format_usage(record['usage']))
+        print(f"✅ [{self.finished}/{self.total}] {record['id']} • {' • '.join(details)} • {self.totals()['queries_per_hour']:.1f} queries/h")
+
+    def totals(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        return {
+            "finished": self.finished,
+            "failed": self.failed,
+            "elapsed": round(elapsed, 1),
+            "queries_per_hour": (self.finished - self.failed) * 3600 / elapsed if elapsed else 0.0,
+        }
+
+
+def main():
+    """Main entry point for batch runs"""
+    parser = argparse.ArgumentParser(description='Run a JSONL file of queries through the orchestrator')
+    parser.add_argument('queries', help='JSONL file: one {"id": ..., "query": ...} object or JSON string per line')
+    parser.add_argument('--output', help='Results JSONL, appended to and used to resume (default: <queries>.results.jsonl)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Queries run at the same time (LLM calls are still limited by openrouter.scheduler)')
+    parser.add_argument('--agent-model',
+                        choices=['grok-4', 'kimi-k2', 'o3', 'claude-sonnet-4'],
+                        help='Model to use for agents')
+    parser.add_argument('--no-save', action='store_true',
+                        help='Do not also write each answer to a markdown file')
+    parser.add_argument('--output-dir', default='outputs',
+                        help='Directory for the markdown files (default: outputs)')
+
+    args = parser.parse_args()
+
+    # Check required environment variables
+    if not check_required_env_vars():
+        return 1
+
+    output_path = args.output or os.path.splitext(args.queries)[0] + '.results.jsonl'
+    try:
+        queries = load_queries(args.queries)
+    except (OSError, ValueError) as e:
+        print(f"Error reading queries: {e}")
+        return 1
+
+    remaining = remaining_queries(queries, output_path)
+    print(f"{len(queries)} queries • {len(queries) - len(remaining)} already done • {len(remaining)} to run "
+          f"({args.concurrency} at a time) → {output_path}")
+    if not remaining:
+        return 0
+
+    if args.no_save:
+        overrides = {'output': {'auto_save': False}}
+    else:
+        overrides = {'output': {'auto_save': True, 'directory': args.output_dir}}
+
+    # Open API connections before the first queries start
+    warm_up(merge_config(load_config("config.yaml"), overrides))
+
+    runner = BatchRunner(output_path, concurrency=args.concurrency, agent_model=args.agent_model,
+                         config_overrides=overrides)
+    try:
+        totals = runner.run(remaining)
+    except KeyboardInterrupt:
+        totals = runner.totals()
+        print("\n\nInterrupted; rerun the same command to continue where it stopped.")
+
+    print(f"\nFinished {totals['finished']} queries ({totals['failed']} failed) in {totals['elapsed']:.0f}s • "
+          f"{totals['queries_per_hour']:.1f} queries/h")
+    return 1 if totals['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
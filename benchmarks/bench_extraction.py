@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmark: search_web page extraction, full BeautifulSoup parse vs streaming
+
+Compares the original path (decode the whole body, build a BeautifulSoup
+tree, get_text() the page, keep 1000 chars) with the streaming extractor
+used by SearchTool (16 KB chunks, byte cap, early stop).
+
+With --threads N, it also extracts script-heavy pages (which the
+streaming parser cannot stop early on) from N threads at once, first on the
+threads themselves and then through the shared process pool, and reports
+wall time, how late a 1 ms ticker thread wakes up (GIL contention felt by
+everything else in the process) and pool utilization.
+
+The legacy comparison needs beautifulsoup4 (pip install beautifulsoup4),
+which the project itself no longer uses.
+
+Usage:
+    python benchmarks/bench_extraction.py --corpus saved_pages/
+    python benchmarks/bench_extraction.py            # synthetic corpus
+    python benchmarks/bench_extraction.py --threads 16
+
+The corpus is a directory of saved pages (*.html / *.htm). Without one, a
+synthetic corpus of small, medium and multi-megabyte pages is generated.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+try:
+    from bs4 import BeautifulSoup  # Only for the legacy comparison; no longer a dependency
+except ImportError:
+    BeautifulSoup = None
+from tools.html_extract import extract_text, extract_text_from_buffer
+from process_pool import ProcessPool
+
+CHUNK_SIZE = 16384
+
+
+def legacy_extract(body: bytes, limit: int) -> str:
+    """The pre-streaming SearchTool extraction path"""
+    soup = BeautifulSoup(body.decode('utf-8', errors='replace'), 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = ' '.join(soup.get_text().split())
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def streaming_extract(body: bytes, limit: int, max_bytes: int) -> str:
+    """The streaming path, fed in network-sized chunks"""
+    chunks = (body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+    return extract_text(chunks, limit=limit, max_bytes=max_bytes)
+
+
+def synthetic_corpus():
+    """Pages shaped like typical search results: boilerplate-heavy, some very large"""
+    paragraph = "<p>" + "The quick brown fox jumps over the lazy dog. " * 8 + "</p>\n"
+    script = "<script>var data = {" + ", ".join(f'"k{i}": {i}' for i in range(200)) + "};</script>\n"
+    nav = "<nav>" + "".join(f'<a href="/section/{i}">Section {i}</a>' for i in range(150)) + "</nav>\n"
+    pages = {}
+    for name, paragraphs in (("small", 10), ("medium", 200), ("large", 5000), ("huge", 25000)):
+        body = f"<html><head><title>{name}</title><style>body{{margin:0}}</style>{script * 5}</head><body>{nav}"
+        body += paragraph * paragraphs + "</body></html>"
+        pages[f"{name}.html"] = body.encode('utf-8')
+    return pages
+
+
+def script_heavy_page(size: int) -> bytes:
+    """An app-shell page: megabytes of inline script before a little text"""
+    script = "<script>" + "window.__STATE__.push({id: 1, name: 'item', tags: ['a', 'b']});" * 200 + "</script>\n"
+    body = "<html><head>" + script * max(1, size // len(script)) + "</head><body><p>"
+    body += "Actual article text. " * 60 + "</p></body></html>"
+    return body.encode('utf-8')
+
+
+def ticker_lateness(stop: threading.Event, samples: list):
+    """Sleep 1 ms at a time and record how late each wake-up is"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(0.001)
+        samples.append(time.perf_counter() - start - 0.001)
+
+
+def concurrent_run(pages, threads: int, extract):
+    """Extract all pages from `threads` threads; returns (wall seconds, ticker p50, p99 lateness)"""
+    stop, samples = threading.Event(), []
+    ticker = threading.Thread(target=ticker_lateness, args=(stop, samples), daemon=True)
+    ticker.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(extract, pages))
+    wall = time.perf_counter() - start
+    stop.set()
+    ticker.join()
+    samples.sort()
+    return wall, samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def concurrency_benchmark(threads: int, limit: int, max_bytes: int):
+    pages = [script_heavy_page(max_bytes) for _ in range(threads * 4)]
+    pool = ProcessPool({"process_pool": {"workers": 0, "max_pending": threads}})
+    pool.run(len, b"warm up")
+
+    inline = concurrent_run(pages, threads, lambda body: streaming_extract(body, limit, max_bytes))
+    pooled = concurrent_run(pages, threads, lambda body: pool.run(extract_text_from_buffer, body, limit))
+
+    print()
+    print(f"{len(pages)} script-heavy pages of {len(pages[0]):,} bytes from {threads} threads "
+          f"({pool.workers} pool workers)")
+    print(f"{'mode':<14} {'wall s':>8} {'ticker p50 ms':>14} {'ticker p99 ms':>14}")
+    for name, (wall, p50, p99) in (("threads", inline), ("process pool", pooled)):
+        print(f"{name:<14} {wall:>8.2f} {p50 * 1000:>14.2f} {p99 * 1000:>14.2f}")
+    stats = pool.stats()
+    print(f"pool: {stats['calls']} calls • utilization {stats['utilization']:.0%} since start • "
+          f"mean queue {stats['mean_queue_ms']:.1f} ms • max queue {stats['max_queue_ms']:.1f} ms")
+
+
+def load_corpus(directory: str):
+    pages = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(('.html', '.htm')):
+            with open(os.path.join(directory, filename), 'rb') as f:
+                pages[filename] = f.read()
+    return pages
+
+
+def measure(func, repeat: int):
+    """Return (median seconds, peak traced bytes, result)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark search_web text extraction')
+    parser.add_argument('--corpus', help='Directory of saved .html pages (default: synthetic corpus)')
+    parser.add_argument('--limit', type=int, default=1000, help='Characters of text kept per page')
+    parser.add_argument('--max-bytes', type=int, default=2 * 1024 * 1024, help='Streaming byte cap')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per page (median reported)')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='Also compare concurrent extraction on threads vs the process pool')
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not pages:
+        print("No .html pages found in corpus")
+        return 1
+
+    if BeautifulSoup is None:
+        print("beautifulsoup4 is not installed; skipping the legacy comparison (pip install beautifulsoup4)")
+        if args.threads:
+            concurrency_benchmark(args.threads, args.limit, args.max_bytes)
+        return 0
+
+    print(f"{'page':<32} {'size':>10} {'legacy ms':>10} {'stream ms':>10} {'speedup':>8} "
+          f"{'legacy peak':>12} {'stream peak':>12} {'same text':>9}")
+
+    totals = {"legacy": 0.0, "stream": 0.0}
+    matches = 0
+    for name, body in pages.items():
+        legacy_time, legacy_peak, legacy_text = measure(lambda: legacy_extract(body, args.limit), args.repeat)
+        stream_time, stream_peak, stream_text = measure(
+            lambda: streaming_extract(body, args.limit, args.max_bytes), args.repeat)
+        totals["legacy"] += legacy_time
+        totals["stream"] += stream_time
+        same = legacy_text == stream_text
+        matches += same
+
+        print(f"{name[:32]:<32} {len(body):>10,} {legacy_time * 1000:>10.2f} {stream_time * 1000:>10.2f} "
+              f"{legacy_time / stream_time if stream_time else float('inf'):>7.1f}x "
+              f"{legacy_peak:>12,} {stream_peak:>12,} {'yes' if same else 'no':>9}")
+
+    print()
+    print(f"Total: legacy {totals['legacy'] * 1000:.1f} ms, streaming {totals['stream'] * 1000:.1f} ms "
+          f"({totals['legacy'] / totals['stream'] if totals['stream'] else float('inf'):.1f}x); "
+          f"identical snippets on {matches}/{len(pages)} pages")
+
+    if args.threads:
+        concurrency_benchmark(args.threads, args.limit, args.max_bytes)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
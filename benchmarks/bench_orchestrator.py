@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end orchestrator and agent runs against a mock OpenRouter
+
+Starts benchmarks/mock_openrouter.py in a subprocess (so the server does not
+share the benchmark's GIL), then:
+
+    1. runs ModelAwareAgent.run on a single task --agent-runs times
+    2. sweeps orchestrator.parallel_agents (default 1..64) and runs
+       TaskOrchestrator.orchestrate --repeat times at each point
+
+For every point it reports wall time, p50/p95/p99 of each phase (decompose,
+agent, agent iteration, LLM call, tool call, synthesis) taken from tracing
+spans, LLM calls made by the code, HTTP requests seen by the server
+(including retried 429/5xx) and peak traced memory.
+
+Usage:
+    python benchmarks/bench_orchestrator.py
+    python benchmarks/bench_orchestrator.py --agents 1,4,16 --repeat 5 --ttft fixed:0.2 --seed 1
+    python benchmarks/bench_orchestrator.py --json after.json --baseline before.json
+    python benchmarks/bench_orchestrator.py --agents 32 --max-concurrent 8 [--no-scheduler]
+
+Use --seed for reproducible latencies, and --baseline to compare against a
+--json file written before a change.
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mock_openrouter import add_mock_arguments, mock_settings
+
+PHASES = ("decompose", "agent", "iteration", "llm", "tool", "synthesis")
+QUERY = "Compare the main approaches to scaling LLM inference"
+AGENT_TASK = "Estimate the throughput of a four-GPU inference server"
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no samples)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def distribution(values: List[float]) -> Dict[str, Any]:
+    return {"n": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+
+
+def phase_of(span) -> Optional[str]:
+    """Benchmark phase of a span, by its name and attributes"""
+    if span.attributes.get('agent') is not None:
+        return "agent"
+    if span.attributes.get('iteration') is not None:
+        return "iteration"
+    if span.name.startswith("llm "):
+        return "llm"
+    if span.name.startswith("tool "):
+        return "tool"
+    if span.name in ("decompose", "synthesis"):
+        return span.name
+    return None
+
+
+def start_mock(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    """Launch the mock server on a free port; returns (process, base_url)"""
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_openrouter.py'),
+               '--port', '0']
+    for key, value in mock_settings(args).items():
+        if value is not None:
+            command += [f"--{key.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().strip()
+    if not base_url:
+        process.kill()
+        raise RuntimeError("mock server failed to start")
+    return process, base_url
+
+
+def server_stats(base_url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(f"{base_url}/stats", timeout=5) as response:
+        return json.loads(response.read())
+
+
+def config_overrides(args: argparse.Namespace, base_url: str, agents: int) -> Dict[str, Any]:
+    return {
+        "openrouter": {"base_url": base_url, "api_key": "mock", "pool": {"prewarm": False},
+                       "scheduler": {"enabled": args.scheduler}},
+        "orchestrator": {"parallel_agents": agents, "task_timeout": args.task_timeout,
+                         "aggregation_strategy": args.aggregation},
+        "agent": {"stream": args.stream},
+        "models": {"synthesis": {"stream": args.stream}},
+        "output": {"auto_save": False},
+        "llm_cache": {"mode": "off"},
+        # The benchmark installs its own tracer around each run
+        "tracing": {"enabled": False},
+    }
+
+
+def measured(run, args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    """
+    Run `run()` under a tracer and usage collector; returns raw measurements
+
+    run may return the ledger summary of its own usage collector (orchestrate
+    collects per run), which then replaces the outer one.
+    """
+    from tracing import collect_trace
+    from usage_stats import collect_usage
+
+    before = server_stats(base_url)
+    with collect_trace({"enabled": True}) as tracer, collect_usage() as usage:
+        started = time.perf_counter()
+        summary = run()
+        wall = time.perf_counter() - started
+    after = server_stats(base_url)
+
+    phases: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    for span in tracer.finished_spans():
+        phase = phase_of(span)
+        if phase is not None:
+            phases[phase].append(span.duration)
+    return {
+        "wall": wall,
+        "phases": phases,
+        "llm_calls": (summary or usage.summary())['calls'],
+        "http_requests": after['requests'] - before['requests'],
+        "http_errors": (after['errors_429'] - before['errors_429']) + (after['errors_5xx'] - before['errors_5xx']),
+    }
+
+
+def summarize(runs: List[Dict[str, Any]], peak_memory: Optional[int]) -> Dict[str, Any]:
+    phases = {phase: distribution([value for run in runs for value in run['phases'][phase]]) for phase in PHASES}
+    return {
+        "runs": len(runs),
+        "wall": distribution([run['wall'] for run in runs]),
+        "phases": phases,
+        "llm_calls": sum(run['llm_calls'] for run in runs) / len(runs),
+        "http_requests": sum(run['http_requests'] for run in runs) / len(runs),
+        "http_errors": sum(run['http_errors'] for run in runs) / len(runs),
+        "peak_memory": peak_memory,
+    }
+
+
+def run_point(label: str, run, repeat: int, args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    if args.memory:
+        tracemalloc.start()
+    runs = [measured(run, args, base_url) for _ in range(repeat)]
+    peak_memory = None
+    if args.memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    result = summarize(runs, peak_memory)
+    result["label"] = label
+    return result
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None):
+    header = f"{'point':<12} {'wall p50':>9} {'p95':>7}"
+    for phase in PHASES:
+        header += f" {phase + ' p50/p95/p99 ms':>26}"
+    header += f" {'LLM':>6} {'HTTP':>6} {'err':>5} {'peak MB':>8}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+
+    baseline_points = {point['label']: point for point in (baseline or {}).get('results', [])}
+    for result in results:
+        line = f"{result['label']:<12} {result['wall']['p50']:>8.2f}s {result['wall']['p95']:>6.2f}s"
+        for phase in PHASES:
+            stats = result['phases'][phase]
+            line += f" {_ms(stats['p50']) + '/' + _ms(stats['p95']) + '/' + _ms(stats['p99']):>26}"
+        memory = f"{result['peak_memory'] / 1e6:.1f}" if result['peak_memory'] is not None else "-"
+        line += f" {result['llm_calls']:>6.1f} {result['http_requests']:>6.1f} {result['http_errors']:>5.1f} {memory:>8}"
+        previous = baseline_points.get(result['label'])
+        if baseline:
+            line += f" {result['wall']['p50'] / previous['wall']['p50']:>7.2f}x" if previous else f" {'-':>8}"
+        print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='End-to-end benchmark against a mock OpenRouter server')
+    parser.add_argument('--agents', default='1,2,4,8,16,32,64', help='Comma-separated parallel_agents values to sweep')
+    parser.add_argument('--repeat', type=int, default=3, help='Orchestrate runs per sweep point')
+    parser.add_argument('--agent-runs', type=int, default=5, help='ModelAwareAgent.run calls (0 to skip)')
+    parser.add_argument('--agent-model', default='kimi-k2')
+    parser.add_argument('--stream', action='store_true', help='Stream agent and synthesis calls')
+    parser.add_argument('--task-timeout', type=float, default=300)
+    parser.add_argument('--aggregation', default='consensus', choices=('consensus', 'tree', 'pipeline'),
+                        help='orchestrator.aggregation_strategy')
+    parser.add_argument('--no-scheduler', dest='scheduler', action='store_false',
+                        help='Bypass the LLM call scheduler (compare with --max-concurrent)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='Skip tracemalloc (it slows allocation-heavy code)')
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.yaml'))
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--baseline', help='Results file from an earlier run to compare wall p50 against')
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    # Never touch the real API
+    os.environ.setdefault('OPENROUTER_API_KEY', 'mock')
+
+    from model_factory import ModelAwareAgent
+    from orchestrator import TaskOrchestrator
+    from config_utils import load_config, merge_config
+
+    process, base_url = start_mock(args)
+    print(f"Mock OpenRouter at {base_url} (ttft {args.ttft}, {args.tokens_per_sec:g} tok/s, "
+          f"{args.tool_turns}x{args.tools_per_turn} tool calls per agent)\n")
+    results = []
+    try:
+        if args.agent_runs:
+            config = merge_config(load_config(args.config), config_overrides(args, base_url, 1))
+            def agent_run():
+                ModelAwareAgent(args.agent_model, silent=True, config=config).run(AGENT_TASK)
+            results.append(run_point("agent.run", agent_run, args.agent_runs, args, base_url))
+
+        for agents in [int(value) for value in args.agents.split(',') if value.strip()]:
+            orchestrator = TaskOrchestrator(args.config, silent=True, agent_model=args.agent_model,
+                                            config_overrides=config_overrides(args, base_url, agents))
+            def orchestrate_run():
+                orchestrator.orchestrate(QUERY)
+                return orchestrator.last_usage
+            results.append(run_point(f"agents={agents}", orchestrate_run, args.repeat, args, base_url))
+            print(f"  {results[-1]['label']}: wall p50 {results[-1]['wall']['p50']:.2f}s", flush=True)
+    finally:
+        process.terminate()
+        process.wait()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print()
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"settings": dict(vars(args)), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for OpenRouter's OpenAI-compatible chat completions endpoint
+
+Serves scripted tool-calling conversations so the orchestrator and agents
+can be benchmarked offline and reproducibly:
+
+    question generation   a JSON array with the requested number of questions
+    agent turns           `tool_turns` turns of `tools_per_turn` calculate calls,
+                          then an answer and a mark_task_complete call
+    synthesis (no tools)  a long answer of `synthesis_tokens` tokens
+
+Latency is time to first token, drawn from a distribution, plus prompt
+tokens at `prefill_tokens_per_sec` (if set) and generated tokens at
+`tokens_per_sec`. Streaming (SSE) and non-streaming responses are
+supported, and a fraction of requests can be failed with 429 (with
+Retry-After) or 5xx to exercise retry paths. With --max-concurrent, requests
+beyond that many in flight get a 429, like a provider's concurrency limit.
+
+Usage:
+    python benchmarks/mock_openrouter.py --port 8765 --ttft lognormal:0.4:0.5
+    # then point config.yaml's openrouter.base_url at http://127.0.0.1:8765/v1
+
+GET /v1/stats returns request, error and peak concurrency counters.
+
+Latency specs: fixed:S, uniform:LOW:HIGH, lognormal:MEDIAN:SIGMA, exp:MEAN
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MOCK_SETTINGS = {
+    "ttft": "lognormal:0.4:0.5",
+    "tokens_per_sec": 80.0,
+    "prefill_tokens_per_sec": 0.0,
+    "tool_turns": 2,
+    "tools_per_turn": 2,
+    "answer_tokens": 300,
+    "synthesis_tokens": 1200,
+    "error_429_rate": 0.0,
+    "error_5xx_rate": 0.0,
+    "retry_after": 1.0,
+    "max_concurrent": 0,
+    "seed": None,
+}
+
+WORDS = ("agent", "latency", "throughput", "synthesis", "evidence", "analysis", "model", "token",
+         "research", "parallel", "report", "finding", "source", "benchmark", "result", "context")
+
+
+class LatencyModel:
+    """Samples seconds from a spec such as 'lognormal:0.4:0.5'"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        name, *params = spec.split(':')
+        values = [float(param) for param in params]
+        if name == 'fixed' and len(values) == 1:
+            self._sample = lambda rng: values[0]
+        elif name == 'uniform' and len(values) == 2:
+            self._sample = lambda rng: rng.uniform(values[0], values[1])
+        elif name == 'lognormal' and len(values) == 2:
+            self._sample = lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+        elif name == 'exp' and len(values) == 1:
+            self._sample = lambda rng: rng.expovariate(1.0 / values[0])
+        else:
+            raise ValueError(f"Bad latency spec: {spec}. Use fixed:S, uniform:LOW:HIGH, lognormal:MEDIAN:SIGMA or exp:MEAN")
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, self._sample(rng))
+
+
+def _estimate_tokens(value: Any) -> int:
+    return max(1, len(json.dumps(value)) // 4)
+
+
+def _text(tokens: int, rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(max(1, tokens)))
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, list):
+        return "".join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content or ""
+
+
+class MockOpenRouter:
+    """
+    Threaded mock server
+
+    Usage:
+        server = MockOpenRouter(tool_turns=1, ttft="fixed:0.05")
+        base_url = server.start()
+        ...
+        server.stop()
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **settings):
+        self.settings = dict(DEFAULT_MOCK_SETTINGS)
+        self.settings.update({key: value for key, value in settings.items() if value is not None})
+        self.ttft = LatencyModel(self.settings['ttft'])
+        self._rng = random.Random(self.settings['seed'])
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._seen_prefixes = set()
+        self.stats = {"requests": 0, "completed": 0, "errors_429": 0, "errors_5xx": 0, "overloaded": 0,
+                      "in_flight": 0, "peak_in_flight": 0}
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    mock._send_json(self, 200, {"data": []})
+                elif self.path.rstrip('/').endswith('/stats'):
+                    mock._send_json(self, 200, mock.snapshot())
+                else:
+                    mock._send_json(self, 404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    mock._send_json(self, 404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                mock._handle_completion(self, json.loads(self.rfile.read(length)))
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        """Serve in a background thread; returns the base_url to configure"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-openrouter", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _count(self, key: str, delta: int = 1):
+        with self._stats_lock:
+            self.stats[key] += delta
+            if key == 'in_flight':
+                self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+
+    def _overloaded(self) -> bool:
+        """Whether this request is over the --max-concurrent limit (counted as overloaded)"""
+        limit = self.settings['max_concurrent']
+        with self._stats_lock:
+            if not limit or self.stats['in_flight'] <= limit:
+                return False
+            self.stats['overloaded'] += 1
+            return True
+
+    def _random(self) -> random.Random:
+        # One seeded generator; each request draws its own child so threads stay reproducible per request
+        with self._rng_lock:
+            return random.Random(self._rng.random())
+
+    def _send_json(self, handler: BaseHTTPRequestHandler, status: int, body: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _script(self, request: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+        """The scripted assistant message for this point in the conversation"""
+        messages = request.get('messages', [])
+        tool_names = [tool['function']['name'] for tool in request.get('tools') or []]
+        task = next((_content_text(m.get('content')) for m in messages if m.get('role') == 'user'), "")
+
+        questions = re.search(r"Create (\d+) specialized", task)
+        if questions:
+            count = int(questions.group(1))
+            return {"content": json.dumps([f"Research question {i + 1}: {_text(12, rng)}" for i in range(count)])}
+
+        if not tool_names:
+            return {"content": _text(self.settings['synthesis_tokens'], rng)}
+
+        turn = sum(1 for m in messages if m.get('role') == 'assistant')
+        if turn < self.settings['tool_turns'] and 'calculate' in tool_names:
+            calls = [{"id": f"call_{turn}_{i}", "type": "function",
+                      "function": {"name": "calculate", "arguments": json.dumps({"expression": f"{turn + 1} * {i + 2}"})}}
+                     for i in range(self.settings['tools_per_turn'])]
+            return {"content": f"Checking step {turn + 1}.", "tool_calls": calls}
+
+        message = {"content": _text(self.settings['answer_tokens'], rng)}
+        if 'mark_task_complete' in tool_names:
+            message["tool_calls"] = [{"id": f"call_{turn}_done", "type": "function", "function": {
+                "name": "mark_task_complete",
+                "arguments": json.dumps({"task_summary": "done", "completion_message": "Research complete"})}}]
+        return message
+
+    def _usage(self, request: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+        messages = request.get('messages', [])
+        prompt_tokens = _estimate_tokens(messages) + _estimate_tokens(request.get('tools') or [])
+        completion_tokens = _estimate_tokens(message.get('content') or "") + _estimate_tokens(message.get('tool_calls') or [])
+
+        # Prompt cache: the system prompt and tools are cached once a request with the same prefix has been seen
+        prefix = (request.get('model'), json.dumps(messages[:1]), json.dumps(request.get('tools') or []))
+        prefix_tokens = _estimate_tokens(messages[:1]) + _estimate_tokens(request.get('tools') or [])
+        with self._stats_lock:
+            cached = prefix_tokens if prefix in self._seen_prefixes else 0
+            self._seen_prefixes.add(prefix)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": min(cached, prompt_tokens)}}
+
+    def _handle_completion(self, handler: BaseHTTPRequestHandler, request: Dict[str, Any]):
+        self._count('requests')
+        self._count('in_flight')
+        try:
+            rng = self._random()
+            roll = rng.random()
+            if self._overloaded():
+                self._count('errors_429')
+                self._send_json(handler, 429, {"error": {"message": "Too many concurrent requests", "code": 429}},
+                                {"Retry-After": str(self.settings['retry_after'])})
+                return
+            if roll < self.settings['error_429_rate']:
+                self._count('errors_429')
+                self._send_json(handler, 429, {"error": {"message": "Rate limit exceeded", "code": 429}},
+                                {"Retry-After": str(self.settings['retry_after'])})
+                return
+            if roll < self.settings['error_429_rate'] + self.settings['error_5xx_rate']:
+                self._count('errors_5xx')
+                status = rng.choice((500, 502, 503))
+                self._send_json(handler, status, {"error": {"message": "Upstream error", "code": status}})
+                return
+
+            message = self._script(request, rng)
+            usage = self._usage(request, message)
+            prefill = usage['prompt_tokens'] / self.settings['prefill_tokens_per_sec'] if self.settings['prefill_tokens_per_sec'] else 0.0
+            time.sleep(self.ttft.sample(rng) + prefill)
+            if request.get('stream'):
+                self._stream(handler, request, message, usage)
+            else:
+                time.sleep(usage['completion_tokens'] / self.settings['tokens_per_sec'])
+                body = {
+                    "id": f"gen-{rng.getrandbits(48):x}", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get('model'), "provider": "Mock",
+                    "choices": [{"index": 0, "message": dict(message, role="assistant"),
+                                 "finish_reason": "tool_calls" if message.get('tool_calls') else "stop"}],
+                    "usage": usage,
+                }
+                self._send_json(handler, 200, body)
+            self._count('completed')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timeout or cancellation)
+            pass
+        finally:
+            self._count('in_flight', -1)
+
+    def _stream(self, handler: BaseHTTPRequestHandler, request: Dict[str, Any], message: Dict[str, Any],
+                usage: Dict[str, Any]):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+
+        def send(payload: str):
+            data = f"data: {payload}\n\n".encode('utf-8')
+            handler.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            handler.wfile.flush()
+
+        base = {"id": "gen-stream", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get('model'), "provider": "Mock"}
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None):
+            send(json.dumps(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])))
+
+        # Content in ~8-token chunks paced at tokens_per_sec
+        words = (message.get('content') or "").split(" ")
+        pause = 8 / self.settings['tokens_per_sec']
+        for start in range(0, len(words), 8):
+            text = " ".join(words[start:start + 8]) + (" " if start + 8 < len(words) else "")
+            chunk({"role": "assistant", "content": text})
+            time.sleep(pause)
+        for index, tool_call in enumerate(message.get('tool_calls') or []):
+            arguments = tool_call['function']['arguments']
+            chunk({"tool_calls": [{"index": index, "id": tool_call['id'], "type": "function",
+                                   "function": {"name": tool_call['function']['name'], "arguments": arguments[:8]}}]})
+            chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[8:]}}]})
+        chunk({}, "tool_calls" if message.get('tool_calls') else "stop")
+        send(json.dumps(dict(base, choices=[], usage=usage)))
+        send("[DONE]")
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    """Mock server options, shared with the benchmark runner"""
+    parser.add_argument('--ttft', default=DEFAULT_MOCK_SETTINGS['ttft'], help='Time-to-first-token distribution')
+    parser.add_argument('--tokens-per-sec', type=float, default=DEFAULT_MOCK_SETTINGS['tokens_per_sec'])
+    parser.add_argument('--prefill-tokens-per-sec', type=float, default=DEFAULT_MOCK_SETTINGS['prefill_tokens_per_sec'],
+                        help='Prompt processing speed, so latency grows with prompt size (0 = instant)')
+    parser.add_argument('--tool-turns', type=int, default=DEFAULT_MOCK_SETTINGS['tool_turns'],
+                        help='Tool-calling turns per agent before it answers')
+    parser.add_argument('--tools-per-turn', type=int, default=DEFAULT_MOCK_SETTINGS['tools_per_turn'])
+    parser.add_argument('--answer-tokens', type=int, default=DEFAULT_MOCK_SETTINGS['answer_tokens'])
+    parser.add_argument('--synthesis-tokens', type=int, default=DEFAULT_MOCK_SETTINGS['synthesis_tokens'])
+    parser.add_argument('--error-429-rate', type=float, default=0.0, help='Fraction of requests failed with 429')
+    parser.add_argument('--error-5xx-rate', type=float, default=0.0, help='Fraction of requests failed with 5xx')
+    parser.add_argument('--retry-after', type=float, default=DEFAULT_MOCK_SETTINGS['retry_after'])
+    parser.add_argument('--max-concurrent', type=int, default=0,
+                        help='Answer requests beyond this many in flight with 429 (0 = unlimited)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible latencies and errors')
+
+
+def mock_settings(args: argparse.Namespace) -> Dict[str, Any]:
+    return {key: getattr(args, key) for key in DEFAULT_MOCK_SETTINGS}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Mock OpenRouter chat completions server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='Port (0 picks a free one)')
+    add_mock_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockOpenRouter(args.host, args.port, **mock_settings(args))
+    # The benchmark runner reads the URL from the first line
+    print(server.base_url, flush=True)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
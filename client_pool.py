@@ -0,0 +1,179 @@
+"""
+Process-wide pool of OpenAI-compatible clients
+
+Every agent used to build its own OpenAI client, and with it a private HTTP
+connection pool, so each agent paid TCP and TLS setup to the API again. The
+pool hands out one sync client per (base_url, api_key) and one async client
+per (base_url, api_key, event loop), all sharing keep-alive connections
+across agents and runs. It can also prewarm connections at startup and keep
+them warm while the CLI sits idle at the prompt.
+
+Pooled clients never retry on their own (max_retries=0): resilience.py owns
+retries, so every attempt passes through the circuit breaker, the call
+scheduler and the retry spans.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+try:
+    import httpx2 as httpx  # openai>=3 is built on httpx2
+except ImportError:
+    import httpx
+
+# Defaults for config['openrouter']['pool']
+DEFAULT_POOL_CONFIG = {
+    "max_connections": 100,
+    "max_keepalive_connections": 32,
+    "keepalive_expiry": 90,
+    "prewarm": True,
+    "prewarm_connections": 4,
+    "idle_keepalive_interval": 45,
+}
+
+
+def get_pool_config(config: dict) -> Dict[str, Any]:
+    """Merge config['openrouter']['pool'] over the defaults"""
+    pool_config = dict(DEFAULT_POOL_CONFIG)
+    pool_config.update(config.get('openrouter', {}).get('pool', {}) or {})
+    return pool_config
+
+
+def _limits(pool_config: Dict[str, Any]) -> "httpx.Limits":
+    return httpx.Limits(
+        max_connections=pool_config['max_connections'],
+        max_keepalive_connections=pool_config['max_keepalive_connections'],
+        keepalive_expiry=pool_config['keepalive_expiry']
+    )
+
+
+class ClientPool:
+    """Shares API clients (and their HTTP connection pools) across the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, str], OpenAI] = {}
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], Tuple[AsyncOpenAI, Any]]]" = weakref.WeakKeyDictionary()
+        self._keepalive_threads: Dict[Tuple[str, str], threading.Thread] = {}
+        self._keepalive_stop = threading.Event()
+
+    def get_client(self, config: dict) -> OpenAI:
+        """Return the shared sync client for config's base_url and api_key"""
+        key = self._key(config)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    base_url=key[0],
+                    api_key=key[1],
+                    max_retries=0,
+                    http_client=DefaultHttpxClient(limits=_limits(get_pool_config(config)))
+                )
+                self._clients[key] = client
+            return client
+
+    def get_async_client(self, config: dict, loop: Optional[asyncio.AbstractEventLoop] = None) -> AsyncOpenAI:
+        """
+        Return the shared async client for config's endpoint on the given loop
+
+        Async connection pools are bound to the loop they were used on, so
+        clients are kept per loop (defaults to the running loop).
+        """
+        return self._get_async_entry(config, loop)[0]
+
+    def _get_async_entry(self, config: dict, loop: Optional[asyncio.AbstractEventLoop] = None) -> Tuple[AsyncOpenAI, Any]:
+        """Return (client, http_client) for config's endpoint on the given loop"""
+        loop = loop or asyncio.get_running_loop()
+        key = self._key(config)
+        with self._lock:
+            loop_clients = self._async_clients.setdefault(loop, {})
+            entry = loop_clients.get(key)
+            if entry is None:
+                http_client = DefaultAsyncHttpxClient(limits=_limits(get_pool_config(config)))
+                client = AsyncOpenAI(base_url=key[0], api_key=key[1], max_retries=0, http_client=http_client)
+                entry = loop_clients[key] = (client, http_client)
+            return entry
+
+    def prewarm(self, config: dict, background: bool = True):
+        """
+        Open keep-alive connections to the API before the first LLM call
+
+        Connections are opened on the shared async runtime loop, which is
+        where agent calls are made.
+
+        Args:
+            config: Loaded configuration
+            background: Return immediately instead of waiting for the handshakes
+        """
+        from async_runtime import get_loop
+
+        pool_config = get_pool_config(config)
+        if not pool_config['prewarm']:
+            return
+
+        future = asyncio.run_coroutine_threadsafe(
+            self._prewarm_async(config, pool_config['prewarm_connections']),
+            get_loop()
+        )
+        if not background:
+            future.result()
+
+    async def _prewarm_async(self, config: dict, connections: int):
+        """Issue concurrent lightweight requests so the pool holds warm connections"""
+        client, http_client = self._get_async_entry(config)
+        base_url = str(client.base_url)
+
+        async def touch():
+            try:
+                # Any response (even 404) leaves a TLS connection in the pool
+                await http_client.head(base_url)
+            except Exception:
+                pass
+
+        await asyncio.gather(*(touch() for _ in range(max(1, connections))))
+
+    def start_idle_keepalive(self, config: dict):
+        """
+        Keep prewarmed connections alive while the process is idle
+
+        A daemon thread re-touches the pool every idle_keepalive_interval
+        seconds, before keepalive_expiry or the server drops the connections.
+        """
+        pool_config = get_pool_config(config)
+        interval = pool_config['idle_keepalive_interval']
+        if not pool_config['prewarm'] or not interval:
+            return
+
+        key = self._key(config)
+        with self._lock:
+            if key in self._keepalive_threads:
+                return
+
+            def refresh():
+                while not self._keepalive_stop.wait(interval):
+                    self.prewarm(config, background=True)
+
+            thread = threading.Thread(target=refresh, name="superheavy-keepalive", daemon=True)
+            self._keepalive_threads[key] = thread
+            thread.start()
+
+    def stop_idle_keepalive(self):
+        """Stop all keep-alive refresh threads"""
+        self._keepalive_stop.set()
+
+    @staticmethod
+    def _key(config: dict) -> Tuple[str, str]:
+        return config['openrouter']['base_url'], config['openrouter']['api_key']
+
+
+# Process-wide pool shared by providers and the legacy agent
+client_pool = ClientPool()
+
+
+def warm_up(config: dict):
+    """Prewarm connections and keep them warm while idle (used by the CLIs)"""
+    client_pool.prewarm(config, background=True)
+    client_pool.start_idle_keepalive(config)
@@ -4,33 +4,169 @@ Configuration utilities for environment variable substitution
 
 import os
 import re
+import threading
 import yaml
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load .env file if it exists
 load_dotenv()
 
+ENV_VAR_PATTERN = re.compile(r'\$\{([^}]+)\}')
 
-def load_config(config_path: str = "config.yaml") -> dict:
+
+class FrozenDict(dict):
+    """
+    Read-only dict returned by load_config
+
+    The parsed configuration is cached and shared by every caller, so it must
+    not be modified in place. Use merge_config() to derive a modified copy.
+    """
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Configuration is read-only; use merge_config() to derive a modified copy")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    """Recursively convert dicts to FrozenDict and lists to tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def merge_config(config: dict, overrides: Optional[dict]) -> FrozenDict:
+    """
+    Return a frozen copy of config with overrides deep-merged on top
+    
+    Args:
+        config: Base configuration (usually from load_config)
+        overrides: Nested dict of values to replace, e.g. {'output': {'auto_save': False}}
+        
+    Returns:
+        New read-only configuration; the base config is left untouched
+    """
+    if not overrides:
+        return freeze(config)
+    
+    merged = dict(config)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return freeze(merged)
+
+
+class _CacheEntry:
+    __slots__ = ('mtime_ns', 'size', 'env', 'config')
+    
+    def __init__(self, mtime_ns: int, size: int, env: Tuple[Tuple[str, Optional[str]], ...], config: FrozenDict):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.env = env
+        self.config = config
+
+
+_config_cache: Dict[str, _CacheEntry] = {}
+_config_cache_lock = threading.Lock()
+
+
+def _env_snapshot(var_names) -> Tuple[Tuple[str, Optional[str]], ...]:
+    return tuple((name, os.getenv(name)) for name in var_names)
+
+
+def load_config(config_path: str = "config.yaml") -> FrozenDict:
     """
     Load configuration file with environment variable substitution
     
+    The parsed result is memoized per file and shared by all callers. It is
+    re-read only when the file's mtime/size or one of the environment
+    variables it references changes, so repeated calls cost one stat().
+    
     Args:
         config_path: Path to the configuration file
         
     Returns:
-        Dictionary containing the configuration
+        Read-only dictionary containing the configuration
         
     Raises:
         ValueError: If required environment variable is not found
     """
-    with open(config_path, 'r') as f:
-        config_content = f.read()
+    path = os.path.abspath(config_path)
+    stat = os.stat(path)
+    
+    entry = _config_cache.get(path)
+    if (entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size
+            and entry.env == _env_snapshot(name for name, _ in entry.env)):
+        return entry.config
+    
+    with _config_cache_lock:
+        with open(path, 'r') as f:
+            raw_content = f.read()
+        
+        # Replace environment variables in config
+        config_content = substitute_env_vars(raw_content)
+        config = freeze(yaml.safe_load(config_content))
+        
+        var_names = sorted(set(ENV_VAR_PATTERN.findall(raw_content)))
+        _config_cache[path] = _CacheEntry(stat.st_mtime_ns, stat.st_size, _env_snapshot(var_names), config)
+    
+    return config
+
+
+class ConfigWatcher:
+    """
+    Opt-in hot reload for long-running processes
+    
+    Polls the config file in a background thread and calls every registered
+    callback with the new config when it changes. Parsing happens on the
+    watcher thread, never on the request path.
+    """
+    
+    def __init__(self, config_path: str = "config.yaml", interval: float = 2.0):
+        self.config_path = config_path
+        self.interval = interval
+        self._callbacks: List[Callable[[FrozenDict], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current = load_config(config_path)
+    
+    def subscribe(self, callback: Callable[[FrozenDict], None]):
+        """Register a callback invoked with each newly loaded config"""
+        self._callbacks.append(callback)
+    
+    def start(self) -> "ConfigWatcher":
+        """Start polling in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="superheavy-config-watcher", daemon=True)
+            self._thread.start()
+        return self
     
-    # Replace environment variables in config
-    config_content = substitute_env_vars(config_content)
+    def stop(self):
+        """Stop polling"""
+        self._stop.set()
     
-    return yaml.safe_load(config_content)
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            try:
+                config = load_config(self.config_path)
+            except Exception as e:
+                # Keep serving the last good config while the file is mid-edit or invalid
+                print(f"⚠️  Config reload failed, keeping previous config: {str(e)}")
+                continue
+            
+            if config is not self._current:
+                self._current = config
+                for callback in list(self._callbacks):
+                    callback(config)
 
 
 def substitute_env_vars(content: str) -> str:
@@ -54,7 +190,7 @@ def substitute_env_vars(content: str) -> str:
         return env_value
     
     # Replace ${VAR_NAME} patterns with environment variables
-    return re.sub(r'\$\{([^}]+)\}', replace_env_var, content)
+    return ENV_VAR_PATTERN.sub(replace_env_var, content)
 
 
 def check_required_env_vars():
@@ -0,0 +1,211 @@
+"""
+Token-budgeted context compaction for the agent loop
+
+Tool results (search pages in particular) are resent on every iteration,
+so input tokens grow quadratically with the number of turns. Before each
+LLM call the agent runs its history through a ContextCompactor. Once the
+estimated size crosses `threshold` of the token budget (the smaller of the
+model's context_window and agent.compaction.token_budget), it compacts in
+two stages until the history is back under `target`:
+
+    1. truncate old tool results
+    2. fold earlier turns into one extractive summary message
+
+The system prompt, the task and the most recent turns are always kept
+verbatim. An assistant message and its tool results are always kept or
+removed together, so tool-call pairing stays valid. Keeping a gap between
+threshold and target means compaction runs rarely, which preserves the
+cached prompt prefix between compactions.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rough characters per token for English text and JSON
+CHARS_PER_TOKEN = 4
+
+# Fixed per-message overhead (role, separators) in tokens
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PREFIX = "[Compacted context] Summary of earlier work:"
+TRUNCATION_MARKER = "… [truncated "
+
+DEFAULT_COMPACTION_CONFIG = {
+    "enabled": True,
+    "token_budget": 32000,
+    "threshold": 0.75,
+    "target": 0.5,
+    "keep_recent_turns": 2,
+    "tool_result_chars": 600,
+    "summary_chars": 4000,
+}
+
+
+def _field(value: Any, name: str, default: Any = None) -> Any:
+    """Read a field from a dict or an SDK object"""
+    if isinstance(value, dict):
+        return value.get(name, default)
+    return getattr(value, name, default)
+
+
+def _content_text(content: Any) -> str:
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    # List of content parts
+    return "".join(_field(part, 'text', '') or '' for part in content)
+
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    """Approximate token count of one message"""
+    chars = len(_content_text(message.get('content')))
+    for tool_call in message.get('tool_calls') or []:
+        function = _field(tool_call, 'function')
+        chars += len(_field(function, 'name', '') or '') + len(_field(function, 'arguments', '') or '')
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Approximate token count of a message list"""
+    return sum(estimate_message_tokens(message) for message in messages)
+
+
+def _split_turns(messages: List[Dict[str, Any]], head_size: int) -> List[Tuple[int, int]]:
+    """(start, end) ranges of turns after the head; tool results stay with their assistant message"""
+    turns = []
+    start = head_size
+    for index in range(head_size + 1, len(messages)):
+        if messages[index].get('role') != 'tool':
+            turns.append((start, index))
+            start = index
+    if start < len(messages):
+        turns.append((start, len(messages)))
+    return turns
+
+
+def _head_size(messages: List[Dict[str, Any]]) -> int:
+    """System prompt and task: everything up to and including the first user message"""
+    for index, message in enumerate(messages):
+        if message.get('role') == 'user':
+            return index + 1
+    return min(1, len(messages))
+
+
+def _clip(text: str, limit: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def _summarize_turns(messages: List[Dict[str, Any]], limit: int) -> str:
+    """Extractive summary of a run of turns: assistant notes, tool calls and result excerpts"""
+    lines = []
+    for message in messages:
+        role = message.get('role')
+        text = _content_text(message.get('content'))
+        if role == 'assistant':
+            if text.startswith(SUMMARY_PREFIX):
+                lines.append(text[len(SUMMARY_PREFIX):].strip())
+                continue
+            if text:
+                lines.append(f"- Noted: {_clip(text, 300)}")
+            for tool_call in message.get('tool_calls') or []:
+                function = _field(tool_call, 'function')
+                lines.append(f"- Called {_field(function, 'name')}({_clip(_field(function, 'arguments', '') or '', 120)})")
+        elif role == 'tool':
+            lines.append(f"  → {message.get('name', 'tool')} returned: {_clip(text, 200)}")
+        elif text:
+            lines.append(f"- {role}: {_clip(text, 200)}")
+
+    summary = "\n".join(lines)
+    if len(summary) > limit:
+        # Keep the most recent part of the summary
+        summary = "…" + summary[-limit:]
+    return f"{SUMMARY_PREFIX}\n{summary}"
+
+
+class ContextCompactor:
+    """Keeps an agent's message history under a token budget"""
+
+    def __init__(self, context_window: int, config: Optional[Dict[str, Any]] = None):
+        settings = dict(DEFAULT_COMPACTION_CONFIG)
+        settings.update(config or {})
+        self.enabled = settings['enabled']
+        self.budget = min(context_window, settings['token_budget']) if settings['token_budget'] else context_window
+        self.threshold_tokens = int(self.budget * settings['threshold'])
+        self.target_tokens = int(self.budget * settings['target'])
+        self.keep_recent_turns = max(1, settings['keep_recent_turns'])
+        self.tool_result_chars = settings['tool_result_chars']
+        self.summary_chars = settings['summary_chars']
+
+    def compact(self, messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Compact messages if they exceed the threshold
+
+        Args:
+            messages: The agent's history (not modified)
+
+        Returns:
+            (messages to send, statistics dict or None if nothing was done)
+        """
+        before = estimate_tokens(messages)
+        if not self.enabled or before <= self.threshold_tokens:
+            return messages, None
+
+        head_size = _head_size(messages)
+        turns = _split_turns(messages, head_size)
+        old_turns = turns[:-self.keep_recent_turns]
+        if not old_turns:
+            return messages, None
+
+        compacted = list(messages)
+        tokens = before
+        truncated = 0
+
+        # Stage 1: truncate old tool results, oldest first
+        for start, end in old_turns:
+            for index in range(start, end):
+                message = compacted[index]
+                content = message.get('content')
+                if (message.get('role') != 'tool' or not isinstance(content, str) or
+                        len(content) <= self.tool_result_chars or TRUNCATION_MARKER in content):
+                    continue
+                shortened = dict(message)
+                shortened['content'] = (content[:self.tool_result_chars] +
+                                        f"{TRUNCATION_MARKER}{len(content) - self.tool_result_chars} chars]")
+                tokens += estimate_message_tokens(shortened) - estimate_message_tokens(message)
+                compacted[index] = shortened
+                truncated += 1
+                if tokens <= self.target_tokens:
+                    break
+            if tokens <= self.target_tokens:
+                break
+
+        # Stage 2: fold all old turns into one summary message
+        summarized_turns = 0
+        if tokens > self.target_tokens:
+            old_start, old_end = old_turns[0][0], old_turns[-1][1]
+            summary = {"role": "assistant", "content": _summarize_turns(compacted[old_start:old_end], self.summary_chars)}
+            compacted = compacted[:old_start] + [summary] + compacted[old_end:]
+            summarized_turns = len(old_turns)
+            tokens = estimate_tokens(compacted)
+
+        stats = {
+            "tokens_before": before,
+            "tokens_after": tokens,
+            "tokens_saved": before - tokens,
+            "messages_before": len(messages),
+            "messages_after": len(compacted),
+            "truncated_tool_results": truncated,
+            "summarized_turns": summarized_turns,
+            "budget": self.budget,
+            "threshold": self.threshold_tokens,
+            "target": self.target_tokens,
+        }
+        return compacted, stats
+
+
+def format_compaction(stats: Dict[str, Any]) -> str:
+    """One-line description of a compaction"""
+    return (f"~{stats['tokens_before']:,} → ~{stats['tokens_after']:,} tokens "
+            f"({stats['truncated_tool_results']} tool results truncated, "
+            f"{stats['summarized_turns']} turns summarized)")
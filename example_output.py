@@ -35,9 +35,9 @@ def main():
     print("\n2. Auto-save with Orchestrator:")
     
     # Create orchestrator with auto-save enabled
-    orchestrator = TaskOrchestrator(silent=True)
-    orchestrator.config['output']['auto_save'] = True
-    orchestrator.config['output']['directory'] = 'example_outputs'
+    orchestrator = TaskOrchestrator(silent=True, config_overrides={
+        'output': {'auto_save': True, 'directory': 'example_outputs'}
+    })
     
     print("Running orchestrator with auto-save enabled...")
     print("(This would save output automatically)")
@@ -0,0 +1,327 @@
+"""
+Persistent cache of LLM responses
+
+Responses are keyed by a hash of model, messages, tools and max_tokens and
+stored zlib-compressed in SQLite (WAL mode, shareable across processes).
+Modes (llm_cache.mode in config.yaml):
+
+    off           no caching (default)
+    read_through  serve hits from the cache, call the API on a miss and store it
+    record        always call the API and store (refresh) the response
+    replay        serve from the cache only; a miss raises LLMCacheMiss, so
+                  runs are fully offline and deterministic
+
+Requests include the tool results of earlier turns, so tool results are
+recorded too (keyed by tool name and arguments; see run_tool): replay
+serves them instead of running the tools, while the other modes always run
+the tools live and store their latest results.
+
+Identical concurrent requests are coalesced so only one reaches the network;
+the others wait for its response (or its API error). If that caller is
+cancelled or runs out of time instead, one of the others makes the call.
+Entries older than the TTL are ignored (except in replay mode) and the least
+recently used entries are evicted to keep the file under its byte budget.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+from openai.types.chat import ChatCompletion
+from async_runtime import DeadlineExceeded, to_thread
+
+CACHE_MODES = ('off', 'read_through', 'record', 'replay')
+
+DEFAULT_LLM_CACHE_CONFIG = {
+    "mode": "off",
+    "path": ".cache/llm.sqlite3",
+    "max_bytes": 512 * 1024 * 1024,
+    "ttl": 7 * 24 * 3600,
+}
+
+
+# Result handed to coalesced followers whose leader gave up; one of them makes the call instead
+_ABANDONED = object()
+
+
+class LLMCacheMiss(Exception):
+    """Raised in replay mode when a request has no cached response"""
+    pass
+
+
+def _serialize(value: Any) -> Any:
+    """json.dumps fallback for SDK objects (e.g. tool calls echoed back in messages)"""
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(exclude_none=True)
+    return str(value)
+
+
+def request_key(model: str, messages: Any, tools: Any, max_tokens: Optional[int]) -> str:
+    """Stable hash of everything that determines a completion"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "tools": tools or None, "max_tokens": max_tokens},
+        sort_keys=True, default=_serialize, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def tool_key(name: str, arguments: str) -> str:
+    """Stable hash of a tool call (arguments as the model sent them)"""
+    payload = json.dumps({"tool": name, "arguments": arguments}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed response cache; safe to share across threads and processes"""
+
+    def __init__(self, path: str, mode: str = 'read_through', max_bytes: int = 512 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown llm_cache mode: {mode}. Expected one of {list(CACHE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._local = threading.local()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+            # Running total of responses.size, kept by triggers in the same transaction as each change,
+            # so eviction need not sum the whole table on every store
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("""CREATE TABLE IF NOT EXISTS responses_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total INTEGER NOT NULL)""")
+                conn.execute("INSERT OR IGNORE INTO responses_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM responses")
+                conn.execute("""CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses
+                    BEGIN UPDATE responses_size SET total = total + new.size; END""")
+                conn.execute("""CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses
+                    BEGIN UPDATE responses_size SET total = total + new.size - old.size; END""")
+                conn.execute("""CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses
+                    BEGIN UPDATE responses_size SET total = total - old.size; END""")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread, in WAL mode"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[ChatCompletion]:
+        """Cached response for a key, or None if missing or expired"""
+        data = self._get_data(key)
+        return None if data is None else ChatCompletion.model_validate_json(data)
+
+    def put(self, key: str, model: str, response: Any):
+        """Store a response, evicting least recently used entries over the byte budget"""
+        self._put_data(key, model, response.model_dump_json().encode('utf-8'))
+
+    def _get_data(self, key: str) -> Optional[bytes]:
+        conn = self._connect()
+        found = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if found is None:
+            return None
+        if self.mode != 'replay' and time.time() - found[1] >= self.ttl:
+            return None
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return zlib.decompress(found[0])
+
+    def _put_data(self, key: str, model: str, data: bytes):
+        content = zlib.compress(data)
+        now = time.time()
+        conn = self._connect()
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the size triggers
+        conn.execute(
+            "INSERT INTO responses (key, model, response, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET model = excluded.model, "
+            "response = excluded.response, size = excluded.size, created_at = excluded.created_at, "
+            "accessed_at = excluded.accessed_at",
+            (key, model, content, len(content), now, now)
+        )
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used responses until the cache fits its byte budget"""
+        conn = self._connect()
+        total = conn.execute("SELECT total FROM responses_size").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+    def _lookup(self, key: str, model: str) -> Optional[ChatCompletion]:
+        """Cache read for the current mode (None means: call the API)"""
+        if self.mode == 'record':
+            return None
+        cached = self.get(key)
+        if cached is None and self.mode == 'replay':
+            raise LLMCacheMiss(f"No cached response for {model} (llm_cache mode is replay)")
+        return cached
+
+    def _lead(self, key: str):
+        """Return (future, is_leader) for an in-flight request"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _settle(self, key: str, future: Future, response: Any = None, error: Optional[BaseException] = None):
+        """
+        Hand the leader's outcome to its followers
+
+        Only a response or an API error is shared. A leader that was
+        cancelled or ran out of its own time says nothing about the request,
+        so its followers are woken to retry instead of failing with it.
+        """
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        if error is None:
+            future.set_result(response)
+        elif not isinstance(error, Exception) or isinstance(error, DeadlineExceeded):
+            future.set_result(_ABANDONED)
+        else:
+            future.set_exception(error)
+
+    def get_or_call(self, key: str, model: str, call: Callable[[], Any]):
+        """
+        Return (response, cache_hit), calling the API at most once per in-flight key
+
+        Args:
+            key: request_key() of the request
+            model: Model name (stored for inspection)
+            call: Makes the API call on a miss
+        """
+        while True:
+            cached = self._lookup(key, model)
+            if cached is not None:
+                return cached, True
+
+            future, leader = self._lead(key)
+            if leader:
+                break
+            response = future.result()
+            if response is not _ABANDONED:
+                return response, True
+
+        try:
+            response = call()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._store(key, model, response)
+        self._settle(key, future, response)
+        return response, False
+
+    async def aget_or_call(self, key: str, model: str, call: Callable[[], Awaitable[Any]]):
+        """
+        Async get_or_call; SQLite reads and writes run in worker threads, and
+        waiting on another caller's request does not block the event loop
+        """
+        while True:
+            cached = await to_thread(self._lookup, key, model)
+            if cached is not None:
+                return cached, True
+
+            future, leader = self._lead(key)
+            if leader:
+                break
+            # Shielded: a follower being cancelled must not cancel the leader's future for the others
+            response = await asyncio.shield(asyncio.wrap_future(future))
+            if response is not _ABANDONED:
+                return response, True
+
+        try:
+            response = await call()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        try:
+            await to_thread(self._store, key, model, response)
+        finally:
+            # Even if cancelled while storing, the waiters get the response
+            self._settle(key, future, response)
+        return response, False
+
+    def _store(self, key: str, model: str, response: Any):
+        # A failed cache write never fails the call itself
+        try:
+            self.put(key, model, response)
+        except Exception:
+            pass
+
+    async def arun_tool(self, name: str, arguments: str, call: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return a tool call's result message content, from the cache in replay
+        mode and from call() otherwise (stored for later replays)
+
+        Raises:
+            LLMCacheMiss: In replay mode, when the call was never recorded
+        """
+        key = tool_key(name, arguments)
+        if self.mode == 'replay':
+            cached = await to_thread(self._get_data, key)
+            if cached is None:
+                raise LLMCacheMiss(f"No cached result for tool {name} (llm_cache mode is replay)")
+            return cached.decode('utf-8')
+        content = await call()
+        try:
+            await to_thread(self._put_data, key, f"tool:{name}", content.encode('utf-8'))
+        except Exception:
+            pass
+        return content
+
+
+_caches: Dict[tuple, LLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(config: dict) -> Optional[LLMCache]:
+    """Return the shared LLMCache for config['llm_cache'], or None when mode is off"""
+    cache_config = dict(DEFAULT_LLM_CACHE_CONFIG)
+    cache_config.update(config.get('llm_cache', {}) or {})
+    if cache_config['mode'] == 'off':
+        return None
+
+    path = os.path.abspath(cache_config['path'])
+    registry_key = (path, cache_config['mode'])
+    with _caches_lock:
+        cache = _caches.get(registry_key)
+        if cache is None:
+            cache = LLMCache(path, cache_config['mode'], cache_config['max_bytes'], cache_config['ttl'])
+            _caches[registry_key] = cache
+        return cache
\ No newline at end of file
@@ -1,7 +1,34 @@
 import argparse
+import sys
 from agent import OpenRouterAgent
 from model_factory import ModelAwareAgent, ModelFactory
 from config_utils import check_required_env_vars
+from client_pool import warm_up
+from streaming import add_call_observer
+
+
+class TokenPrinter:
+    """Renders streamed tokens as they arrive and per-call TTFT / tokens per second"""
+    
+    def __init__(self):
+        self.line_open = False
+    
+    def on_delta(self, text: str):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        self.line_open = True
+    
+    def on_call(self, metrics: dict):
+        if self.line_open:
+            print()
+            self.line_open = False
+        ttft = f"TTFT {metrics['ttft']:.2f}s • " if metrics['ttft'] is not None else ""
+        rate = f" • {metrics['tokens_per_sec']:.1f} tok/s" if metrics['tokens_per_sec'] and not metrics['cache_hit'] else ""
+        cached = " • cached" if metrics['cache_hit'] else ""
+        if metrics['cached_tokens'] and not metrics['cache_hit']:
+            cached = f" • {metrics['cached_tokens']}/{metrics['prompt_tokens']} input tokens from prompt cache"
+        print(f"   ⏱️  {ttft}{metrics['latency']:.2f}s total • {metrics['completion_tokens']} tokens{rate}{cached}")
+
 
 def main():
     """Main entry point for the OpenRouter agent"""
@@ -12,6 +39,8 @@ def main():
                        help='Model to use for the agent')
     parser.add_argument('--list-models', action='store_true',
                        help='List available models and exit')
+    parser.add_argument('--no-stream', action='store_true',
+                       help='Wait for complete responses instead of streaming tokens')
     
     args = parser.parse_args()
     
@@ -35,9 +64,17 @@ def main():
     print("Type 'models' to see available models")
     print("-" * 50)
     
+    # Stream tokens to the terminal and report latency after every call
+    printer = TokenPrinter()
+    add_call_observer(printer.on_call)
+    stream = not args.no_stream
+    
     try:
-        agent = ModelAwareAgent(args.model)
+        agent = ModelAwareAgent(args.model, stream=stream, on_delta=printer.on_delta)
         model_info = agent.get_model_info()
+        
+        # Open API connections while the user types the first query
+        warm_up(agent.config)
         print("Agent initialized successfully!")
         print(f"Using model: {model_info['display_name']}")
         print("Note: Make sure to set your OpenRouter API key in config.yaml")
@@ -68,7 +105,7 @@ def main():
             if user_input.lower().startswith('switch '):
                 model_name = user_input[7:].strip()
                 try:
-                    agent = ModelAwareAgent(model_name)
+                    agent = ModelAwareAgent(model_name, stream=stream, on_delta=printer.on_delta)
                     model_info = agent.get_model_info()
                     print(f"Model switched to: {model_info['display_name']}")
                 except ValueError as e:
@@ -81,7 +118,8 @@ def main():
             
             print("Agent: Thinking...")
             response = agent.run(user_input)
-            print(f"Agent: {response}")
+            if not stream:
+                print(f"Agent: {response}")
             
         except KeyboardInterrupt:
             print("\n\nExiting...")
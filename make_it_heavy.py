@@ -2,22 +2,33 @@ import time
 import threading
 import sys
 import argparse
-from orchestrator import TaskOrchestrator
+from orchestrator import TaskOrchestrator, format_agent_inclusion
 from config_utils import check_required_env_vars
+from client_pool import warm_up
+from usage_stats import format_usage, format_phases
+from tracing import format_analysis
 
 
 class OrchestratorCLI:
-    def __init__(self, agent_model=None, no_save=False, output_dir='outputs'):
+    def __init__(self, agent_model=None, no_save=False, output_dir='outputs', hot_reload=False):
         self.orchestrator = TaskOrchestrator(agent_model=agent_model)
         self.start_time = None
         self.running = False
 
+        # Synthesis is printed as it streams; the progress display stops when it starts
+        self.display_lock = threading.Lock()
+        self.synthesis_streaming = False
+        self.orchestrator.on_synthesis_delta = self.on_synthesis_delta
+
         # Configure output settings
         if no_save:
-            self.orchestrator.config['output']['auto_save'] = False
+            self.orchestrator.set_config_overrides({'output': {'auto_save': False}})
         else:
-            self.orchestrator.config['output']['auto_save'] = True
-            self.orchestrator.config['output']['directory'] = output_dir
+            self.orchestrator.set_config_overrides({'output': {'auto_save': True, 'directory': output_dir}})
+
+        # Pick up config.yaml edits between queries
+        if hot_reload:
+            self.orchestrator.enable_hot_reload()
 
         # Get current model configuration
         config = self.orchestrator.get_current_config()
@@ -64,6 +75,9 @@ class OrchestratorCLI:
             return f"{ORANGE}●{RESET} " + dots
         elif status == "COMPLETED":
             return f"{ORANGE}●{RESET} " + f"{ORANGE}:" * 70 + f"{RESET}"
+        elif status == "PARTIAL":
+            # Stopped at its time limit; what it found still goes into the synthesis
+            return f"{ORANGE}◑{RESET} " + f"{ORANGE}:" * 35 + f"{RESET}" + "·" * 35
         elif status.startswith("FAILED"):
             return f"{RED}✗{RESET} " + f"{RED}×" * 70 + f"{RESET}"
         else:
@@ -71,6 +85,10 @@ class OrchestratorCLI:
 
     def update_display(self):
         """Update the console display with current status"""
+        with self.display_lock:
+            self._render_display()
+
+    def _render_display(self):
         if not self.running:
             return
 
@@ -101,6 +119,20 @@ class OrchestratorCLI:
         print()
         sys.stdout.flush()
 
+    def on_synthesis_delta(self, text):
+        """Print synthesis chunks as they arrive, replacing the progress display"""
+        if not self.synthesis_streaming:
+            with self.display_lock:
+                self._render_display()
+                self.running = False
+                self.synthesis_streaming = True
+            print("=" * 80)
+            print("FINAL RESULTS")
+            print("=" * 80)
+            print()
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
     def progress_monitor(self):
         """Monitor and update progress display in separate thread"""
         while self.running:
@@ -111,6 +143,7 @@ class OrchestratorCLI:
         """Run orchestrator task with live progress display"""
         self.start_time = time.time()
         self.running = True
+        self.synthesis_streaming = False
 
         # Start progress monitoring in background thread
         progress_thread = threading.Thread(
@@ -124,6 +157,14 @@ class OrchestratorCLI:
             # Stop progress monitoring
             self.running = False
 
+            # Synthesis already streamed to the terminal
+            if self.synthesis_streaming:
+                print()
+                print()
+                print("=" * 80)
+                self.print_usage()
+                return result
+
             # Final display update
             self.update_display()
 
@@ -135,15 +176,35 @@ class OrchestratorCLI:
             print(result)
             print()
             print("=" * 80)
+            self.print_usage()
 
             return result
 
+        except KeyboardInterrupt:
+            # The run itself has been cancelled by now; stop the progress display too
+            self.running = False
+            raise
         except Exception as e:
             self.running = False
             self.update_display()
             print(f"\nError during orchestration: {str(e)}")
             return None
 
+    def print_usage(self):
+        """Token usage, cost per phase and trace analysis of the last run"""
+        usage = self.orchestrator.last_usage
+        if usage:
+            print(f"TOKENS: {format_usage(usage)}")
+            for line in format_phases(usage):
+                print(f"  {line}")
+        agents = self.orchestrator.last_agents
+        if any(agent['included'] != "synthesis" for agent in agents):
+            print(f"AGENTS: {format_agent_inclusion(agents)}")
+        if self.orchestrator.last_trace_analysis:
+            print(f"TRACE: {', '.join(self.orchestrator.last_trace_paths)}")
+            for line in format_analysis(self.orchestrator.last_trace_analysis):
+                print(f"  {line}")
+
     def interactive_mode(self):
         """Run interactive CLI session"""
         print("Multi-Agent Orchestrator")
@@ -174,6 +235,8 @@ class OrchestratorCLI:
 
         try:
             orchestrator_config = self.orchestrator.config['openrouter']
+            # Open API connections while the user types the first query
+            warm_up(self.orchestrator.config)
             print(f"Using OpenRouter with API key configured")
             print("Orchestrator initialized successfully!")
             print("Note: Make sure to set your OpenRouter API key in config.yaml")
@@ -265,6 +328,8 @@ def main():
                         help='Disable auto-save to markdown file')
     parser.add_argument('--output-dir', default='outputs',
                         help='Directory to save output files (default: outputs)')
+    parser.add_argument('--hot-reload', action='store_true',
+                        help='Reload config.yaml changes between queries without restarting')
 
     args = parser.parse_args()
 
@@ -285,7 +350,8 @@ def main():
         return
 
     cli = OrchestratorCLI(agent_model=args.agent_model,
-                          no_save=args.no_save, output_dir=args.output_dir)
+                          no_save=args.no_save, output_dir=args.output_dir,
+                          hot_reload=args.hot_reload)
     cli.interactive_mode()
 
 
@@ -6,10 +6,85 @@ allowing the orchestrator to use kimi-k2 while agents can use different models.
 """
 
 import json
+import time
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
-from openai import OpenAI
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Iterable, Callable
 from config_utils import load_config
+from async_runtime import run_sync, to_thread, time_left, check_deadline, DeadlineExceeded
+from client_pool import client_pool
+from streaming import StreamAccumulator, call_metrics, notify_call_observers
+from llm_cache import get_llm_cache, request_key
+from context_compaction import ContextCompactor, format_compaction, estimate_tokens
+from usage_stats import record_compaction, timed_tool_call, current_phase, set_phase
+from tracing import span, record_span
+from resilience import (CircuitOpenError, get_resilience_config, get_breaker, get_latency_tracker,
+                        hedge_delay, hedged, is_retryable, backoff_delay)
+from scheduler import NOOP_SLOT, get_scheduler, api_key_id, current_priority, set_priority, iteration_priority
+
+
+def tool_calls_until_completion(tool_calls: List[Any]) -> List[Any]:
+    """
+    Tool calls that should run for one assistant turn
+    
+    Calls after a mark_task_complete are dropped, matching the sequential loop
+    that returned as soon as the completion tool had run.
+    """
+    for index, tool_call in enumerate(tool_calls):
+        if tool_call.function.name == "mark_task_complete":
+            return list(tool_calls[:index + 1])
+    return list(tool_calls)
+
+
+def get_tool_concurrency(config: Dict[str, Any]) -> int:
+    """Per-agent cap on tool calls running at once (agent.max_concurrent_tool_calls)"""
+    return max(1, int(config.get('agent', {}).get('max_concurrent_tool_calls', 4)))
+
+
+def with_cache_breakpoints(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copy of messages with cache_control markers for explicit prompt caching
+    
+    One breakpoint follows the system prompt (tools and system prompt are
+    shared by every agent in a run), another follows the newest user or tool
+    message, so each iteration reuses the history cached by the previous one.
+    The caller's messages are not modified.
+    """
+    marked = list(messages)
+    targets = []
+    if marked and marked[0].get('role') == 'system':
+        targets.append(0)
+    if len(marked) > 1 and marked[-1].get('role') in ('user', 'tool'):
+        targets.append(len(marked) - 1)
+    
+    for index in targets:
+        message = dict(marked[index])
+        content = message.get('content')
+        if isinstance(content, str) and content:
+            message['content'] = [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]
+        elif isinstance(content, (list, tuple)) and content:
+            parts = [dict(part) for part in content]
+            parts[-1]['cache_control'] = {"type": "ephemeral"}
+            message['content'] = parts
+        marked[index] = message
+    return marked
+
+
+def _until_deadline(call_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Cap a request's HTTP timeout at the time left before the current deadline"""
+    timeout = time_left()
+    return call_params if timeout is None else dict(call_params, timeout=timeout)
+
+
+def _record_hedge():
+    """Mark a hedged duplicate request in the trace"""
+    now = time.perf_counter()
+    record_span("hedge", None, now, now)
+
+
+# Upstream provider that last served each (API key, model), shared by every provider of it
+_upstreams: Dict[tuple, str] = {}
 
 
 class BaseModelProvider(ABC):
@@ -25,11 +100,79 @@ class BaseModelProvider(ABC):
         """Initialize the API client for this provider"""
         pass
     
+    def call_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None, max_tokens: Optional[int] = None,
+                 stream: bool = False, on_delta: Optional[Callable[[str], None]] = None,
+                 config: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Make API call to the model, through the LLM response cache when enabled
+        
+        With stream=True the response is read incrementally, content deltas are
+        passed to on_delta as they arrive, and the reassembled ChatCompletion is
+        returned once the stream ends. llm_cache settings are read from
+        `config` when given, and from the provider's config otherwise.
+        """
+        with span(f"llm {self.get_model_name()}", "local", model=self.get_model_name(), stream=stream) as llm_span:
+            cache = get_llm_cache(config if config is not None else self.config)
+            if cache is None:
+                return self._call_llm(messages, tools, max_tokens, stream, on_delta)
+            
+            started = time.perf_counter()
+            key = request_key(self.get_model_name(), messages, tools, max_tokens)
+            response, cache_hit = cache.get_or_call(
+                key, self.get_model_name(),
+                lambda: self._call_llm(messages, tools, max_tokens, stream, on_delta)
+            )
+            llm_span.set(cache_hit=cache_hit)
+            if cache_hit:
+                self._replay_cached(response, started, stream, on_delta)
+            return response
+    
+    async def acall_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None, max_tokens: Optional[int] = None,
+                        stream: bool = False, on_delta: Optional[Callable[[str], None]] = None,
+                        config: Optional[Dict[str, Any]] = None) -> Any:
+        """Async API call, through the LLM response cache when enabled"""
+        with span(f"llm {self.get_model_name()}", "local", model=self.get_model_name(), stream=stream) as llm_span:
+            cache = get_llm_cache(config if config is not None else self.config)
+            if cache is None:
+                return await self._acall_llm(messages, tools, max_tokens, stream, on_delta)
+            
+            started = time.perf_counter()
+            key = request_key(self.get_model_name(), messages, tools, max_tokens)
+            response, cache_hit = await cache.aget_or_call(
+                key, self.get_model_name(),
+                lambda: self._acall_llm(messages, tools, max_tokens, stream, on_delta)
+            )
+            llm_span.set(cache_hit=cache_hit)
+            if cache_hit:
+                self._replay_cached(response, started, stream, on_delta)
+            return response
+    
     @abstractmethod
-    def call_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None, max_tokens: Optional[int] = None) -> Any:
-        """Make API call to the model"""
+    def _call_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]], max_tokens: Optional[int],
+                  stream: bool, on_delta: Optional[Callable[[str], None]]) -> Any:
+        """Make the API call (no caching)"""
         pass
     
+    async def _acall_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]], max_tokens: Optional[int],
+                         stream: bool, on_delta: Optional[Callable[[str], None]]) -> Any:
+        """Async API call; providers without a native async client run _call_llm in a worker thread"""
+        return await to_thread(self._call_llm, messages, tools, max_tokens, stream, on_delta)
+    
+    def _replay_cached(self, response: Any, started: float, stream: bool, on_delta: Optional[Callable[[str], None]]):
+        """Deliver a cached (or coalesced) response's content to a streaming caller and report the call"""
+        content = response.choices[0].message.content if response.choices else None
+        if stream and on_delta is not None and content:
+            on_delta(content)
+        metrics = call_metrics(self.get_model_name(), response, started, None, stream, cache_hit=True)
+        metrics["cost"] = 0.0
+        notify_call_observers(metrics)
+    
+    def _record_call(self, response: Any, started: float, ttft: Optional[float], streamed: bool):
+        """Report latency, time to first token, tokens/sec and estimated cost of one call to the call observers"""
+        metrics = call_metrics(self.get_model_name(), response, started, ttft, streamed)
+        metrics["cost"] = ModelFactory.estimate_cost(metrics)
+        notify_call_observers(metrics)
+    
     @abstractmethod
     def get_model_name(self) -> str:
         """Get the model name for API calls"""
@@ -39,36 +182,229 @@ class BaseModelProvider(ABC):
 class OpenRouterProvider(BaseModelProvider):
     """OpenRouter provider for kimi-k2, grok-4, o3, and claude-sonnet-4"""
     
-    def __init__(self, config: Dict[str, Any], model_name: str):
+    def __init__(self, config: Dict[str, Any], model_name: str, cache_breakpoints: bool = False):
         self.model_name = model_name
+        # Whether the model needs explicit cache_control markers for prompt caching
+        self.cache_breakpoints = cache_breakpoints
         super().__init__(config)
     
     def _initialize_client(self):
-        """Initialize OpenRouter client"""
-        self.client = OpenAI(
-            base_url=self.config['openrouter']['base_url'],
-            api_key=self.config['openrouter']['api_key']
-        )
+        """Attach the shared, connection-pooled OpenRouter client (it does not retry; _resilient_call does)"""
+        self.client = client_pool.get_client(self.config)
+        # Scheduler limits are per model and per API key
+        self.key_id = api_key_id(self.config['openrouter']['base_url'], self.config['openrouter']['api_key'])
     
-    def call_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None, max_tokens: Optional[int] = None) -> Any:
-        """Make OpenRouter API call"""
-        try:
-            call_params = {
-                "model": self.model_name,
-                "messages": messages
-            }
-            
-            if tools:
-                call_params["tools"] = tools
-                
-            if max_tokens:
-                call_params["max_tokens"] = max_tokens
+    @property
+    def upstream(self) -> Optional[str]:
+        """Upstream provider that served this model last (for any agent); its prompt cache holds our prefix"""
+        return _upstreams.get((self.key_id, self.model_name))
+    
+    @property
+    def async_client(self):
+        """Shared async client for the running event loop"""
+        return client_pool.get_async_client(self.config)
+    
+    def _build_call_params(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]], max_tokens: Optional[int],
+                           stream: bool = False) -> Dict[str, Any]:
+        """Build chat completion parameters shared by the sync and async paths"""
+        prompt_cache = self.config['openrouter'].get('prompt_cache', {})
+        
+        if self.cache_breakpoints and prompt_cache.get('breakpoints', True):
+            messages = with_cache_breakpoints(messages)
+        
+        call_params = {
+            "model": self.model_name,
+            "messages": messages
+        }
+        
+        if tools:
+            call_params["tools"] = list(tools)
             
-            response = self.client.chat.completions.create(**call_params)
-            return response
+        if max_tokens:
+            call_params["max_tokens"] = max_tokens
+        
+        if stream:
+            # Usage arrives in a final chunk when requested
+            call_params["stream"] = True
+            call_params["stream_options"] = {"include_usage": True}
+        
+        # Route repeat calls to the upstream provider whose cache holds the shared prefix
+        if self.upstream and prompt_cache.get('sticky_routing', True):
+            call_params["extra_body"] = {"provider": {"order": [self.upstream], "allow_fallbacks": True}}
+        
+        return call_params
+    
+    def _record_call(self, response: Any, started: float, ttft: Optional[float], streamed: bool):
+        """Report the call and remember which upstream provider served it"""
+        upstream = getattr(response, 'provider', None)
+        if upstream:
+            _upstreams[(self.key_id, self.model_name)] = upstream
+        super()._record_call(response, started, ttft, streamed)
+    
+    def _call_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]], max_tokens: Optional[int],
+                  stream: bool, on_delta: Optional[Callable[[str], None]]) -> Any:
+        """Make OpenRouter API call, retried and falling back to another model when this one is failing"""
+        return self._resilient_call(messages, tools, max_tokens, stream, on_delta, allow_fallback=True)
+    
+    async def _acall_llm(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict]], max_tokens: Optional[int],
+                         stream: bool, on_delta: Optional[Callable[[str], None]]) -> Any:
+        """Make OpenRouter API call on the event loop, retried, hedged and with fallback"""
+        return await self._aresilient_call(messages, tools, max_tokens, stream, on_delta, allow_fallback=True)
+    
+    def _resilient_call(self, messages, tools, max_tokens, stream, on_delta, allow_fallback: bool) -> Any:
+        settings = get_resilience_config(self.config)
+        breaker = get_breaker(self.model_name, settings)
+        call_params = self._build_call_params(messages, tools, max_tokens, stream)
+        retries = 0
+        try:
+            while True:
+                check_deadline()
+                if not breaker.allow():
+                    raise CircuitOpenError("circuit breaker open after repeated failures")
+                try:
+                    response = self._attempt(call_params, stream, on_delta)
+                except Exception as e:
+                    if time_left() == 0:
+                        # Our own deadline cut the request short; that says nothing about the model
+                        breaker.release()
+                        raise DeadlineExceeded(f"deadline reached during call to {self.model_name}") from e
+                    if not is_retryable(e):
+                        # The upstream answered; the request itself is at fault
+                        breaker.record_success()
+                        raise
+                    breaker.record_failure()
+                    retries += 1
+                    if retries > settings['max_retries']:
+                        raise
+                    delay = backoff_delay(retries, settings, e)
+                    left = time_left()
+                    if left is not None and delay >= left:
+                        raise DeadlineExceeded(f"no time left to retry {self.model_name}") from e
+                    with span("retry backoff", "queue", attempt=retries, error=type(e).__name__):
+                        time.sleep(delay)
+                    continue
+                except BaseException:
+                    breaker.release()
+                    raise
+                breaker.record_success()
+                return response
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            fallback = self._fallback_provider(settings) if allow_fallback else None
+            if fallback is not None and (isinstance(e, CircuitOpenError) or is_retryable(e)):
+                return fallback._resilient_call(messages, tools, max_tokens, stream, on_delta, allow_fallback=False)
             raise Exception(f"OpenRouter API call failed for {self.model_name}: {str(e)}")
     
+    async def _aresilient_call(self, messages, tools, max_tokens, stream, on_delta, allow_fallback: bool) -> Any:
+        settings = get_resilience_config(self.config)
+        breaker = get_breaker(self.model_name, settings)
+        call_params = self._build_call_params(messages, tools, max_tokens, stream)
+        retries = 0
+        try:
+            while True:
+                check_deadline()
+                if not breaker.allow():
+                    raise CircuitOpenError("circuit breaker open after repeated failures")
+                # Streams may already have rendered deltas, so only complete responses are hedged
+                delay = None if stream else hedge_delay(self.model_name, settings)
+                try:
+                    response = await hedged(lambda: self._aattempt(call_params, stream, on_delta), delay, on_hedge=_record_hedge)
+                except Exception as e:
+                    if time_left() == 0:
+                        # Our own deadline cut the request short; that says nothing about the model
+                        breaker.release()
+                        raise DeadlineExceeded(f"deadline reached during call to {self.model_name}") from e
+                    if not is_retryable(e):
+                        breaker.record_success()
+                        raise
+                    breaker.record_failure()
+                    retries += 1
+                    if retries > settings['max_retries']:
+                        raise
+                    delay = backoff_delay(retries, settings, e)
+                    left = time_left()
+                    if left is not None and delay >= left:
+                        raise DeadlineExceeded(f"no time left to retry {self.model_name}") from e
+                    with span("retry backoff", "queue", attempt=retries, error=type(e).__name__):
+                        await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    breaker.release()
+                    raise
+                breaker.record_success()
+                return response
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            fallback = self._fallback_provider(settings) if allow_fallback else None
+            if fallback is not None and (isinstance(e, CircuitOpenError) or is_retryable(e)):
+                return await fallback._aresilient_call(messages, tools, max_tokens, stream, on_delta, allow_fallback=False)
+            raise Exception(f"OpenRouter API call failed for {self.model_name}: {str(e)}")
+    
+    def _fallback_provider(self, settings: Dict[str, Any]) -> Optional["OpenRouterProvider"]:
+        """Provider of the configured fallback model (openrouter.resilience.fallbacks), if any"""
+        model_key = next((key for key, model in ModelFactory.MODEL_CONFIGS.items()
+                          if model["model_name"] == self.model_name), None)
+        fallback_key = (settings.get('fallbacks') or {}).get(model_key)
+        if not fallback_key or fallback_key == model_key:
+            return None
+        return ModelFactory(config=self.config).create_provider(fallback_key)
+    
+    def _scheduled(self, call_params: Dict[str, Any], asynchronous: bool):
+        """Slot from the process-wide LLM scheduler (a no-op when it is disabled)"""
+        scheduler = get_scheduler(self.config)
+        if scheduler is None:
+            return nullcontext(NOOP_SLOT)
+        cost = estimate_tokens(call_params['messages']) if scheduler.uses_tokens else 0
+        if asynchronous:
+            return scheduler.aslot(self.model_name, self.key_id, cost)
+        return scheduler.slot(self.model_name, self.key_id, cost)
+    
+    def _attempt(self, call_params: Dict[str, Any], stream: bool, on_delta: Optional[Callable[[str], None]]) -> Any:
+        """One scheduled request; SDK errors propagate unwrapped for the retry logic"""
+        with self._scheduled(call_params, asynchronous=False) as slot:
+            started = time.perf_counter()
+            with span("http", "network", model=self.model_name) as http_span:
+                raw = self.client.chat.completions.with_raw_response.create(**_until_deadline(call_params))
+                slot.observe(raw.headers)
+                if stream:
+                    accumulator = StreamAccumulator(on_delta, started)
+                    for chunk in raw.parse():
+                        accumulator.add(chunk)
+                    response = accumulator.build()
+                    self._record_call(response, started, accumulator.ttft, streamed=True)
+                else:
+                    response = raw.parse()
+                    get_latency_tracker(self.model_name).add(time.perf_counter() - started)
+                    self._record_call(response, started, None, streamed=False)
+            slot.settle(getattr(getattr(response, 'usage', None), 'total_tokens', None))
+        http_span.set(ttft=accumulator.ttft if stream else None, upstream=getattr(response, 'provider', None),
+                      queued=slot.waited)
+        return response
+    
+    async def _aattempt(self, call_params: Dict[str, Any], stream: bool, on_delta: Optional[Callable[[str], None]]) -> Any:
+        """One scheduled request on the event loop; SDK errors propagate unwrapped for the retry logic"""
+        async with self._scheduled(call_params, asynchronous=True) as slot:
+            started = time.perf_counter()
+            with span("http", "network", model=self.model_name) as http_span:
+                raw = await self.async_client.chat.completions.with_raw_response.create(**_until_deadline(call_params))
+                slot.observe(raw.headers)
+                if stream:
+                    accumulator = StreamAccumulator(on_delta, started)
+                    async for chunk in raw.parse():
+                        accumulator.add(chunk)
+                    response = accumulator.build()
+                    self._record_call(response, started, accumulator.ttft, streamed=True)
+                else:
+                    response = raw.parse()
+                    get_latency_tracker(self.model_name).add(time.perf_counter() - started)
+                    self._record_call(response, started, None, streamed=False)
+            slot.settle(getattr(getattr(response, 'usage', None), 'total_tokens', None))
+        http_span.set(ttft=accumulator.ttft if stream else None, upstream=getattr(response, 'provider', None),
+                      queued=slot.waited)
+        return response
+    
     def get_model_name(self) -> str:
         return self.model_name
 
@@ -108,6 +444,7 @@ class ModelFactory:
             "display_name": "Claude Sonnet 4",
             "context_window": 200000,
             "supports_tools": True,
+            "cache_breakpoints": True,
             "recommended_for": ["coding", "reasoning", "analysis"]
         },
         "gemini-2.5-pro": {
@@ -130,11 +467,29 @@ class ModelFactory:
         }
     }
     
-    def __init__(self, config_path: str = "config.yaml"):
-        self.config = load_config(config_path)
+    # Approximate OpenRouter prices in USD per million tokens, used for the run ledger's cost
+    # estimates (check openrouter.ai/models for current rates). cached_input applies to prompt
+    # tokens read from the provider's prompt cache; cache_write to tokens written to it.
+    MODEL_PRICES = {
+        "kimi-k2": {"input": 0.60, "output": 2.50, "cached_input": 0.15},
+        "grok-4": {"input": 3.00, "output": 15.00, "cached_input": 0.75},
+        "o3": {"input": 2.00, "output": 8.00, "cached_input": 0.50},
+        "claude-sonnet-4": {"input": 3.00, "output": 15.00, "cached_input": 0.30, "cache_write": 3.75},
+        "gemini-2.5-pro": {"input": 1.25, "output": 10.00, "cached_input": 0.31},
+        "gpt-4.1": {"input": 2.00, "output": 8.00, "cached_input": 0.50}
+    }
+    
+    def __init__(self, config_path: str = "config.yaml", config: Optional[Dict[str, Any]] = None):
+        self.config = config if config is not None else load_config(config_path)
     
     def create_provider(self, model_key: str) -> BaseModelProvider:
-        """Create a provider instance for the specified model"""
+        """
+        Create a provider for the specified model using this factory's config
+        
+        Providers are cheap: the API clients and their connections come from
+        the process-wide client pool, so each config (and each hot reload or
+        override of it) gets a provider that reads its own settings.
+        """
         if model_key not in self.MODEL_CONFIGS:
             raise ValueError(f"Unsupported model: {model_key}. Available models: {list(self.MODEL_CONFIGS.keys())}")
         
@@ -142,7 +497,10 @@ class ModelFactory:
         provider_type = model_config["provider"]
         
         if provider_type == "openrouter":
-            return OpenRouterProvider(self.config, model_config["model_name"])
+            return OpenRouterProvider(
+                self.config, model_config["model_name"],
+                cache_breakpoints=model_config.get("cache_breakpoints", False)
+            )
         else:
             raise ValueError(f"Unsupported provider: {provider_type}")
     
@@ -156,6 +514,24 @@ class ModelFactory:
             raise ValueError(f"Unknown model: {model_key}")
         return self.MODEL_CONFIGS[model_key]
     
+    @classmethod
+    def estimate_cost(cls, metrics: Dict[str, Any]) -> Optional[float]:
+        """Estimated USD cost of one call from its metrics; None for models without a price"""
+        model_key = next((key for key, model in cls.MODEL_CONFIGS.items()
+                          if model["model_name"] == metrics.get("model")), None)
+        prices = cls.MODEL_PRICES.get(model_key)
+        if prices is None:
+            return None
+        
+        cached = metrics.get("cached_tokens", 0)
+        cache_write = metrics.get("cache_write_tokens", 0)
+        uncached = max(0, metrics.get("prompt_tokens", 0) - cached - cache_write)
+        cost = (uncached * prices["input"] +
+                cached * prices.get("cached_input", prices["input"]) +
+                cache_write * prices.get("cache_write", prices["input"]) +
+                metrics.get("completion_tokens", 0) * prices["output"])
+        return cost / 1_000_000
+    
     def get_orchestrator_model(self) -> str:
         """Get the recommended model for orchestration (kimi-k2 as per requirements)"""
         return "kimi-k2"
@@ -168,26 +544,69 @@ class ModelFactory:
 class ModelAwareAgent:
     """Enhanced agent class that can use different models"""
     
-    def __init__(self, model_key: str, config_path: str = "config.yaml", silent: bool = False):
+    def __init__(self, model_key: str, config_path: str = "config.yaml", silent: bool = False, config: Optional[Dict[str, Any]] = None,
+                 stream: Optional[bool] = None, on_delta: Optional[Callable[[str], None]] = None):
         self.model_key = model_key
         self.silent = silent
         
-        # Load configuration
-        self.config = load_config(config_path)
+        # Load configuration (callers such as the orchestrator pass their own)
+        self.config = config if config is not None else load_config(config_path)
+        
+        # Token streaming: on_delta receives content as it is generated
+        self.stream = stream if stream is not None else bool(self.config.get('agent', {}).get('stream', False))
+        self.on_delta = on_delta
         
         # Create model provider
-        self.factory = ModelFactory(config_path)
+        self.factory = ModelFactory(config_path, config=self.config)
         self.provider = self.factory.create_provider(model_key)
         
-        # Import and initialize tools
-        from tools import discover_tools
-        self.discovered_tools = discover_tools(self.config, silent=self.silent)
-        self.tools = [tool.to_openrouter_schema() for tool in self.discovered_tools.values()]
-        self.tool_mapping = {name: tool.execute for name, tool in self.discovered_tools.items()}
+        # Shared, pre-serialized tools (discovered once per process)
+        from tools import tool_registry
+        self.use_toolset(tool_registry.toolset(self.config, silent=self.silent))
+        
+        # Keeps the growing history under a budget derived from the model's context window
+        self.compactor = ContextCompactor(
+            self.factory.get_model_info(model_key)['context_window'],
+            self.config.get('agent', {}).get('compaction')
+        )
+        self.compaction_stats: List[Dict[str, Any]] = []
+        
+        # Assistant content of the current run, kept so a cancelled run can still return it
+        self.collected_content: List[str] = []
+    
+    def partial_response(self) -> str:
+        """Assistant content gathered so far (e.g. by a run cut off at its deadline)"""
+        return "\n\n".join(self.collected_content)
+    
+    def use_toolset(self, toolset):
+        """Expose the given ToolSet (or filtered view) to this agent"""
+        self.toolset = toolset
+        self.discovered_tools = toolset.tools
+        self.tools = toolset.schemas
+        self.tool_mapping = toolset.mapping
+    
+    def remove_tools(self, names: Optional[Iterable[str]] = None):
+        """Hide tools from this agent; removes every tool when names is None"""
+        self.use_toolset(self.toolset.without(names))
     
     def call_llm(self, messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> Any:
         """Make API call using the configured model provider"""
-        return self.provider.call_llm(messages, self.tools, max_tokens)
+        return self.provider.call_llm(messages, self.tools, max_tokens, self.stream, self.on_delta, config=self.config)
+    
+    async def acall_llm(self, messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> Any:
+        """Async API call using the configured model provider"""
+        return await self.provider.acall_llm(messages, self.tools, max_tokens, self.stream, self.on_delta, config=self.config)
+    
+    def compact_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run the history through the compactor, recording statistics when it compacts"""
+        with span("compact", "local"):
+            compacted, stats = self.compactor.compact(messages)
+        if stats is not None:
+            self.compaction_stats.append(stats)
+            record_compaction(stats)
+            if not self.silent:
+                print(f"🗜️  Context compacted: {format_compaction(stats)}")
+        return compacted
     
     def handle_tool_call(self, tool_call):
         """Handle a tool call and return the result message"""
@@ -198,7 +617,8 @@ class ModelAwareAgent:
             
             # Call appropriate tool from tool_mapping
             if tool_name in self.tool_mapping:
-                tool_result = self.tool_mapping[tool_name](**tool_args)
+                with timed_tool_call(tool_name), span(f"tool {tool_name}", "local", tool=tool_name):
+                    tool_result = self.tool_mapping[tool_name](**tool_args)
             else:
                 tool_result = {"error": f"Unknown tool: {tool_name}"}
             
@@ -218,8 +638,82 @@ class ModelAwareAgent:
                 "content": json.dumps({"error": f"Tool execution failed: {str(e)}"})
             }
     
+    async def ahandle_tool_call(self, tool_call):
+        """Handle a tool call without blocking the event loop (recorded and replayed by the LLM cache)"""
+        cache = get_llm_cache(self.config)
+        if cache is None:
+            return await self._ahandle_tool_call(tool_call)
+        
+        async def run():
+            return (await self._ahandle_tool_call(tool_call))["content"]
+        
+        content = await cache.arun_tool(tool_call.function.name, tool_call.function.arguments, run)
+        return {
+            "role": "tool",
+            "tool_call_id": tool_call.id,
+            "name": tool_call.function.name,
+            "content": content
+        }
+    
+    async def _ahandle_tool_call(self, tool_call):
+        try:
+            # Extract tool name and arguments
+            tool_name = tool_call.function.name
+            tool_args = json.loads(tool_call.function.arguments)
+            
+            # Call appropriate tool from the agent's tool view
+            if tool_name in self.discovered_tools:
+                with timed_tool_call(tool_name), span(f"tool {tool_name}", "local", tool=tool_name):
+                    tool_result = await self.discovered_tools[tool_name].aexecute(**tool_args)
+            else:
+                tool_result = {"error": f"Unknown tool: {tool_name}"}
+            
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "name": tool_name,
+                "content": json.dumps(tool_result)
+            }
+        
+        except Exception as e:
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "name": tool_name,
+                "content": json.dumps({"error": f"Tool execution failed: {str(e)}"})
+            }
+    
+    async def ahandle_tool_calls(self, tool_calls: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Run one turn's tool calls concurrently, capped per agent
+        
+        Result messages are returned in the original tool_calls order.
+        """
+        semaphore = asyncio.Semaphore(get_tool_concurrency(self.config))
+        
+        async def bounded(tool_call):
+            async with semaphore:
+                return await self.ahandle_tool_call(tool_call)
+        
+        return list(await asyncio.gather(*(bounded(tool_call) for tool_call in tool_calls)))
+    
     def run(self, user_input: str) -> str:
         """Run the agent with user input and return FULL conversation content"""
+        return run_sync(self.arun(user_input))
+    
+    async def arun(self, user_input: str) -> str:
+        """Async agent loop; returns FULL conversation content"""
+        # Calls are tagged "<caller's phase> iteration N" in the run ledger
+        base_phase = current_phase()
+        # Callers may pin a scheduler priority (synthesis); otherwise later iterations go first
+        base_priority = current_priority()
+        try:
+            return await self._agent_loop(user_input, base_phase, base_priority)
+        finally:
+            set_phase(base_phase)
+            set_priority(base_priority)
+    
+    async def _agent_loop(self, user_input: str, base_phase: Optional[str], base_priority: Optional[int] = None) -> str:
         # Initialize messages with system prompt and user input
         messages = [
             {
@@ -233,7 +727,7 @@ class ModelAwareAgent:
         ]
         
         # Track all assistant responses for full content capture
-        full_response_content = []
+        full_response_content = self.collected_content = []
         
         # Implement agentic loop
         max_iterations = self.config.get('agent', {}).get('max_iterations', 10)
@@ -241,52 +735,52 @@ class ModelAwareAgent:
         
         while iteration < max_iterations:
             iteration += 1
-            if not self.silent:
-                model_info = self.factory.get_model_info(self.model_key)
-                print(f"🔄 Agent iteration {iteration}/{max_iterations} using {model_info['display_name']}")
-            
-            # Call LLM
-            response = self.call_llm(messages)
-            
-            # Add the response to messages
-            assistant_message = response.choices[0].message
-            messages.append({
-                "role": "assistant",
-                "content": assistant_message.content,
-                "tool_calls": assistant_message.tool_calls
-            })
-            
-            # Capture assistant content for full response
-            if assistant_message.content:
-                full_response_content.append(assistant_message.content)
-            
-            # Check if there are tool calls
-            if assistant_message.tool_calls:
+            set_phase(f"{base_phase or 'agent'} iteration {iteration}")
+            set_priority(iteration_priority(iteration) if base_priority is None else base_priority)
+            with span(f"iteration {iteration}", iteration=iteration):
                 if not self.silent:
-                    print(f"🔧 Agent making {len(assistant_message.tool_calls)} tool call(s)")
-                # Handle each tool call
-                task_completed = False
-                for tool_call in assistant_message.tool_calls:
+                    model_info = self.factory.get_model_info(self.model_key)
+                    print(f"🔄 Agent iteration {iteration}/{max_iterations} using {model_info['display_name']}")
+                
+                # Shrink old tool results and turns once the history nears its token budget
+                messages = self.compact_messages(messages)
+                
+                # Call LLM
+                response = await self.acall_llm(messages)
+                
+                # Add the response to messages
+                assistant_message = response.choices[0].message
+                messages.append({
+                    "role": "assistant",
+                    "content": assistant_message.content,
+                    "tool_calls": assistant_message.tool_calls
+                })
+                
+                # Capture assistant content for full response
+                if assistant_message.content:
+                    full_response_content.append(assistant_message.content)
+                
+                # Check if there are tool calls
+                if assistant_message.tool_calls:
                     if not self.silent:
-                        print(f"   📞 Calling tool: {tool_call.function.name}")
-                    tool_result = self.handle_tool_call(tool_call)
-                    messages.append(tool_result)
+                        print(f"🔧 Agent making {len(assistant_message.tool_calls)} tool call(s)")
+                    # Handle this turn's tool calls concurrently
+                    tool_calls = tool_calls_until_completion(assistant_message.tool_calls)
+                    if not self.silent:
+                        for tool_call in tool_calls:
+                            print(f"   📞 Calling tool: {tool_call.function.name}")
+                    messages.extend(await self.ahandle_tool_calls(tool_calls))
                     
-                    # Check if this was the task completion tool
-                    if tool_call.function.name == "mark_task_complete":
-                        task_completed = True
+                    # Check if the task completion tool was called
+                    if tool_calls[-1].function.name == "mark_task_complete":
                         if not self.silent:
                             print("✅ Task completion tool called - exiting loop")
                         # Return FULL conversation content, not just completion message
                         return "\n\n".join(full_response_content)
+                else:
+                    if not self.silent:
+                        print("💭 Agent responded without tool calls - continuing loop")
                 
-                # If task was completed, we already returned above
-                if task_completed:
-                    return "\n\n".join(full_response_content)
-            else:
-                if not self.silent:
-                    print("💭 Agent responded without tool calls - continuing loop")
-            
             # Continue the loop regardless of whether there were tool calls or not
         
         # If max iterations reached, return whatever content we gathered
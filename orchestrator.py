@@ -1,24 +1,205 @@
+import os
 import json
 import time
+import asyncio
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
-from agent import OpenRouterAgent
-from model_factory import ModelFactory, ModelAwareAgent
-from config_utils import load_config
+import math
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from model_factory import ModelFactory, ModelAwareAgent, get_tool_concurrency
+from context_compaction import CHARS_PER_TOKEN
+from config_utils import load_config, merge_config, ConfigWatcher
+from async_runtime import run_sync, to_thread, run_with_deadline, deadline, time_left, reserve_threads
+from usage_stats import collect_usage, phase
+from tracing import span, collect_trace, get_tracing_config, analyze
+from scheduler import priority, PRIORITY_DECOMPOSE, PRIORITY_SYNTHESIS
+
+# Seconds past run_timeout before a run still unwinding is cut off outright
+RUN_DEADLINE_GRACE = 5.0
+
+# Heading of the follow-up section built from agents that missed the synthesis
+LATE_MERGE_SEPARATOR = "\n\n---\n\n## Additional Findings\n\n"
+
+DEFAULT_LATE_MERGE_PROMPT = """Here is a research report:
+
+{answer}
+
+{num_responses} more research agent(s) finished after it was written:
+
+{agent_responses}
+Write only a short addendum with what these findings add to or change in the report. Do not repeat the report. DO NOT call any tools or functions."""
+
+DEFAULT_TREE_MERGE_PROMPT = """Merge these {num_responses} research notes on the same query into one consolidated draft.
+
+{agent_responses}
+Keep every distinct fact, figure, example and source, and note where the notes disagree. Drop repetition. The draft will be combined with other drafts later, so write dense notes rather than a polished report. DO NOT call any tools or functions."""
+
+DEFAULT_DRAFT_MERGE_PROMPT = """Here is a running draft that consolidates research notes on a query:
+
+{draft}
+
+Fold in {num_responses} new research note(s):
+
+{agent_responses}
+Return the complete updated draft. Keep every distinct fact, figure, example and source from both the draft and the new notes, and note where they disagree. Write dense notes rather than a polished report. DO NOT call any tools or functions."""
+
+# Share of the synthesis model's context window a tree-synthesis prompt may fill
+TREE_CONTEXT_FRACTION = 0.8
+
+
+def format_agent_inclusion(agents: List[Dict[str, Any]]) -> str:
+    """One-line summary of which agents made it into the answer ("3/4 in synthesis • late merge: 2")"""
+    in_synthesis = [a for a in agents if a['included'] == "synthesis"]
+    text = f"{len(in_synthesis)}/{len(agents)} in synthesis"
+    for included in ("late merge", "dropped", "excluded"):
+        ids = [str(a['agent']) for a in agents if a['included'] == included]
+        if ids:
+            text += f" • {included}: {', '.join(ids)}"
+    return text
+
+def _agent_sections(responses: List[str], results: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """(label, text) per agent response, flagging ones cut off at their time limit"""
+    sections = []
+    for i, (response, result) in enumerate(zip(responses, results), 1):
+        note = " (INCOMPLETE: stopped at its time limit)" if result["status"] == "partial" else ""
+        sections.append((f"AGENT {i} RESPONSE{note}", response))
+    return sections
+
+
+def _result_sections(results: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """(label, text) per agent result, numbered by agent"""
+    sections = []
+    for result in results:
+        note = " (INCOMPLETE: stopped at its time limit)" if result["status"] == "partial" else ""
+        sections.append((f"AGENT {result['agent_id'] + 1} RESPONSE{note}", result["response"]))
+    return sections
+
+
+def _format_sections(sections: List[Tuple[str, str]]) -> str:
+    return "".join(f"=== {label} ===\n{text}\n\n" for label, text in sections)
+
+
+def _section_tokens(sections: List[Tuple[str, str]]) -> int:
+    return sum(len(text) // CHARS_PER_TOKEN for _, text in sections)
+
+
+def _tree_groups(sections: List[Tuple[str, str]], budget: int, fan_in: int) -> List[List[Tuple[str, str]]]:
+    """
+    Split sections into balanced groups that each fit `budget` tokens
+
+    Sections over half the budget are clipped so every group can take at
+    least two, which guarantees each tree level shrinks the input.
+    """
+    limit = max(1, budget // 2)
+    sections = [(label, text if len(text) // CHARS_PER_TOKEN <= limit else text[:limit * CHARS_PER_TOKEN] + "\n[...truncated]")
+                for label, text in sections]
+    largest = max(1, max(len(text) // CHARS_PER_TOKEN for _, text in sections))
+    size = max(2, min(fan_in, budget // largest))
+    count = math.ceil(len(sections) / size)
+    # Spread sections evenly: group sizes differ by at most one
+    bounds = [round(i * len(sections) / count) for i in range(count + 1)]
+    return [sections[bounds[i]:bounds[i + 1]] for i in range(count)]
+
+
+class IncrementalSynthesis:
+    """
+    Running synthesis draft for aggregation_strategy "pipeline"
+    
+    Agent results are folded into the draft while the other agents are still
+    working, one merge call at a time (results that arrive during a merge are
+    folded in together by the next one). When the last agent is in, finish()
+    abandons a merge still in flight - waiting for it would cost more than
+    it saves - and runs the final synthesis over the draft plus everything
+    not folded in yet.
+    """
+    
+    def __init__(self, orchestrator: "TaskOrchestrator"):
+        self.orchestrator = orchestrator
+        self.draft: Optional[str] = None
+        self.draft_label = ""
+        self.folded = 0
+        self.pending: List[Dict[str, Any]] = []
+        self._closing = False
+        self._worker: Optional["asyncio.Future"] = None
+    
+    def add(self, result: Dict[str, Any]):
+        """Queue an agent result for the draft (failed agents are ignored)"""
+        if result["status"] not in ("success", "partial"):
+            return
+        self.pending.append(result)
+        if not self._closing and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.ensure_future(self._fold())
+    
+    async def _fold(self):
+        with phase("synthesis draft"), priority(PRIORITY_SYNTHESIS):
+            while self.pending and not self._closing:
+                batch, self.pending = self.pending, []
+                if self.draft is None and len(batch) == 1:
+                    # The first response is the first draft
+                    (self.draft_label, self.draft), = _result_sections(batch)
+                    self.folded = 1
+                    continue
+                try:
+                    self.draft = await self.orchestrator._fold_into_draft(self.draft, batch)
+                    self.folded += len(batch)
+                    self.draft_label = f"MERGED DRAFT (from {self.folded} agent responses)"
+                except asyncio.CancelledError:
+                    self.pending = batch + self.pending
+                    raise
+                except Exception as e:
+                    # Leave the batch for the final pass
+                    self.pending = batch + self.pending
+                    if not self.orchestrator.silent:
+                        print(f"⚠️  Draft merge failed ({str(e) or type(e).__name__}); deferring to the final synthesis")
+                    return
+    
+    def cancel(self):
+        if self._worker is not None:
+            self._worker.cancel()
+    
+    async def finish(self, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """Final synthesis over the draft and the results not folded into it yet"""
+        self._closing = True
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.wait([self._worker])
+        
+        sections = []
+        if self.draft is not None:
+            sections.append((self.draft_label, self.draft))
+        sections.extend(_result_sections(sorted(self.pending, key=lambda x: x["agent_id"])))
+        if not sections:
+            return "All agents failed to provide results. Please try again."
+        if len(sections) == 1 and self.folded == 1:
+            return self.draft
+        with span("synthesis", strategy="pipeline", responses=self.folded + len(self.pending)):
+            return await self.orchestrator._synthesize_sections(sections, on_delta)
+
 
 class TaskOrchestrator:
-    def __init__(self, config_path="config.yaml", silent=False, agent_model=None):
-        # Load configuration
-        self.config = load_config(config_path)
+    def __init__(self, config_path="config.yaml", silent=False, agent_model=None, config_overrides=None):
+        # Load configuration (shared, read-only; overrides produce a private copy)
+        self.config_path = config_path
+        self.config_overrides = config_overrides or {}
+        self.config = merge_config(load_config(config_path), self.config_overrides)
         
         self.num_agents = self.config['orchestrator']['parallel_agents']
         self.task_timeout = self.config['orchestrator']['task_timeout']
+        self.run_timeout = self.config['orchestrator'].get('run_timeout')
+        self.synthesis_reserve = self.config['orchestrator'].get('synthesis_reserve', 60)
+        self.quorum = self.config['orchestrator'].get('quorum', 1.0)
+        self.straggler_grace = self.config['orchestrator'].get('straggler_grace', 30)
+        self.late_results = self.config['orchestrator'].get('late_results', "merge")
+        self.tree_fan_in = max(2, self.config['orchestrator'].get('tree_fan_in', 8))
+        self.tree_draft_max_tokens = self.config['orchestrator'].get('tree_draft_max_tokens', 8000)
         self.aggregation_strategy = self.config['orchestrator']['aggregation_strategy']
         self.silent = silent
         
+        # Hot reload: new configs are staged here and applied between runs
+        self._config_watcher = None
+        self._pending_config = None
+        
         # Initialize model factory
-        self.model_factory = ModelFactory(config_path)
+        self.model_factory = ModelFactory(config_path, config=self.config)
         
         # Set orchestrator model (fixed as kimi-k2 per requirements)
         self.orchestrator_model = self.config['models']['orchestrator']['model_key']
@@ -33,12 +214,33 @@ class TaskOrchestrator:
         self.agent_progress = {}
         self.agent_results = {}
         self.progress_lock = threading.Lock()
+        
+        # Receives synthesis text as it streams (set by CLIs that render it live)
+        self.on_synthesis_delta: Optional[Callable[[str], None]] = None
+        # Called with (agent_id, status) on every agent progress change (e.g. by the HTTP server)
+        self.on_agent_progress: Optional[Callable[[int, str], None]] = None
+        
+        # Ledger summary (tokens, cost, time per phase) of the last orchestrate run
+        self.last_usage: Optional[Dict[str, Any]] = None
+        self.last_output_path: Optional[str] = None
+        # Per agent: status and whether it made the synthesis, a late merge, or neither
+        self.last_agents: List[Dict[str, Any]] = []
+        # Whether the last run's synthesis failed and returned the agents' responses concatenated
+        self.last_synthesis_failed = False
+        
+        # Trace files and analysis of the last run (tracing.enabled)
+        self.last_trace_paths: List[str] = []
+        self.last_trace_analysis: Optional[Dict[str, Any]] = None
     
     def decompose_task(self, user_input: str, num_agents: int) -> List[str]:
         """Use AI to dynamically generate different questions based on user input"""
+        return run_sync(self.decompose_task_async(user_input, num_agents))
+    
+    async def decompose_task_async(self, user_input: str, num_agents: int) -> List[str]:
+        """Async question generation; see decompose_task"""
         
         # Create question generation agent using orchestrator model (kimi-k2)
-        question_agent = ModelAwareAgent(self.orchestrator_model, silent=True)
+        question_agent = ModelAwareAgent(self.orchestrator_model, config_path=self.config_path, silent=True, config=self.config)
         
         # Get question generation prompt from config
         prompt_template = self.config['orchestrator']['question_generation_prompt']
@@ -48,12 +250,13 @@ class TaskOrchestrator:
         )
         
         # Remove task completion tool to avoid issues
-        question_agent.tools = [tool for tool in question_agent.tools if tool.get('function', {}).get('name') != 'mark_task_complete']
-        question_agent.tool_mapping = {name: func for name, func in question_agent.tool_mapping.items() if name != 'mark_task_complete'}
+        question_agent.remove_tools(['mark_task_complete'])
         
         try:
             # Get AI-generated questions
-            response = question_agent.run(generation_prompt)
+            with span("decompose", num_agents=num_agents):
+                # At most half of the run budget, so the agents get the rest
+                response = await run_with_deadline(question_agent.arun(generation_prompt), self._stage_timeout(0.5))
             
             # Parse JSON response
             questions = json.loads(response.strip())
@@ -64,14 +267,74 @@ class TaskOrchestrator:
             
             return questions
             
-        except (json.JSONDecodeError, ValueError) as e:
-            # Fallback: create simple variations if AI fails
-            return [
+        except (json.JSONDecodeError, ValueError, asyncio.TimeoutError) as e:
+            # Fallback: create simple variations if AI fails or runs out of time (cycled when there are more than four agents)
+            variations = [
                 f"Research comprehensive information about: {user_input}",
                 f"Analyze and provide insights about: {user_input}",
                 f"Find alternative perspectives on: {user_input}",
                 f"Verify and cross-check facts about: {user_input}"
-            ][:num_agents]
+            ]
+            return [variations[i % len(variations)] for i in range(num_agents)]
+    
+    def set_config_overrides(self, overrides: Dict[str, Any]):
+        """Deep-merge overrides (e.g. output settings from the CLI) into this orchestrator's config"""
+        self.config_overrides = merge_config(self.config_overrides, overrides)
+        self._apply_config(load_config(self.config_path))
+    
+    def enable_hot_reload(self, interval: float = 2.0):
+        """
+        Watch the config file and pick up changes without restarting
+        
+        Changed settings (parallel_agents, task_timeout, models, prompts, ...)
+        take effect at the start of the next orchestrate run.
+        """
+        if self._config_watcher is None:
+            self._config_watcher = ConfigWatcher(self.config_path, interval)
+            self._config_watcher.subscribe(self._stage_config)
+            self._config_watcher.start()
+    
+    def disable_hot_reload(self):
+        """Stop watching the config file"""
+        if self._config_watcher is not None:
+            self._config_watcher.stop()
+            self._config_watcher = None
+    
+    def _stage_config(self, config):
+        """Watcher callback; the swap happens in _apply_pending_config"""
+        self._pending_config = config
+    
+    def _apply_pending_config(self):
+        """Apply a hot-reloaded config, if one arrived since the last run"""
+        config, self._pending_config = self._pending_config, None
+        if config is not None:
+            self._apply_config(config)
+            if not self.silent:
+                print("🔁 Configuration reloaded")
+    
+    def _apply_config(self, config):
+        """Swap in a new base config, re-applying local overrides"""
+        previous = self.config
+        self.config = merge_config(config, self.config_overrides)
+        self.num_agents = self.config['orchestrator']['parallel_agents']
+        self.task_timeout = self.config['orchestrator']['task_timeout']
+        self.run_timeout = self.config['orchestrator'].get('run_timeout')
+        self.synthesis_reserve = self.config['orchestrator'].get('synthesis_reserve', 60)
+        self.quorum = self.config['orchestrator'].get('quorum', 1.0)
+        self.straggler_grace = self.config['orchestrator'].get('straggler_grace', 30)
+        self.late_results = self.config['orchestrator'].get('late_results', "merge")
+        self.tree_fan_in = max(2, self.config['orchestrator'].get('tree_fan_in', 8))
+        self.tree_draft_max_tokens = self.config['orchestrator'].get('tree_draft_max_tokens', 8000)
+        self.aggregation_strategy = self.config['orchestrator']['aggregation_strategy']
+        self.model_factory = ModelFactory(self.config_path, config=self.config)
+        
+        # Follow model changes from the file unless they were switched at runtime
+        previous_models = previous.get('models', {})
+        models = self.config.get('models', {})
+        if self.orchestrator_model == previous_models.get('orchestrator', {}).get('model_key'):
+            self.orchestrator_model = models['orchestrator']['model_key']
+        if self.agent_model == previous_models.get('default_agent', {}).get('model_key'):
+            self.agent_model = models['default_agent']['model_key']
     
     def update_agent_progress(self, agent_id: int, status: str, result: str = None):
         """Thread-safe progress tracking"""
@@ -79,20 +342,34 @@ class TaskOrchestrator:
             self.agent_progress[agent_id] = status
             if result is not None:
                 self.agent_results[agent_id] = result
+        if self.on_agent_progress is not None:
+            self.on_agent_progress(agent_id, status)
     
     def run_agent_parallel(self, agent_id: int, subtask: str) -> Dict[str, Any]:
         """
         Run a single agent with the given subtask.
         Returns result dictionary with agent_id, status, and response.
         """
+        return run_sync(self.run_agent_async(agent_id, subtask))
+    
+    async def run_agent_async(self, agent_id: int, subtask: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Async version of run_agent_parallel; all agents share one event loop
+        
+        An agent still running after `timeout` seconds is cancelled (with its
+        in-flight LLM and tool calls) and returns the content it had gathered,
+        with status "partial" ("timeout" if it had nothing yet).
+        """
+        agent = None
+        start_time = time.time()
         try:
             self.update_agent_progress(agent_id, "PROCESSING...")
             
             # Use model-aware agent with configured model
-            agent = ModelAwareAgent(self.agent_model, silent=True)
+            agent = ModelAwareAgent(self.agent_model, config_path=self.config_path, silent=True, config=self.config)
             
-            start_time = time.time()
-            response = agent.run(subtask)
+            with phase(f"agent {agent_id + 1}"), span(f"agent {agent_id + 1}", agent=agent_id + 1, model=self.agent_model):
+                response = await run_with_deadline(agent.arun(subtask), timeout)
             execution_time = time.time() - start_time
             
             self.update_agent_progress(agent_id, "COMPLETED", response)
@@ -104,6 +381,19 @@ class TaskOrchestrator:
                 "execution_time": execution_time
             }
             
+        except asyncio.TimeoutError:
+            partial = agent.partial_response() if agent is not None else ""
+            if partial:
+                self.update_agent_progress(agent_id, "PARTIAL", partial)
+            else:
+                self.update_agent_progress(agent_id, "FAILED: timeout")
+            return {
+                "agent_id": agent_id,
+                "status": "partial" if partial else "timeout",
+                "response": partial or f"Agent {agent_id + 1} timed out after {time.time() - start_time:.0f}s",
+                "execution_time": time.time() - start_time
+            }
+            
         except Exception as e:
             # Simple error handling
             return {
@@ -113,12 +403,29 @@ class TaskOrchestrator:
                 "execution_time": 0
             }
     
+    def _stage_timeout(self, share: float = 1.0) -> float:
+        """task_timeout, capped at `share` of the run time left before the synthesis_reserve"""
+        left = time_left()
+        if left is None:
+            return self.task_timeout
+        return max(0.0, min(self.task_timeout, (left - self.synthesis_reserve) * share))
+    
+    async def _run_agent_with_timeout(self, agent_id: int, subtask: str) -> Dict[str, Any]:
+        """Run one agent within task_timeout, cut short so synthesis_reserve seconds of the run budget remain"""
+        return await self.run_agent_async(agent_id, subtask, self._stage_timeout())
+    
     def aggregate_results(self, agent_results: List[Dict[str, Any]]) -> str:
         """
         Combine results from all agents into a comprehensive final answer.
         Uses the configured aggregation strategy.
         """
-        successful_results = [r for r in agent_results if r["status"] == "success"]
+        return run_sync(self.aggregate_results_async(agent_results))
+    
+    async def aggregate_results_async(self, agent_results: List[Dict[str, Any]],
+                                      on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """Async version of aggregate_results; on_delta receives streamed synthesis text"""
+        # Agents cut off at their deadline still contribute what they found
+        successful_results = [r for r in agent_results if r["status"] in ("success", "partial")]
         
         if not successful_results:
             return "All agents failed to provide results. Please try again."
@@ -126,42 +433,51 @@ class TaskOrchestrator:
         # Extract responses for aggregation
         responses = [r["response"] for r in successful_results]
         
-        if self.aggregation_strategy == "consensus":
-            return self._aggregate_consensus(responses, successful_results)
-        else:
-            # Default to consensus
-            return self._aggregate_consensus(responses, successful_results)
+        with span("synthesis", strategy=self.aggregation_strategy, responses=len(responses)):
+            if self.aggregation_strategy == "consensus":
+                return await self._aggregate_consensus(responses, successful_results, on_delta)
+            elif self.aggregation_strategy == "tree":
+                return await self._aggregate_tree(responses, successful_results, on_delta)
+            else:
+                # Default to consensus
+                return await self._aggregate_consensus(responses, successful_results, on_delta)
     
-    def _aggregate_consensus(self, responses: List[str], _results: List[Dict[str, Any]]) -> str:
+    async def _aggregate_consensus(self, responses: List[str], results: List[Dict[str, Any]],
+                                   on_delta: Optional[Callable[[str], None]] = None) -> str:
         """
         Use one final AI call to synthesize all agent responses into a coherent answer.
         """
         if len(responses) == 1:
             return responses[0]
         
+        return await self._synthesize_sections(_agent_sections(responses, results), on_delta)
+    
+    async def _synthesize_sections(self, sections: List[Tuple[str, str]],
+                                   on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """One synthesis call over labelled sections (agent responses or merged drafts)"""
         # Create synthesis agent using dedicated synthesis model (large context window)
         synthesis_config = self.config.get('models', {}).get('synthesis', {})
         synthesis_model = synthesis_config.get('model_key', self.orchestrator_model)
-        synthesis_agent = ModelAwareAgent(synthesis_model, silent=True)
+        synthesis_agent = ModelAwareAgent(
+            synthesis_model, config_path=self.config_path, silent=True, config=self.config,
+            stream=synthesis_config.get('stream', True), on_delta=on_delta
+        )
         
         # Set max tokens for synthesis if configured
         synthesis_max_tokens = synthesis_config.get('max_tokens', None)
         
         # Build agent responses section
-        agent_responses_text = ""
-        for i, response in enumerate(responses, 1):
-            agent_responses_text += f"=== AGENT {i} RESPONSE ===\n{response}\n\n"
+        agent_responses_text = _format_sections(sections)
         
         # Get synthesis prompt from config and format it
         synthesis_prompt_template = self.config['orchestrator']['synthesis_prompt']
         synthesis_prompt = synthesis_prompt_template.format(
-            num_responses=len(responses),
+            num_responses=len(sections),
             agent_responses=agent_responses_text
         )
         
         # Completely remove all tools from synthesis agent to force direct response
-        synthesis_agent.tools = []
-        synthesis_agent.tool_mapping = {}
+        synthesis_agent.remove_tools()
         
         # Get the synthesized response with max tokens if configured
         try:
@@ -173,23 +489,108 @@ class TaskOrchestrator:
                     {"role": "system", "content": self.config['system_prompt']},
                     {"role": "user", "content": synthesis_prompt}
                 ]
-                response = synthesis_agent.call_llm(messages, max_tokens=synthesis_max_tokens)
+                # Bounded by the run deadline, like everything else in the run
+                response = await run_with_deadline(synthesis_agent.acall_llm(messages, max_tokens=synthesis_max_tokens), None)
                 final_answer = response.choices[0].message.content
             else:
-                final_answer = synthesis_agent.run(synthesis_prompt)
+                final_answer = await run_with_deadline(synthesis_agent.arun(synthesis_prompt), None)
             return final_answer
         except Exception as e:
             # Log the error for debugging
-            print(f"\n🚨 SYNTHESIS FAILED: {str(e)}")
+            print(f"\n🚨 SYNTHESIS FAILED: {str(e) or type(e).__name__}")
             print("📋 Falling back to concatenated responses\n")
+            self.last_synthesis_failed = True
             # Fallback: if synthesis fails, concatenate responses
             combined = []
-            for i, response in enumerate(responses, 1):
-                combined.append(f"=== Agent {i} Response ===")
-                combined.append(response)
+            for label, text in sections:
+                combined.append(f"=== {label.title()} ===")
+                combined.append(text)
                 combined.append("")
             return "\n".join(combined)
     
+    async def _aggregate_tree(self, responses: List[str], results: List[Dict[str, Any]],
+                              on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Hierarchical (map-reduce) synthesis for large agent fan-outs
+        
+        Groups of at most tree_fan_in responses (fewer if they would not fit
+        the synthesis model's context window) are merged into drafts by
+        parallel calls, the drafts are merged again the same way, and once
+        the remaining drafts fit one prompt they get the ordinary synthesis.
+        Synthesis latency grows with log(N) instead of N.
+        """
+        if len(responses) == 1:
+            return responses[0]
+        
+        synthesis_config = self.config.get('models', {}).get('synthesis', {})
+        synthesis_model = synthesis_config.get('model_key', self.orchestrator_model)
+        context_window = self.model_factory.get_model_info(synthesis_model)['context_window']
+        prompt_tokens = (len(self.config['system_prompt']) + len(self.config['orchestrator']['synthesis_prompt'])) // CHARS_PER_TOKEN
+        final_budget = int(context_window * TREE_CONTEXT_FRACTION) - (synthesis_config.get('max_tokens') or 0) - prompt_tokens
+        draft_budget = int(context_window * TREE_CONTEXT_FRACTION) - self.tree_draft_max_tokens - prompt_tokens
+        
+        sections = _agent_sections(responses, results)
+        level = 1
+        while len(sections) > 1 and (len(sections) > self.tree_fan_in or _section_tokens(sections) > final_budget):
+            groups = _tree_groups(sections, draft_budget, self.tree_fan_in)
+            with span(f"merge level {level}", groups=len(groups), inputs=len(sections)):
+                drafts = await asyncio.gather(*(self._merge_group(group) for group in groups))
+            source = "agent responses" if level == 1 else "drafts"
+            sections = [(f"DRAFT {i} (merged from {len(group)} {source})", draft)
+                        for i, (group, draft) in enumerate(zip(groups, drafts), 1)]
+            level += 1
+        
+        return await self._synthesize_sections(sections, on_delta)
+    
+    async def _fold_into_draft(self, draft: str, results: List[Dict[str, Any]]) -> str:
+        """One incremental (pipeline) merge call: the draft plus newly finished agents' responses"""
+        synthesis_config = self.config.get('models', {}).get('synthesis', {})
+        merge_agent = ModelAwareAgent(
+            synthesis_config.get('model_key', self.orchestrator_model), config_path=self.config_path, silent=True,
+            config=self.config, stream=False
+        )
+        merge_agent.remove_tools()
+        sections = _result_sections(results)
+        if draft is None:
+            prompt = self.config['orchestrator'].get('tree_merge_prompt', DEFAULT_TREE_MERGE_PROMPT).format(
+                num_responses=len(sections), agent_responses=_format_sections(sections)
+            )
+        else:
+            prompt = self.config['orchestrator'].get('draft_merge_prompt', DEFAULT_DRAFT_MERGE_PROMPT).format(
+                draft=draft, num_responses=len(sections), agent_responses=_format_sections(sections)
+            )
+        messages = [
+            {"role": "system", "content": self.config['system_prompt']},
+            {"role": "user", "content": prompt}
+        ]
+        with span("draft merge", inputs=len(sections)):
+            response = await run_with_deadline(merge_agent.acall_llm(messages, max_tokens=self.tree_draft_max_tokens), None)
+        return response.choices[0].message.content or ""
+    
+    async def _merge_group(self, sections: List[Tuple[str, str]]) -> str:
+        """One intermediate tree-synthesis call: merge a group of sections into a draft"""
+        synthesis_config = self.config.get('models', {}).get('synthesis', {})
+        merge_agent = ModelAwareAgent(
+            synthesis_config.get('model_key', self.orchestrator_model), config_path=self.config_path, silent=True,
+            config=self.config, stream=False
+        )
+        merge_agent.remove_tools()
+        prompt = self.config['orchestrator'].get('tree_merge_prompt', DEFAULT_TREE_MERGE_PROMPT).format(
+            num_responses=len(sections), agent_responses=_format_sections(sections)
+        )
+        messages = [
+            {"role": "system", "content": self.config['system_prompt']},
+            {"role": "user", "content": prompt}
+        ]
+        try:
+            with span("merge group", inputs=len(sections)):
+                response = await run_with_deadline(merge_agent.acall_llm(messages, max_tokens=self.tree_draft_max_tokens), None)
+            return response.choices[0].message.content or ""
+        except Exception as e:
+            if not self.silent:
+                print(f"⚠️  Merge of {len(sections)} responses failed ({str(e) or type(e).__name__}); passing them on unmerged")
+            return _format_sections(sections)
+    
     def get_progress_status(self) -> Dict[int, str]:
         """Get current progress status for all agents"""
         with self.progress_lock:
@@ -231,56 +632,273 @@ class TaskOrchestrator:
         Main orchestration method.
         Takes user input, delegates to parallel agents, and returns aggregated result.
         """
+        return run_sync(self.orchestrate_async(user_input))
+    
+    async def orchestrate_async(self, user_input: str):
+        """
+        Async orchestration: decomposition, agent fan-out and synthesis all run
+        as coroutines on one event loop instead of one thread per agent.
+        """
+        # Pick up a hot-reloaded config before anything reads this run's settings
+        self._apply_pending_config()
+        
+        # Threads for the agents' blocking tool calls, on top of the runtime's shared base
+        threads = self.config['orchestrator'].get('worker_threads') or self.num_agents * get_tool_concurrency(self.config)
+        
+        # Record every LLM and tool call made by this run in a ledger (and a trace when enabled)
+        with reserve_threads(threads), collect_usage() as usage, collect_trace(self.config.get('tracing')) as tracer:
+            self.last_output_path, self.last_agents, self.last_synthesis_failed = None, [], False
+            self.last_trace_paths, self.last_trace_analysis = [], None
+            try:
+                with span("orchestrate", agents=self.num_agents, agent_model=self.agent_model):
+                    result = await self._run_within_budget(user_input)
+            finally:
+                self.last_usage = usage.summary()
+                if tracer is not None:
+                    self._save_trace(tracer)
+            
+            # Save the ledger as a JSON sidecar next to the markdown output
+            if self.last_output_path:
+                await to_thread(self._save_ledger, usage.to_dict(), user_input, self.last_output_path)
+            return result
+    
+    async def _run_within_budget(self, user_input: str):
+        """
+        _orchestrate under run_timeout (orchestrator.run_timeout, None = no limit)
         
+        Each stage sizes itself from the time left (agents stop synthesis_reserve
+        seconds early and return partial results; synthesis falls back to the
+        agents' responses), and a run still going RUN_DEADLINE_GRACE seconds
+        past the budget is cancelled outright.
+        """
+        if not self.run_timeout:
+            return await self._orchestrate(user_input)
+        with deadline(self.run_timeout):
+            try:
+                return await asyncio.wait_for(self._orchestrate(user_input), timeout=self.run_timeout + RUN_DEADLINE_GRACE)
+            except asyncio.TimeoutError as e:
+                raise TimeoutError(f"Run exceeded its {self.run_timeout}s budget") from e
+    
+    async def _orchestrate(self, user_input: str):
         # Reset progress tracking
         self.agent_progress = {}
         self.agent_results = {}
         
         # Decompose task into subtasks
-        subtasks = self.decompose_task(user_input, self.num_agents)
+        with phase("decompose"), priority(PRIORITY_DECOMPOSE):
+            subtasks = await self.decompose_task_async(user_input, self.num_agents)
         
         # Initialize progress tracking
         for i in range(self.num_agents):
-            self.agent_progress[i] = "QUEUED"
-        
-        # Execute agents in parallel
-        agent_results = []
+            self.update_agent_progress(i, "QUEUED")
         
-        with ThreadPoolExecutor(max_workers=self.num_agents) as executor:
-            # Submit all agent tasks
-            future_to_agent = {
-                executor.submit(self.run_agent_parallel, i, subtasks[i]): i 
-                for i in range(self.num_agents)
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_agent, timeout=self.task_timeout):
-                try:
-                    result = future.result()
-                    agent_results.append(result)
-                except Exception as e:
-                    agent_id = future_to_agent[future]
-                    agent_results.append({
-                        "agent_id": agent_id,
-                        "status": "timeout",
-                        "response": f"Agent {agent_id + 1} timed out or failed: {str(e)}",
-                        "execution_time": self.task_timeout
-                    })
+        # Execute agents concurrently, each bounded by task_timeout and the run budget
+        agent_tasks = [asyncio.ensure_future(self._run_agent_with_timeout(i, subtasks[i]))
+                       for i in range(self.num_agents)]
+        try:
+            return await self._synthesize(user_input, agent_tasks)
+        finally:
+            # Stragglers must not outlive the run (e.g. when it is cancelled)
+            for task in agent_tasks:
+                task.cancel()
+    
+    async def _synthesize(self, user_input: str, agent_tasks: List["asyncio.Future"]):
+        """Synthesize once the agent quorum is in, then handle the stragglers"""
+        # Pipelined synthesis folds results into a draft while the other agents run
+        pipeline = IncrementalSynthesis(self) if self.aggregation_strategy == "pipeline" else None
+        try:
+            return await self._synthesize_results(user_input, agent_tasks, pipeline)
+        finally:
+            if pipeline is not None:
+                pipeline.cancel()
+    
+    async def _synthesize_results(self, user_input: str, agent_tasks: List["asyncio.Future"],
+                                  pipeline: Optional[IncrementalSynthesis]):
+        agent_results, stragglers = await self._await_quorum(agent_tasks, pipeline.add if pipeline else None)
         
         # Sort results by agent_id for consistent output
         agent_results.sort(key=lambda x: x["agent_id"])
+        self.last_agents = [self._agent_entry(result, "synthesis") for result in agent_results]
+        if stragglers and self.late_results != "merge":
+            await self._drop_stragglers(agent_tasks, stragglers)
+            stragglers = []
+        
+        # Stream the synthesis into the output file (and any live renderer) as it arrives
+        writer = None
+        if self.config.get('output', {}).get('auto_save', False):
+            writer = await to_thread(self._open_output_stream, user_input)
+        
+        def on_delta(text: str):
+            if writer is not None:
+                writer.write(text)
+            if self.on_synthesis_delta is not None:
+                self.on_synthesis_delta(text)
         
         # Aggregate results
-        final_result = self.aggregate_results(agent_results)
+        try:
+            # The synthesis goes ahead of any agent calls still queued (e.g. from another run)
+            with phase("synthesis"), priority(PRIORITY_SYNTHESIS):
+                if pipeline is not None:
+                    final_result = await pipeline.finish(on_delta)
+                else:
+                    final_result = await self.aggregate_results_async(agent_results, on_delta=on_delta)
+            if stragglers:
+                with phase("late merge"), priority(PRIORITY_SYNTHESIS):
+                    final_result = await self._merge_late_results(final_result, agent_tasks, stragglers, on_delta)
+        except BaseException as e:
+            # Keep whatever synthesis text already reached the disk
+            if writer is not None:
+                partial_path = writer.abort(f"synthesis interrupted ({type(e).__name__})")
+                if not self.silent:
+                    print(f"\n⚠️  Partial output kept at: {partial_path}")
+            raise
         
         # Auto-save to markdown file if enabled
-        if self.config.get('output', {}).get('auto_save', False):
-            self._save_output_to_file(user_input, final_result)
+        if writer is not None:
+            self.last_output_path = await to_thread(self._finalize_output, writer, user_input, final_result)
         
+        self.last_agents.sort(key=lambda entry: entry["agent"])
         return final_result
     
+    async def _await_quorum(self, tasks: List["asyncio.Future"],
+                            on_result: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Collect agent results until all are in, or until `quorum` of the agents
+        have returned a usable answer; the synthesis starts right away, and
+        `straggler_grace` only bounds the wait for the rest in the late merge
+        
+        Partial results (agents stopped at task_timeout) count toward the
+        quorum like successes, since they are final and go into the
+        synthesis; failed agents do not. on_result sees each result as it
+        arrives. Returns (results, tasks still running).
+        """
+        needed = max(1, math.ceil(self.quorum * len(tasks)))
+        results = []
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results.append(task.result())
+                if on_result is not None:
+                    on_result(task.result())
+            if sum(r["status"] in ("success", "partial") for r in results) >= needed:
+                break
+        return results, [task for task in tasks if task in pending]
+    
+    async def _drop_stragglers(self, agent_tasks: List["asyncio.Future"], stragglers: List["asyncio.Future"]):
+        """Cancel agents that missed the quorum (late_results: drop)"""
+        for task in stragglers:
+            task.cancel()
+        await asyncio.gather(*stragglers, return_exceptions=True)
+        for agent_id, task in enumerate(agent_tasks):
+            if task in stragglers:
+                self.update_agent_progress(agent_id, "FAILED: dropped")
+                self.last_agents.append({"agent": agent_id + 1, "status": "dropped", "included": "dropped",
+                                         "execution_time": None})
+    
+    async def _merge_late_results(self, answer: str, agent_tasks: List["asyncio.Future"],
+                                  stragglers: List["asyncio.Future"],
+                                  on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Wait up to `straggler_grace` more seconds (within the run deadline) for
+        the agents that missed the synthesis and append a short addendum with
+        what they found (late_results: merge); agents still running then are dropped
+        """
+        finished, running = await asyncio.wait(stragglers, timeout=time_left(self.straggler_grace))
+        if running:
+            await self._drop_stragglers(agent_tasks, [task for task in stragglers if task in running])
+        if not finished:
+            return answer
+        late_results = sorted((task.result() for task in finished), key=lambda x: x["agent_id"])
+        usable = [r for r in late_results if r["status"] in ("success", "partial")]
+        self.last_agents.extend(self._agent_entry(result, "late merge" if result in usable else "excluded")
+                                for result in late_results)
+        if not usable:
+            return answer
+        
+        synthesis_config = self.config.get('models', {}).get('synthesis', {})
+        merge_agent = ModelAwareAgent(
+            synthesis_config.get('model_key', self.orchestrator_model), config_path=self.config_path, silent=True,
+            config=self.config, stream=synthesis_config.get('stream', True), on_delta=on_delta
+        )
+        merge_agent.remove_tools()
+        
+        agent_responses = ""
+        for result in usable:
+            note = " (INCOMPLETE: stopped at its time limit)" if result["status"] == "partial" else ""
+            agent_responses += f"=== AGENT {result['agent_id'] + 1} RESPONSE{note} ===\n{result['response']}\n\n"
+        prompt = self.config['orchestrator'].get('late_merge_prompt', DEFAULT_LATE_MERGE_PROMPT).format(
+            answer=answer, num_responses=len(usable), agent_responses=agent_responses
+        )
+        messages = [
+            {"role": "system", "content": self.config['system_prompt']},
+            {"role": "user", "content": prompt}
+        ]
+        
+        try:
+            if on_delta is not None:
+                on_delta(LATE_MERGE_SEPARATOR)
+            with span("late merge", responses=len(usable)):
+                response = await run_with_deadline(
+                    merge_agent.acall_llm(messages, max_tokens=synthesis_config.get('max_tokens')), None
+                )
+            addendum = response.choices[0].message.content or ""
+        except Exception as e:
+            if not self.silent:
+                print(f"\n⚠️  Late results not merged: {str(e) or type(e).__name__}")
+            for entry in self.last_agents:
+                if entry["included"] == "late merge":
+                    entry["included"] = "excluded"
+            return answer
+        return answer + LATE_MERGE_SEPARATOR + addendum
+    
+    def _agent_entry(self, result: Dict[str, Any], included: str) -> Dict[str, Any]:
+        """Output metadata for one agent"""
+        if result["status"] not in ("success", "partial"):
+            included = "excluded"
+        return {
+            "agent": result["agent_id"] + 1,
+            "status": result["status"],
+            "included": included,
+            "execution_time": round(result["execution_time"], 2),
+        }
+    
+    def _open_output_stream(self, query):
+        """Open the streaming output file; None (plain save at the end) if it cannot be created"""
+        try:
+            from tools.write_output_tool import WriteOutputTool
+            return WriteOutputTool(self.config).open_stream(query)
+        except Exception as e:
+            if not self.silent:
+                print(f"⚠️  Error opening output file: {str(e)}")
+            return None
+    
+    def _finalize_output(self, writer, query, result):
+        """Move the streamed file into place, or save the result normally if it was not streamed; returns the path"""
+        try:
+            if writer.text == result:
+                filepath = writer.finalize()
+                if not self.silent:
+                    # Start a new line after synthesis text rendered live
+                    prefix = "\n" if self.on_synthesis_delta is not None else ""
+                    print(f"{prefix}💾 Output saved to: {filepath}")
+                return filepath
+            
+            # Single-agent result, fallback concatenation or multi-turn synthesis: stream != result
+            if writer.text:
+                partial_path = writer.abort("synthesis did not complete; see the final report")
+                if not self.silent:
+                    print(f"⚠️  Partial synthesis kept at: {partial_path}")
+            else:
+                writer.discard()
+        except Exception as e:
+            if not self.silent:
+                print(f"⚠️  Error finalizing streamed output: {str(e)}")
+        
+        return self._save_output_to_file(query, result)
+    
     def _save_output_to_file(self, query, result):
-        """Save output to markdown file"""
+        """Save output to markdown file; returns its path, or None on failure"""
         try:
             from tools.write_output_tool import WriteOutputTool
             
@@ -294,7 +912,37 @@ class TaskOrchestrator:
                 print(f"💾 Output saved to: {save_result['filepath']}")
             elif not save_result.get('success') and not self.silent:
                 print(f"⚠️  Failed to save output: {save_result.get('error')}")
+            return save_result.get('filepath')
                 
         except Exception as e:
             if not self.silent:
-                print(f"⚠️  Error saving output: {str(e)}")
\ No newline at end of file
+                print(f"⚠️  Error saving output: {str(e)}")
+            return None
+    
+    def _save_trace(self, tracer):
+        """Export the run's trace next to its output name and keep its analysis"""
+        tracing_config = get_tracing_config(self.config.get('tracing'))
+        if self.last_output_path:
+            basename = os.path.splitext(os.path.basename(self.last_output_path))[0]
+        else:
+            basename = time.strftime("%Y%m%d_%H%M%S")
+        try:
+            self.last_trace_paths = tracer.export(tracing_config['dir'], basename, tracing_config['formats'])
+            self.last_trace_analysis = analyze(tracer.finished_spans())
+            if not self.silent:
+                for path in self.last_trace_paths:
+                    print(f"🧭 Trace saved to: {path}")
+        except Exception as e:
+            if not self.silent:
+                print(f"⚠️  Error saving trace: {str(e)}")
+    
+    def _save_ledger(self, ledger, query, output_path):
+        """Write the run ledger to <output>.json next to the markdown output"""
+        ledger_path = os.path.splitext(output_path)[0] + '.json'
+        try:
+            ledger = dict(ledger, query=query, models=self.get_current_config(), agents=self.last_agents)
+            with open(ledger_path, 'w', encoding='utf-8') as f:
+                json.dump(ledger, f, indent=2)
+        except Exception as e:
+            if not self.silent:
+                print(f"⚠️  Error saving run ledger: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,390 @@
+"""
+Shared process pool for CPU-bound tool work
+
+Agents run their tools on threads, so CPU-heavy work (evaluating an
+expression, parsing a large page) holds the GIL and stalls every other
+agent's tool calls and stream handling. Tools declare kind = "cpu" to have
+execute() run in this pool instead (see BaseTool.aexecute), and tools with
+one CPU-heavy step, like SearchTool's extraction of large pages, submit
+just that step with run().
+
+- One pool per process (process_pool in config.yaml; the first config
+  wins), started on first use. Workers are spawned, so they never inherit
+  the runtime's threads or open connections.
+- At most `max_pending` calls are queued or running; further callers wait
+  for a slot (bounded by their deadline) instead of piling up in the pool.
+- bytes/str arguments and results of `shared_memory_bytes` or more travel
+  through multiprocessing.shared_memory instead of being pickled through the
+  pool's pipes; such arguments reach the function as read-only memoryviews.
+  Callers can also fill a SharedBuffer directly (e.g. while downloading).
+- A call still running when its timeout passes cannot be cancelled; its
+  caller gets TimeoutError and the call is left to finish. Only one still
+  running `kill_after` seconds later has its pool retired: new calls go to
+  a fresh pool, and the old pool's workers are killed once the other calls
+  it was running or had queued are done.
+- stats() reports calls, queue wait, busy time and utilization.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from async_runtime import time_left, to_thread
+from tracing import span
+
+DEFAULT_PROCESS_POOL_CONFIG = {
+    "enabled": True,
+    "workers": 0,
+    "max_pending": 64,
+    "shared_memory_bytes": 65536,
+    "kill_after": 120,
+}
+
+# Most workers started when workers is 0 (one per CPU)
+MAX_AUTO_WORKERS = 8
+
+# Pools broken in a row before the pool is given up on (callers then run inline)
+MAX_POOL_RESTARTS = 3
+
+# Config the worker processes were started with (set in each worker)
+_worker_config: Optional[dict] = None
+
+
+def get_process_pool_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge config['process_pool'] over the defaults"""
+    settings = dict(DEFAULT_PROCESS_POOL_CONFIG)
+    settings.update(config.get('process_pool', {}) or {})
+    return settings
+
+
+def worker_config() -> Optional[dict]:
+    """Inside a pool worker: the config the pool was created with (None elsewhere)"""
+    return _worker_config
+
+
+class _SharedRef(NamedTuple):
+    """A bytes/str value left in a shared memory block, by name"""
+    name: str
+    size: int
+    text: bool
+
+
+class SharedBuffer:
+    """
+    Bytes written straight into a shared memory block
+
+    Pass it to ProcessPool.run() like a bytes argument: the worker reads it
+    in place. Use as a context manager; the block is freed on exit.
+    """
+
+    def __init__(self, capacity: int):
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, capacity))
+        self.capacity = capacity
+        self.size = 0
+
+    def view(self) -> memoryview:
+        """Read-only view of the bytes written so far (release it before the buffer closes)"""
+        return self._shm.buf[:self.size].toreadonly()
+
+    def write(self, data: bytes) -> int:
+        """Append data (cut at the capacity); returns the bytes written"""
+        count = min(len(data), self.capacity - self.size)
+        self._shm.buf[self.size:self.size + count] = data[:count]
+        self.size += count
+        return count
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.capacity
+
+    def ref(self) -> _SharedRef:
+        return _SharedRef(self._shm.name, self.size, False)
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "SharedBuffer":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _share_result(value: Any, threshold: int) -> Any:
+    """In the worker: move a large bytes/str result into a new shared memory block"""
+    if not isinstance(value, (bytes, str)) or len(value) < threshold:
+        return value
+    data = value.encode('utf-8') if isinstance(value, str) else value
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    block.buf[:len(data)] = data
+    ref = _SharedRef(block.name, len(data), isinstance(value, str))
+    # The caller unlinks it after reading (workers share the caller's resource tracker)
+    block.close()
+    return ref
+
+
+def _take_result(value: Any) -> Any:
+    """In the caller: read (and free) a result left in shared memory"""
+    if not isinstance(value, _SharedRef):
+        return value
+    block = shared_memory.SharedMemory(name=value.name)
+    try:
+        data = bytes(block.buf[:value.size])
+    finally:
+        block.close()
+        block.unlink()
+    return data.decode('utf-8') if value.text else data
+
+
+def _discard_result(future):
+    if not future.cancelled() and future.exception() is None:
+        _take_result(future.result()[0])
+
+
+def _init_worker(config: dict):
+    global _worker_config
+    _worker_config = config
+
+
+def _invoke(func: Callable[..., Any], args: tuple, kwargs: dict, threshold: int):
+    """Run func in the worker; returns (result, start time, busy seconds)"""
+    started = time.time()
+    blocks, views = [], []
+    try:
+        resolved = []
+        for arg in args:
+            if isinstance(arg, _SharedRef):
+                block = shared_memory.SharedMemory(name=arg.name)
+                blocks.append(block)
+                views.append(block.buf[:arg.size].toreadonly())
+                arg = views[-1]
+            resolved.append(arg)
+        result = func(*resolved, **kwargs)
+    finally:
+        for view in views:
+            view.release()
+        for block in blocks:
+            block.close()
+    return _share_result(result, threshold), started, time.time() - started
+
+
+class ProcessPool:
+    """Bounded, instrumented ProcessPoolExecutor shared by all agents"""
+
+    def __init__(self, config: dict):
+        settings = get_process_pool_config(config)
+        self.workers = settings['workers'] or min(MAX_AUTO_WORKERS, os.cpu_count() or 1)
+        self.max_pending = max(1, settings['max_pending'])
+        self.shared_memory_bytes = settings['shared_memory_bytes']
+        self.kill_after = settings['kill_after']
+        self._config = config
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Calls not yet finished, per pool (retired pools included), and those past kill_after
+        self._outstanding: Dict[ProcessPoolExecutor, set] = {}
+        self._stuck: set = set()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+        self.started_at = time.monotonic()
+        self.calls = 0
+        self.restarts = 0
+        self.kills = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._config,)
+                )
+            return self._executor
+
+    def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) in a worker process and return its result
+
+        func and its arguments must be picklable (module-level functions).
+        Waits for a free slot and for the result until `timeout` seconds, or
+        the current deadline, have passed.
+
+        Raises:
+            TimeoutError: No slot or no result in time (the call may still finish in its worker)
+        """
+        timeout = time_left(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with span("process pool queue", "queue"):
+            acquired = self._slots.acquire(timeout=timeout) if timeout is not None else self._slots.acquire()
+        if not acquired:
+            raise TimeoutError(f"process pool busy ({self.max_pending} calls pending)")
+
+        # Large bytes arguments go through shared memory, freed once the call is over
+        temporary: List[SharedBuffer] = []
+        shared_args = []
+        try:
+            for arg in args:
+                if isinstance(arg, SharedBuffer):
+                    arg = arg.ref()
+                elif isinstance(arg, (bytes, bytearray, memoryview)) and len(arg) >= self.shared_memory_bytes:
+                    buffer = SharedBuffer(len(arg))
+                    buffer.write(arg)
+                    temporary.append(buffer)
+                    arg = buffer.ref()
+                shared_args.append(arg)
+            submitted = time.time()
+            executor = self._get_executor()
+            future = executor.submit(_invoke, func, tuple(shared_args), kwargs, self.shared_memory_bytes)
+        except BaseException:
+            for buffer in temporary:
+                buffer.close()
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self._outstanding.setdefault(executor, set()).add(future)
+        future.add_done_callback(lambda done: self._finished(done, executor, submitted, temporary))
+
+        with span("process pool", "local", func=getattr(func, '__name__', str(func))):
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                result, _, _ = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                if not future.cancel():
+                    # Already running: left to finish, unless it is still pinning its worker kill_after seconds on
+                    future.add_done_callback(_discard_result)
+                    timer = threading.Timer(self.kill_after, self._retire, (executor, future))
+                    timer.daemon = True
+                    timer.start()
+                raise TimeoutError(f"process pool call did not finish within {timeout:.1f}s")
+            except CancelledError:
+                # Only a pool shut down under it cancels a call; callers treat that like a broken pool
+                raise BrokenProcessPool("process pool shut down before the call ran")
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); the next call starts a fresh pool
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                        self.restarts += 1
+                raise
+        return _take_result(result)
+
+    def _retire(self, executor: ProcessPoolExecutor, future):
+        """
+        A call is still running kill_after seconds past its timeout: new calls
+        go to a fresh pool, and this one is killed once its other calls are done
+        """
+        with self._lock:
+            if future.done():
+                return
+            self._stuck.add(future)
+            if self._executor is executor:
+                self._executor = None
+                self.kills += 1
+        self._kill_if_idle(executor)
+
+    def _kill_if_idle(self, executor: ProcessPoolExecutor):
+        """Terminate a retired pool's workers once only stuck calls are left in it"""
+        with self._lock:
+            if self._executor is executor or not self._outstanding.get(executor, set()) <= self._stuck:
+                return
+            self._stuck -= self._outstanding.pop(executor, set())
+        # ProcessPoolExecutor has no public way to stop a running call; the stuck callers already gave up
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+    async def arun(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """run() from the event loop (waits on a worker thread)"""
+        return await to_thread(self.run, func, *args, timeout=timeout, **kwargs)
+
+    def _finished(self, future, executor: ProcessPoolExecutor, submitted: float, temporary: List[SharedBuffer]):
+        for buffer in temporary:
+            buffer.close()
+        self._slots.release()
+        with self._lock:
+            self.in_flight -= 1
+            self.calls += 1
+            self._stuck.discard(future)
+            outstanding = self._outstanding.get(executor)
+            if outstanding is not None:
+                outstanding.discard(future)
+                if not outstanding and self._executor is not executor:
+                    del self._outstanding[executor]
+            retired = executor in self._outstanding and self._executor is not executor
+            if future.cancelled() or future.exception() is not None:
+                self.errors += 1
+            else:
+                result, started, busy = future.result()
+                self.restarts = 0
+                waited = max(0.0, started - submitted)
+                self.busy_seconds += busy
+                self.queue_seconds += waited
+                self.max_queue_seconds = max(self.max_queue_seconds, waited)
+        if retired:
+            self._kill_if_idle(executor)
+
+    @property
+    def broken(self) -> bool:
+        """True once MAX_POOL_RESTARTS pools in a row have broken (e.g. workers cannot start)"""
+        return self.restarts >= MAX_POOL_RESTARTS
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, queueing and utilization (busy worker time / available worker time) so far"""
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            completed = self.calls - self.errors
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "calls": self.calls,
+                "errors": self.errors,
+                "killed": self.kills,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "mean_queue_ms": round(self.queue_seconds / completed * 1000, 2) if completed else 0.0,
+                "max_queue_ms": round(self.max_queue_seconds * 1000, 2),
+                "utilization": round(self.busy_seconds / (self.workers * elapsed), 4) if elapsed else 0.0,
+            }
+
+
+_pool: Optional[ProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(config: Optional[dict]) -> Optional[ProcessPool]:
+    """
+    The process-wide pool (created on first use; the first config wins),
+    or None when it is disabled, broken, or when called inside a pool worker
+
+    Workers are spawned, so a script using the pool must guard its entry
+    point with `if __name__ == "__main__":`; otherwise the workers fail to
+    start and, after MAX_POOL_RESTARTS attempts, tools run inline again.
+    """
+    global _pool
+    if _worker_config is not None or config is None:
+        return None
+    if _pool is None:
+        if not get_process_pool_config(config)['enabled']:
+            return None
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPool(config)
+    return None if _pool.broken else _pool
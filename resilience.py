@@ -0,0 +1,237 @@
+"""
+Retries, hedged requests and circuit breakers for LLM calls
+
+One transient 502 or one stuck upstream request used to fail a whole agent
+(or the synthesis), and a run's tail latency is set by its slowest agent.
+OpenRouterProvider routes every call through this layer
+(openrouter.resilience in config.yaml):
+
+    retries   retryable failures (429, 408/409, 5xx, connection errors and
+              timeouts) are retried with full-jitter exponential backoff,
+              never sooner than the server's Retry-After
+    hedging   a non-streaming call still running after the model's observed
+              p95 latency gets one duplicate request; the first response
+              wins and the other is cancelled
+    breakers  after `breaker_failures` consecutive failures a model's
+              breaker opens and calls fail fast (to the configured fallback
+              model) until a trial call after `breaker_cooldown` succeeds
+
+Latency history and breakers are process-wide, shared by every agent
+calling the same model.
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+DEFAULT_RESILIENCE_CONFIG = {
+    "max_retries": 3,
+    "backoff_base": 0.5,
+    "backoff_max": 20.0,
+    "hedge": True,
+    "hedge_percentile": 95,
+    "hedge_min_samples": 20,
+    "hedge_min_delay": 1.0,
+    "breaker_failures": 5,
+    "breaker_cooldown": 30.0,
+    "fallbacks": {},
+}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a model's circuit breaker is open and no fallback is configured"""
+    pass
+
+
+def get_resilience_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge config['openrouter']['resilience'] over the defaults"""
+    settings = dict(DEFAULT_RESILIENCE_CONFIG)
+    settings.update(config.get('openrouter', {}).get('resilience', {}) or {})
+    return settings
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for rate limits, server errors, timeouts and dropped connections"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # openai.APIConnectionError / APITimeoutError and plain socket errors carry no status
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError') or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), if any"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    milliseconds = headers.get('retry-after-ms')
+    if milliseconds:
+        try:
+            return float(milliseconds) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, settings: Dict[str, Any], error: BaseException) -> float:
+    """Full-jitter exponential backoff for retry `attempt` (1-based), at least Retry-After"""
+    ceiling = min(settings['backoff_max'], settings['backoff_base'] * (2 ** (attempt - 1)))
+    delay = random.uniform(0, ceiling)
+    server_delay = retry_after(error)
+    if server_delay is not None:
+        delay = max(delay, min(server_delay, settings['backoff_max']))
+    return delay
+
+
+class LatencyTracker:
+    """Rolling window of one model's successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 1) -> Optional[float]:
+        """Nearest-rank percentile, or None with fewer than min_samples samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial after a cooldown"""
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (one trial call at a time once the cooldown has passed)"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """The call was cancelled: neither a success nor a failure, but frees the trial slot"""
+        with self._lock:
+            self._trial_running = False
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_latency_tracker(model: str) -> LatencyTracker:
+    with _registry_lock:
+        tracker = _trackers.get(model)
+        if tracker is None:
+            tracker = _trackers[model] = LatencyTracker()
+        return tracker
+
+
+def get_breaker(model: str, settings: Dict[str, Any]) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(settings['breaker_failures'], settings['breaker_cooldown'])
+        return breaker
+
+
+def hedge_delay(model: str, settings: Dict[str, Any]) -> Optional[float]:
+    """Seconds after which a duplicate request is sent, or None (hedging off / too few samples)"""
+    if not settings['hedge']:
+        return None
+    observed = get_latency_tracker(model).percentile(settings['hedge_percentile'], settings['hedge_min_samples'])
+    if observed is None:
+        return None
+    return max(observed, settings['hedge_min_delay'])
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float],
+                 on_hedge: Optional[Callable[[], None]] = None) -> Any:
+    """
+    Await call(); if it is still running after `delay` seconds, start a second
+    call() and return whichever succeeds first (the other is cancelled)
+
+    An error from one request is only raised if the other fails too.
+    """
+    tasks = {asyncio.ensure_future(call())}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            if on_hedge is not None:
+                on_hedge()
+            tasks.add(asyncio.ensure_future(call()))
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # The losing request (or both, if we were cancelled) is abandoned
+        for task in tasks:
+            if not task.done():
+                task.cancel()
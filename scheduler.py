@@ -0,0 +1,482 @@
+"""
+Process-wide scheduler for LLM calls
+
+Every agent used to fire its calls as soon as it was ready, so 16-64 agents
+could exceed a model's or key's rate limit together, get a burst of 429s,
+back off and all come back at once, while the synthesis (which the user is
+waiting for) queued behind fresh agent iterations. Every OpenRouter request
+now takes a slot from one scheduler (openrouter.scheduler in config.yaml):
+
+    limits    each model and each API key has a concurrency window and an
+              optional tokens-per-minute bucket; a request goes out when
+              both its model and its key have room
+    AIMD      a window grows by `increase` per window's worth of successful
+              calls and is multiplied by `decrease` on a 429 or when the
+              rate-limit headers show the key is running out (once per
+              window: requests sent before a decrease do not cut it again);
+              rate-limit resets, and Retry-After once a window is down to
+              min_concurrency, hold the key or model until they pass
+    priority  waiting requests are dispatched lowest priority value first:
+              synthesis, then decomposition, then agents by how far along
+              they are (iteration 5 before iteration 1), FIFO among equals
+
+The priority of calls made in a context (task or thread) is set with
+priority() / set_priority(), like usage_stats phases.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import heapq
+import itertools
+import math
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from async_runtime import DeadlineExceeded, time_left
+from resilience import _status_code, retry_after
+from tracing import span
+
+DEFAULT_SCHEDULER_CONFIG = {
+    "enabled": True,
+    "initial_concurrency": 16,
+    "min_concurrency": 1,
+    "max_concurrency": 64,
+    "key_max_concurrency": 128,
+    "tokens_per_minute": 0,
+    "key_tokens_per_minute": 0,
+    "increase": 1.0,
+    "decrease": 0.5,
+    "max_hold": 60.0,
+}
+
+PRIORITY_SYNTHESIS = 0
+PRIORITY_DECOMPOSE = 10
+PRIORITY_AGENT = 100
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar('llm_priority', default=None)
+
+
+def current_priority() -> Optional[int]:
+    """Priority explicitly set for calls in this context, if any"""
+    return _current_priority.get()
+
+
+def set_priority(value: Optional[int]):
+    """Schedule subsequent calls in this context (task or thread) with a priority"""
+    _current_priority.set(value)
+
+
+@contextmanager
+def priority(value: int) -> Iterator[None]:
+    """Schedule every call made inside the block with a priority"""
+    token = _current_priority.set(value)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def iteration_priority(iteration: int) -> int:
+    """Agent calls: later iterations are closer to finishing, so they go first"""
+    return max(PRIORITY_DECOMPOSE + 1, PRIORITY_AGENT - iteration)
+
+
+def get_scheduler_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge config['openrouter']['scheduler'] over the defaults"""
+    settings = dict(DEFAULT_SCHEDULER_CONFIG)
+    settings.update(config.get('openrouter', {}).get('scheduler', {}) or {})
+    return settings
+
+
+def _reset_delay(value: Optional[str], max_hold: float) -> Optional[float]:
+    """
+    Seconds until a rate-limit window resets
+
+    Accepts epoch milliseconds or seconds (OpenRouter's X-RateLimit-Reset),
+    plain seconds, and durations like "1s" / "6m0s" / "20ms" (OpenAI style).
+    """
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value)
+        if not parts:
+            return None
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        number = sum(float(amount) * scale[unit] for amount, unit in parts)
+    else:
+        if number > 1e12:
+            number = number / 1000 - time.time()
+        elif number > 1e9:
+            number -= time.time()
+    return min(max(0.0, number), max_hold)
+
+
+def _header_int(headers: Any, *names: str) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except ValueError:
+                pass
+    return None
+
+
+class _Limiter:
+    """AIMD concurrency window and optional token bucket for one model or API key"""
+
+    def __init__(self, name: str, maximum: int, tokens_per_minute: int, settings: Dict[str, Any]):
+        self.name = name
+        self.settings = settings
+        self.minimum = max(1, settings['min_concurrency'])
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, settings['initial_concurrency'])))
+        self.in_flight = 0
+        # A minute's worth of tokens may be spent in a burst, refilled continuously
+        self.capacity = float(tokens_per_minute or 0)
+        self.max_rate = self.capacity / 60
+        self.rate = self.max_rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.held_until = 0.0
+        # Bumped on every decrease; responses to requests admitted earlier do not decrease again
+        self.epoch = 0
+        self.throttles = 0
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: int, now: float) -> float:
+        """0 if a request can go now, seconds until it can, or inf until a request finishes"""
+        if self.in_flight >= int(self.limit):
+            return math.inf
+        if now < self.held_until:
+            return self.held_until - now
+        if self.rate:
+            self._refill(now)
+            # Requests bigger than the whole bucket go once it is full
+            needed = min(cost, self.capacity)
+            if self.tokens < needed:
+                return (needed - self.tokens) / self.rate
+        return 0.0
+
+    def admit(self, cost: int):
+        self.in_flight += 1
+        if self.rate:
+            self.tokens -= cost
+
+    def release(self, extra_tokens: int = 0):
+        self.in_flight -= 1
+        if self.rate:
+            self.tokens -= extra_tokens
+
+    def increase(self):
+        """Additive increase: about `increase` per window's worth of successes"""
+        step = self.settings['increase'] / self.limit
+        self.limit = min(float(self.maximum), self.limit + step)
+        if self.rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * step / self.maximum)
+
+    def decrease(self, epoch: int, hold: Optional[float] = None):
+        """Multiplicative decrease for a request admitted in `epoch`, holding new requests for `hold` seconds"""
+        self.throttles += 1
+        if hold:
+            self.held_until = max(self.held_until, time.monotonic() + hold)
+        if epoch != self.epoch:
+            return
+        self.epoch += 1
+        self.limit = max(float(self.minimum), self.limit * self.settings['decrease'])
+        if self.rate:
+            self.rate = max(self.max_rate * 0.05, self.rate * self.settings['decrease'])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "tokens_per_minute": round(self.rate * 60) if self.rate else None,
+            "throttles": self.throttles,
+        }
+
+
+class _Waiter:
+    """A request waiting for its slot"""
+
+    __slots__ = ('priority', 'seq', 'limiters', 'cost', 'granted', 'cancelled', 'notify', 'epochs')
+
+    def __init__(self, priority: int, seq: int, limiters: Tuple[_Limiter, ...], cost: int):
+        self.priority = priority
+        self.seq = seq
+        self.limiters = limiters
+        self.cost = cost
+        self.granted = False
+        self.cancelled = False
+        self.notify = None
+        self.epochs: Tuple[int, ...] = ()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Slot:
+    """A granted request; tells the scheduler what the API said about rate limits"""
+
+    def __init__(self, scheduler: "LLMScheduler", waiter: _Waiter, waited: float):
+        self.scheduler = scheduler
+        self.limiters = waiter.limiters
+        self.epochs = waiter.epochs
+        self.cost = waiter.cost
+        self.waited = waited
+        self.total_tokens: Optional[int] = None
+
+    def observe(self, headers: Any):
+        """Feed a response's rate-limit headers into the key's window"""
+        self.scheduler._observe_headers(self.limiters[-1], self.epochs[-1], headers)
+
+    def settle(self, total_tokens: Optional[int]):
+        """Actual tokens used, replacing the estimate charged to the token buckets"""
+        self.total_tokens = total_tokens
+
+
+class _NoopSlot:
+    waited = 0.0
+
+    def observe(self, headers: Any):
+        pass
+
+    def settle(self, total_tokens: Optional[int]):
+        pass
+
+
+NOOP_SLOT = _NoopSlot()
+
+
+class LLMScheduler:
+    """Admits LLM requests by priority within per-model and per-key limits"""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._limiters: Dict[str, _Limiter] = {}
+        self._timer: Optional[threading.Timer] = None
+        self._timer_at = math.inf
+
+    @property
+    def uses_tokens(self) -> bool:
+        """Whether requests need a token estimate (a tokens-per-minute limit is set)"""
+        return bool(self.settings['tokens_per_minute'] or self.settings['key_tokens_per_minute'])
+
+    def _limiters_for(self, model: str, key_id: str) -> Tuple[_Limiter, _Limiter]:
+        with self._lock:
+            model_limiter = self._limiters.get(f"model:{model}")
+            if model_limiter is None:
+                model_limiter = self._limiters[f"model:{model}"] = _Limiter(
+                    model, self.settings['max_concurrency'], self.settings['tokens_per_minute'], self.settings)
+            key_limiter = self._limiters.get(f"key:{key_id}")
+            if key_limiter is None:
+                key_limiter = self._limiters[f"key:{key_id}"] = _Limiter(
+                    f"key {key_id}", self.settings['key_max_concurrency'], self.settings['key_tokens_per_minute'], self.settings)
+            return model_limiter, key_limiter
+
+    def _enqueue(self, model: str, key_id: str, cost: int) -> _Waiter:
+        value = current_priority()
+        waiter = _Waiter(PRIORITY_AGENT if value is None else value, next(self._seq),
+                         self._limiters_for(model, key_id), cost)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+            self._dispatch()
+        return waiter
+
+    def _dispatch(self):
+        """Grant every waiter that fits, in priority order (call with the lock held)"""
+        now = time.monotonic()
+        # Once a waiter is blocked, lower-priority waiters may not overtake it on the limiters that are
+        # exhausted; the others (e.g. the API key shared with other models) stay open to them
+        blocked = set()
+        earliest = math.inf
+        remaining = []
+        for waiter in sorted(self._queue):
+            if waiter.cancelled:
+                continue
+            if any(id(limiter) in blocked for limiter in waiter.limiters):
+                remaining.append(waiter)
+                continue
+            waits = [limiter.wait_time(waiter.cost, now) for limiter in waiter.limiters]
+            wait = max(waits)
+            if wait > 0:
+                blocked.update(id(limiter) for limiter, limiter_wait in zip(waiter.limiters, waits) if limiter_wait > 0)
+                earliest = min(earliest, wait)
+                remaining.append(waiter)
+                continue
+            for limiter in waiter.limiters:
+                limiter.admit(waiter.cost)
+            waiter.epochs = tuple(limiter.epoch for limiter in waiter.limiters)
+            waiter.granted = True
+            if waiter.notify is not None:
+                waiter.notify()
+        self._queue = remaining
+        heapq.heapify(self._queue)
+        if earliest < math.inf:
+            self._wake_at(now + earliest)
+
+    def _wake_at(self, when: float):
+        """Re-run dispatch when a hold or token bucket frees up (lock held)"""
+        if self._timer is not None and self._timer_at <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_at = when
+        self._timer = threading.Timer(max(0.0, when - time.monotonic()), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._timer_at = math.inf
+            self._dispatch()
+
+    def _release(self, slot: Slot, error: Optional[BaseException], cancelled: bool = False):
+        extra = slot.total_tokens - slot.cost if slot.total_tokens is not None else 0
+        with self._lock:
+            for limiter in slot.limiters:
+                limiter.release(extra)
+            if not cancelled:
+                if error is None:
+                    for limiter in slot.limiters:
+                        limiter.increase()
+                elif _status_code(error) == 429:
+                    # Which limit was hit is not reported, so the model's window takes the cut.
+                    # The retry already waits out Retry-After; other requests only do once
+                    # the window cannot shrink any further.
+                    limiter = slot.limiters[0]
+                    hold = retry_after(error) if limiter.limit <= limiter.minimum else None
+                    limiter.decrease(slot.epochs[0], min(hold, self.settings['max_hold']) if hold else None)
+            self._dispatch()
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """Withdraw a waiting request; False if it was granted meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            return True
+
+    def _observe_headers(self, limiter: _Limiter, epoch: int, headers: Any):
+        remaining = _header_int(headers, 'x-ratelimit-remaining', 'x-ratelimit-remaining-requests')
+        remaining_tokens = _header_int(headers, 'x-ratelimit-remaining-tokens')
+        if remaining is None and remaining_tokens is None:
+            return
+        exhausted = (remaining is not None and remaining <= 0) or (remaining_tokens is not None and remaining_tokens <= 0)
+        with self._lock:
+            if exhausted:
+                hold = _reset_delay(headers.get('x-ratelimit-reset') or headers.get('x-ratelimit-reset-requests')
+                                    or headers.get('x-ratelimit-reset-tokens'), self.settings['max_hold'])
+                limiter.decrease(epoch, hold)
+            elif remaining is not None and remaining < limiter.in_flight:
+                # Fewer requests left in the window than we have outstanding
+                limiter.decrease(epoch)
+
+    @contextmanager
+    def slot(self, model: str, key_id: str, cost: int) -> Iterator[Slot]:
+        """
+        Block until the request may go; the block's outcome adapts the limits
+
+        Raises:
+            DeadlineExceeded: The current deadline passed while waiting
+        """
+        started = time.perf_counter()
+        waiter = self._enqueue(model, key_id, cost)
+        if not waiter.granted:
+            event = threading.Event()
+            with self._lock:
+                waiter.notify = event.set
+                if waiter.granted:
+                    event.set()
+            with span("scheduler queue", "queue", model=model, priority=waiter.priority):
+                try:
+                    if not event.wait(time_left()):
+                        raise DeadlineExceeded(f"deadline passed while queued for {model}")
+                except BaseException:
+                    if self._cancel(waiter):
+                        raise
+                    self._release(Slot(self, waiter, 0.0), None, cancelled=True)
+                    raise
+        slot = Slot(self, waiter, time.perf_counter() - started)
+        try:
+            yield slot
+        except BaseException as e:
+            self._release(slot, e, cancelled=not isinstance(e, Exception))
+            raise
+        self._release(slot, None)
+
+    @asynccontextmanager
+    async def aslot(self, model: str, key_id: str, cost: int) -> AsyncIterator[Slot]:
+        """Async slot(): waits on the event loop instead of blocking a thread"""
+        started = time.perf_counter()
+        waiter = self._enqueue(model, key_id, cost)
+        if not waiter.granted:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+            with self._lock:
+                waiter.notify = wake
+                if waiter.granted:
+                    future.set_result(None)
+            with span("scheduler queue", "queue", model=model, priority=waiter.priority):
+                try:
+                    await future
+                except BaseException:
+                    if self._cancel(waiter):
+                        raise
+                    self._release(Slot(self, waiter, 0.0), None, cancelled=True)
+                    raise
+        slot = Slot(self, waiter, time.perf_counter() - started)
+        try:
+            yield slot
+        except BaseException as e:
+            self._release(slot, e, cancelled=not isinstance(e, Exception))
+            raise
+        self._release(slot, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current windows per model and key, and the number of waiting requests"""
+        with self._lock:
+            return {
+                "queued": sum(1 for waiter in self._queue if not waiter.cancelled),
+                "limits": {name: limiter.stats() for name, limiter in self._limiters.items()},
+            }
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(config: Dict[str, Any]) -> Optional[LLMScheduler]:
+    """The process-wide scheduler (first config's limits win), or None if disabled"""
+    global _scheduler
+    settings = get_scheduler_config(config)
+    if not settings['enabled']:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(settings)
+    return _scheduler
+
+
+def api_key_id(base_url: str, api_key: str) -> str:
+    """Short, non-secret label for an API key"""
+    return hashlib.sha256(f"{base_url}|{api_key}".encode()).hexdigest()[:8]
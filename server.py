@@ -0,0 +1,375 @@
+"""
+HTTP service mode: orchestrate jobs over a local HTTP API
+
+    python server.py --port 8080
+
+    POST /jobs                {"query": "..."} -> 202 {"job": {...}, "coalesced": false}
+                              (503 with Retry-After when the job queue is full)
+    GET  /jobs/<id>           job status, and the answer once it is done
+    GET  /jobs/<id>/events    Server-Sent Events: status, per-agent progress,
+                              synthesis tokens and a final "done" / "failed"
+    GET  /health              queue depth, running jobs, scheduler and process pool state
+
+Jobs wait in a bounded queue for one of `workers` worker threads. Each
+worker keeps one TaskOrchestrator for its lifetime and the process keeps
+its client pool, call scheduler and caches, so jobs after the first start
+warm. A query submitted while an identical one is still queued or running
+joins that job instead of starting another run.
+
+Every job keeps its full event log, so a client connecting late (or
+reconnecting with Last-Event-ID) gets the events it missed first.
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from client_pool import warm_up
+from config_utils import check_required_env_vars, load_config, merge_config
+from orchestrator import TaskOrchestrator
+from process_pool import get_process_pool
+from scheduler import get_scheduler
+
+DEFAULT_SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8080,
+    "workers": 2,
+    "queue_size": 32,
+    "job_ttl": 3600,
+    "keepalive": 15.0,
+}
+
+
+def get_server_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge config['server'] over the defaults"""
+    settings = dict(DEFAULT_SERVER_CONFIG)
+    settings.update(config.get('server', {}) or {})
+    return settings
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the job queue is full"""
+    pass
+
+
+class Job:
+    """One orchestrate run and its event log (status, progress, tokens)"""
+
+    def __init__(self, query: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.status = "queued"
+        self.submitters = 1
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.output_path: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.agents: List[Dict[str, Any]] = []
+        self.progress: Dict[int, str] = {}
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self._condition = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        with self._condition:
+            self.events.append((event, data))
+            self._condition.notify_all()
+
+    def start(self):
+        self.status, self.started_at = "running", time.time()
+        self.emit("status", {"status": self.status})
+
+    def set_progress(self, agent_id: int, status: str):
+        with self._condition:
+            self.progress[agent_id] = status
+            self.emit("progress", {"agent": agent_id + 1, "status": status})
+
+    def finish(self, status: str, **fields):
+        with self._condition:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.status, self.finished_at = status, time.time()
+            self.events.append((status, self.to_dict()))
+            self._condition.notify_all()
+
+    def wait_events(self, cursor: int, timeout: float) -> List[Tuple[str, Dict[str, Any]]]:
+        """Events from index `cursor` on, waiting up to `timeout` seconds for new ones"""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.events) > cursor or self.done, timeout)
+            return self.events[cursor:]
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        with self._condition:
+            progress = sorted(self.progress.items())
+        info = {
+            "id": self.id,
+            "query": self.query,
+            "status": self.status,
+            "submitters": self.submitters,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {str(agent_id + 1): status for agent_id, status in progress},
+        }
+        if include_result and self.done:
+            info.update(result=self.result, error=self.error, output_path=self.output_path,
+                        agents=self.agents, usage=self.usage)
+        return info
+
+
+class OrchestratorService:
+    """Bounded job queue served by worker threads, with identical queries coalesced"""
+
+    def __init__(self, config_path: str = "config.yaml", agent_model: Optional[str] = None,
+                 config_overrides: Optional[Dict[str, Any]] = None):
+        self.config_path = config_path
+        self.agent_model = agent_model
+        self.config_overrides = config_overrides or {}
+        self.config = merge_config(load_config(config_path), self.config_overrides)
+        self.settings = get_server_config(self.config)
+
+        self.jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}  # query -> its queued or running job
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=self.settings['queue_size'])
+        self._workers: List[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.settings['workers']):
+            worker = threading.Thread(target=self._work, name=f"superheavy-job-worker-{i + 1}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, query: str) -> Tuple[Job, bool]:
+        """
+        Queue a job for query, or join the queued/running job for the same query
+
+        Returns:
+            (job, whether it was coalesced into an existing job)
+
+        Raises:
+            QueueFullError: The queue already holds queue_size jobs
+        """
+        with self._lock:
+            self._purge()
+            job = self._active.get(query)
+            if job is not None:
+                job.submitters += 1
+                return job, True
+            job = Job(query)
+            job.emit("status", {"status": job.status})
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFullError(f"job queue is full ({self.settings['queue_size']} jobs waiting)")
+            self.jobs[job.id] = job
+            self._active[query] = job
+            return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = sum(1 for job in self._active.values() if job.status == "running")
+            info = {
+                "workers": len(self._workers),
+                "queued": self._queue.qsize(),
+                "queue_size": self.settings['queue_size'],
+                "running": running,
+                "jobs": len(self.jobs),
+            }
+        scheduler = get_scheduler(self.config)
+        if scheduler is not None:
+            info["scheduler"] = scheduler.stats()
+        pool = get_process_pool(self.config)
+        if pool is not None:
+            info["process_pool"] = pool.stats()
+        return info
+
+    def _purge(self):
+        """Forget finished jobs older than job_ttl (called with the lock held)"""
+        cutoff = time.time() - self.settings['job_ttl']
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        # One orchestrator per worker, reused for every job it runs
+        orchestrator = TaskOrchestrator(self.config_path, silent=True, agent_model=self.agent_model,
+                                        config_overrides=self.config_overrides)
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(orchestrator, job)
+            finally:
+                with self._lock:
+                    if self._active.get(job.query) is job:
+                        del self._active[job.query]
+
+    def _run(self, orchestrator: TaskOrchestrator, job: Job):
+        orchestrator.on_agent_progress = job.set_progress
+        orchestrator.on_synthesis_delta = lambda text: job.emit("token", {"text": text})
+        job.start()
+        try:
+            result = orchestrator.orchestrate(job.query)
+            status, fields = "done", {"result": result}
+        except Exception as e:
+            status, fields = "failed", {"error": str(e) or type(e).__name__}
+        finally:
+            orchestrator.on_agent_progress = orchestrator.on_synthesis_delta = None
+        job.finish(status, output_path=orchestrator.last_output_path, agents=orchestrator.last_agents,
+                   usage=orchestrator.last_usage, **fields)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API and SSE stream for an OrchestratorService (self.server.service)"""
+
+    server_version = "SuperHeavy"
+
+    def do_POST(self):
+        if self.path.rstrip('/') != "/jobs":
+            return self._send_json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            query = str(body.get('query') or '').strip()
+        except (ValueError, AttributeError):
+            return self._send_json(400, {"error": "body must be a JSON object with a 'query'"})
+        if not query:
+            return self._send_json(400, {"error": "missing 'query'"})
+
+        try:
+            job, coalesced = self.server.service.submit(query)
+        except QueueFullError as e:
+            return self._send_json(503, {"error": str(e)}, {"Retry-After": "30"})
+        self._send_json(200 if coalesced else 202, {"job": job.to_dict(), "coalesced": coalesced},
+                        {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        if parts == ["health"]:
+            return self._send_json(200, self.server.service.stats())
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.server.service.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": f"no job {parts[1]}"})
+            if len(parts) == 2:
+                return self._send_json(200, job.to_dict())
+            if parts[2] == "events":
+                return self._stream_events(job)
+        self._send_json(404, {"error": "not found"})
+
+    def _stream_events(self, job: Job):
+        """Send the job's events as Server-Sent Events until it is done"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        # Resume after the last event a reconnecting client saw
+        try:
+            cursor = int(self.headers.get('Last-Event-ID')) + 1
+        except (TypeError, ValueError):
+            cursor = 0
+        keepalive = self.server.service.settings['keepalive']
+        try:
+            while True:
+                events = job.wait_events(cursor, keepalive)
+                if not events:
+                    if job.done:
+                        return
+                    self.wfile.write(b": keepalive\n\n")
+                for event, data in events:
+                    self.wfile.write(f"id: {cursor}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+                    cursor += 1
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job carries on
+            return
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(service: OrchestratorService, host: Optional[str] = None, port: Optional[int] = None,
+                  verbose: bool = False) -> ThreadingHTTPServer:
+    """HTTP server for service (not started; port 0 picks a free port)"""
+    host = service.settings['host'] if host is None else host
+    port = service.settings['port'] if port is None else port
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main():
+    """Main entry point for the HTTP service"""
+    parser = argparse.ArgumentParser(description='Multi-Agent Orchestrator HTTP service')
+    parser.add_argument('--host', help='Address to listen on (default: server.host, 127.0.0.1)')
+    parser.add_argument('--port', type=int, help='Port to listen on (default: server.port, 8080)')
+    parser.add_argument('--workers', type=int, help='Jobs run at the same time (default: server.workers)')
+    parser.add_argument('--queue-size', type=int, help='Jobs that may wait for a worker (default: server.queue_size)')
+    parser.add_argument('--agent-model',
+                        choices=['grok-4', 'kimi-k2', 'o3', 'claude-sonnet-4'],
+                        help='Model to use for agents')
+    parser.add_argument('--no-save', action='store_true',
+                        help='Disable auto-save to markdown file')
+    parser.add_argument('--output-dir', default='outputs',
+                        help='Directory to save output files (default: outputs)')
+    parser.add_argument('--verbose', action='store_true', help='Log every HTTP request')
+
+    args = parser.parse_args()
+
+    # Check required environment variables
+    if not check_required_env_vars():
+        return 1
+
+    overrides: Dict[str, Any] = {'output': {'auto_save': False}} if args.no_save else \
+        {'output': {'auto_save': True, 'directory': args.output_dir}}
+    server_overrides = {key: value for key, value in
+                        (('workers', args.workers), ('queue_size', args.queue_size)) if value is not None}
+    if server_overrides:
+        overrides['server'] = server_overrides
+
+    service = OrchestratorService(agent_model=args.agent_model, config_overrides=overrides)
+    # Open API connections before the first job arrives
+    warm_up(service.config)
+    service.start()
+
+    server = create_server(service, args.host, args.port, verbose=args.verbose)
+    host, port = server.server_address[:2]
+    print(f"SuperHeavy service on http://{host}:{port} • {service.settings['workers']} workers • "
+          f"queue of {service.settings['queue_size']}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n\nShutting down...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
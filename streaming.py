@@ -0,0 +1,183 @@
+"""
+Streaming chat completions and per-call latency metrics
+
+With stream=True the provider reads the completion as server-sent deltas.
+StreamAccumulator folds content and tool-call deltas back into a regular
+ChatCompletion, so the agent loop sees the same message shape either way,
+while an on_delta callback lets CLIs render tokens as they arrive.
+
+Every call produces a metrics dict (latency, time to first token, tokens
+per second, prompt-cache tokens) that is handed to the registered call
+observers and to the current run's usage collector.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from openai.types.chat import ChatCompletion
+from usage_stats import record_usage
+
+# Callables receiving the metrics dict of every completed LLM call
+_call_observers: List[Callable[[Dict[str, Any]], None]] = []
+_observers_lock = threading.Lock()
+
+
+def add_call_observer(observer: Callable[[Dict[str, Any]], None]):
+    """Register a callable that receives the metrics of every LLM call"""
+    with _observers_lock:
+        _call_observers.append(observer)
+
+
+def remove_call_observer(observer: Callable[[Dict[str, Any]], None]):
+    """Unregister a call observer (no-op if it was never added)"""
+    with _observers_lock:
+        if observer in _call_observers:
+            _call_observers.remove(observer)
+
+
+def notify_call_observers(metrics: Dict[str, Any]):
+    """Hand one call's metrics to every observer; observer errors never fail the call"""
+    record_usage(metrics)
+    with _observers_lock:
+        observers = list(_call_observers)
+    for observer in observers:
+        try:
+            observer(metrics)
+        except Exception:
+            pass
+
+
+def call_metrics(model: str, response: Any, started: float, ttft: Optional[float], streamed: bool,
+                 cache_hit: bool = False) -> Dict[str, Any]:
+    """
+    Build the metrics dict for one finished call
+
+    Args:
+        model: Model name the call was made with
+        response: The (possibly reassembled) ChatCompletion
+        started: time.perf_counter() value taken just before the request
+        ttft: Seconds until the first content or tool-call delta (streaming only)
+        streamed: Whether the call used streaming
+        cache_hit: Whether the response came from the LLM response cache
+    """
+    latency = time.perf_counter() - started
+    usage = getattr(response, 'usage', None)
+    completion_tokens = getattr(usage, 'completion_tokens', None) or 0
+    prompt_details = getattr(usage, 'prompt_tokens_details', None)
+
+    # Generation rate: measured from the first token when streaming, else over the whole call
+    generation_time = latency - ttft if ttft is not None else latency
+
+    return {
+        "model": model,
+        "streamed": streamed,
+        "cache_hit": cache_hit,
+        "latency": latency,
+        "ttft": ttft,
+        "prompt_tokens": getattr(usage, 'prompt_tokens', None) or 0,
+        "cached_tokens": getattr(prompt_details, 'cached_tokens', None) or 0,
+        "cache_write_tokens": getattr(prompt_details, 'cache_write_tokens', None) or 0,
+        "completion_tokens": completion_tokens,
+        "tokens_per_sec": completion_tokens / generation_time if completion_tokens and generation_time > 0 else None,
+        # Upstream provider OpenRouter routed the call to
+        "upstream": getattr(response, 'provider', None),
+    }
+
+
+class StreamAccumulator:
+    """
+    Reassemble streamed chat.completion.chunk objects into a ChatCompletion
+
+    Usage:
+        accumulator = StreamAccumulator(on_delta=print_token)
+        for chunk in client.chat.completions.create(..., stream=True):
+            accumulator.add(chunk)
+        response = accumulator.build()
+    """
+
+    def __init__(self, on_delta: Optional[Callable[[str], None]] = None, started: Optional[float] = None):
+        self.on_delta = on_delta
+        self.started = started if started is not None else time.perf_counter()
+        self.ttft: Optional[float] = None
+
+        self.id = None
+        self.provider = None
+        self.model = None
+        self.created = None
+        self.usage = None
+        self.role = "assistant"
+        self.finish_reason = None
+        self.content: List[str] = []
+        self.tool_calls: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, chunk: Any):
+        """Fold one chunk into the message; forwards content deltas to on_delta"""
+        self.id = self.id or chunk.id
+        self.model = self.model or chunk.model
+        self.provider = self.provider or getattr(chunk, 'provider', None)
+        self.created = self.created or chunk.created
+        if getattr(chunk, 'usage', None) is not None:
+            self.usage = chunk.usage
+
+        if not chunk.choices:
+            return
+
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+        if delta is None:
+            return
+        if delta.role:
+            self.role = delta.role
+
+        if delta.content or delta.tool_calls:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self.started
+
+        if delta.content:
+            self.content.append(delta.content)
+            if self.on_delta is not None:
+                self.on_delta(delta.content)
+
+        for tool_delta in delta.tool_calls or []:
+            # The first delta for an index carries id, type and name; later ones append arguments
+            tool_call = self.tool_calls.setdefault(tool_delta.index, {
+                "id": None,
+                "type": "function",
+                "function": {"name": "", "arguments": ""}
+            })
+            if tool_delta.id:
+                tool_call["id"] = tool_delta.id
+            if tool_delta.type:
+                tool_call["type"] = tool_delta.type
+            if tool_delta.function is not None:
+                if tool_delta.function.name:
+                    tool_call["function"]["name"] += tool_delta.function.name
+                if tool_delta.function.arguments:
+                    tool_call["function"]["arguments"] += tool_delta.function.arguments
+
+    def build(self) -> ChatCompletion:
+        """Return the accumulated response as a non-streaming ChatCompletion"""
+        message = {
+            "role": self.role,
+            "content": "".join(self.content) if self.content else None,
+        }
+        if self.tool_calls:
+            message["tool_calls"] = [self.tool_calls[index] for index in sorted(self.tool_calls)]
+
+        completion = {
+            "id": self.id or "stream",
+            "object": "chat.completion",
+            "created": self.created or int(time.time()),
+            "model": self.model or "",
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": self.finish_reason or ("tool_calls" if self.tool_calls else "stop"),
+            }],
+            "usage": self.usage.model_dump() if self.usage is not None else None,
+        }
+        if self.provider:
+            completion["provider"] = self.provider
+        return ChatCompletion.model_validate(completion)
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+HTTP service and batch mode against the mock OpenRouter server
+
+    python -m pytest tests/
+
+Everything runs on localhost: the mock (benchmarks/mock_openrouter.py) and
+the service both listen on free ports, and no API key is needed.
+"""
+
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# config.yaml substitutes ${OPENROUTER_API_KEY}; the mock ignores it
+os.environ.setdefault('OPENROUTER_API_KEY', 'mock')
+
+from batch import BatchRunner, load_queries, remaining_queries
+from mock_openrouter import MockOpenRouter
+from server import OrchestratorService, create_server
+
+CONFIG_PATH = os.path.join(ROOT, 'config.yaml')
+
+
+@pytest.fixture(scope="module")
+def mock_url():
+    # Fast, tool-free conversations: decomposition, one answer per agent, synthesis
+    mock = MockOpenRouter(ttft="fixed:0.01", tokens_per_sec=20000, tool_turns=0,
+                          answer_tokens=20, synthesis_tokens=40, seed=1)
+    base_url = mock.start()
+    yield base_url
+    mock.stop()
+
+
+class RejectingAgents(MockOpenRouter):
+    """The mock, except that every agent request gets a 400 (which trips no breaker); decomposition still works"""
+
+    def _handle_completion(self, handler, request):
+        task = json.dumps(request.get('messages', []))
+        if "specialized research questions" in task:
+            return super()._handle_completion(handler, request)
+        self._send_json(handler, 400, {"error": {"message": "Bad request", "code": 400}})
+
+
+@pytest.fixture
+def rejecting_url():
+    mock = RejectingAgents(ttft="fixed:0.01", tokens_per_sec=20000, tool_turns=0, seed=1)
+    base_url = mock.start()
+    yield base_url
+    mock.stop()
+
+
+def overrides(base_url, **server):
+    return {
+        "openrouter": {"base_url": base_url, "api_key": "mock", "pool": {"prewarm": False}},
+        "orchestrator": {"parallel_agents": 2, "task_timeout": 30},
+        "output": {"auto_save": False},
+        "llm_cache": {"mode": "off"},
+        "tracing": {"enabled": False},
+        "server": server,
+    }
+
+
+@pytest.fixture
+def serve():
+    """serve(service) -> base URL of an HTTP server for it on a free port"""
+    servers = []
+
+    def start(service):
+        server = create_server(service, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def request(url, body=None, headers=None):
+    """(status, headers, body) of a GET, or a POST when body is given"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, headers=dict(headers or {}))
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            return response.status, response.headers, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read().decode('utf-8')
+
+
+def parse_events(stream):
+    """[(id, event, data)] from a Server-Sent Events body"""
+    events = []
+    for block in stream.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_identical_queries_are_coalesced(mock_url, serve):
+    # No workers started, so jobs stay queued
+    service = OrchestratorService(CONFIG_PATH, config_overrides=overrides(mock_url, queue_size=4))
+    url = serve(service)
+
+    status, _, body = request(f"{url}/jobs", {"query": "What is 2 + 2?"})
+    assert status == 202
+    first = json.loads(body)
+    assert first["coalesced"] is False
+
+    status, _, body = request(f"{url}/jobs", {"query": "What is 2 + 2?"})
+    assert status == 200
+    second = json.loads(body)
+    assert second["coalesced"] is True
+    assert second["job"]["id"] == first["job"]["id"]
+    assert second["job"]["submitters"] == 2
+
+    status, _, body = request(f"{url}/jobs", {"query": "What is 3 + 3?"})
+    assert status == 202
+    assert json.loads(body)["job"]["id"] != first["job"]["id"]
+
+
+def test_full_queue_returns_503(mock_url, serve):
+    service = OrchestratorService(CONFIG_PATH, config_overrides=overrides(mock_url, queue_size=1))
+    url = serve(service)
+
+    assert request(f"{url}/jobs", {"query": "first"})[0] == 202
+    status, headers, body = request(f"{url}/jobs", {"query": "second"})
+    assert status == 503
+    assert headers["Retry-After"]
+    assert "full" in json.loads(body)["error"]
+
+    # A query already queued still joins its job
+    assert request(f"{url}/jobs", {"query": "first"})[0] == 200
+    assert json.loads(request(f"{url}/health")[2])["queued"] == 1
+
+
+def test_events_resume_after_last_event_id(mock_url, serve):
+    service = OrchestratorService(CONFIG_PATH, config_overrides=overrides(mock_url, workers=1))
+    service.start()
+    url = serve(service)
+
+    job_id = json.loads(request(f"{url}/jobs", {"query": "Explain prime numbers"})[2])["job"]["id"]
+    status, _, stream = request(f"{url}/jobs/{job_id}/events")
+    assert status == 200
+    events = parse_events(stream)
+    assert [event_id for event_id, _, _ in events] == list(range(len(events)))
+    assert events[0][1] == "status" and events[0][2]["status"] == "queued"
+    assert events[-1][1] == "done"
+    assert any(name == "progress" for _, name, _ in events)
+    assert any(name == "token" for _, name, _ in events)
+
+    # Reconnecting with Last-Event-ID replays only what came after it
+    resume_from = len(events) // 2
+    _, _, stream = request(f"{url}/jobs/{job_id}/events", headers={"Last-Event-ID": str(resume_from)})
+    assert parse_events(stream) == events[resume_from + 1:]
+
+    job = json.loads(request(f"{url}/jobs/{job_id}")[2])
+    assert job["status"] == "done"
+    assert job["result"]
+    assert [agent["status"] for agent in job["agents"]] == ["success", "success"]
+
+
+def test_batch_resume_skips_completed_ids(mock_url, rejecting_url, tmp_path):
+    queries_path = tmp_path / "queries.jsonl"
+    queries_path.write_text("\n".join(json.dumps(entry) for entry in [
+        {"id": "a", "query": "What is 2 + 2?"},
+        {"id": "b", "query": "What is 3 + 3?"},
+        "What is 4 + 4?",
+    ]) + "\n", encoding='utf-8')
+
+    # "a" finished in an earlier run, "b" failed, and a crash cut the last line short
+    output_path = tmp_path / "results.jsonl"
+    output_path.write_text(
+        json.dumps({"id": "a", "status": "success", "answer": "4"}) + "\n" +
+        json.dumps({"id": "b", "status": "error", "error": "boom"}) + "\n" +
+        '{"id": "c", "sta', encoding='utf-8')
+
+    queries = load_queries(str(queries_path))
+    remaining = remaining_queries(queries, str(output_path))
+    assert [entry['id'] for entry in remaining] == [queries[1]['id'], queries[2]['id']]
+
+    runner = BatchRunner(str(output_path), concurrency=2, config_path=CONFIG_PATH,
+                         config_overrides=overrides(mock_url))
+    totals = runner.run(remaining)
+    assert totals["finished"] == 2 and totals["failed"] == 0
+
+    records = []
+    for line in output_path.read_text(encoding='utf-8').splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    assert [record['id'] for record in records if record['id'] == "a"] == ["a"]
+    assert {record['id'] for record in records[2:]} == {entry['id'] for entry in remaining}
+    assert all(record['status'] == "success" and record['answer'] for record in records[2:])
+    assert all(agent['status'] == "success" for record in records[2:] for agent in record['agents'])
+
+    # Nothing left to do on the next run
+    assert remaining_queries(queries, str(output_path)) == []
+
+    # A run where every agent failed returns a notice, not an answer: it is recorded as failed and runs again
+    failing = {"id": "d", "query": "What is 5 + 5?"}
+    runner = BatchRunner(str(output_path), concurrency=1, config_path=CONFIG_PATH,
+                         config_overrides=overrides(rejecting_url))
+    totals = runner.run([failing])
+    assert totals["finished"] == 1 and totals["failed"] == 1
+    record = json.loads(output_path.read_text(encoding='utf-8').splitlines()[-1])
+    assert record['id'] == "d" and record['status'] == "error"
+    assert not any(agent['status'] in ("success", "partial") for agent in record['agents'])
+    assert remaining_queries(queries + [failing], str(output_path)) == [failing]
@@ -1,39 +1,148 @@
 import os
 import importlib
-from typing import Dict, List
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, List, Iterable, Mapping, Optional, Tuple, Type
+from config_utils import FrozenDict, freeze
+from process_pool import worker_config
 from .base_tool import BaseTool
 
-def discover_tools(config: dict = None, silent: bool = False) -> Dict[str, BaseTool]:
-    """Automatically discover and load all tools from the tools directory"""
-    tools = {}
-    
-    # Get the tools directory path
-    tools_dir = os.path.dirname(__file__)
-    
-    # Scan for Python files (excluding __init__.py and base_tool.py)
-    for filename in os.listdir(tools_dir):
-        if filename.endswith('.py') and filename not in ['__init__.py', 'base_tool.py']:
-            module_name = filename[:-3]  # Remove .py extension
-            
+# Shared stand-in when no config is given, so it maps to one cached ToolSet
+_EMPTY_CONFIG = FrozenDict()
+
+
+class ToolSet:
+    """
+    Immutable set of tool instances with pre-built OpenRouter schemas
+
+    Tools are ordered by name so the serialized schema array is identical
+    across agents and runs. Filtered views are cached, so handing an agent
+    "everything but mark_task_complete" costs a dict lookup.
+    """
+
+    def __init__(self, tools: Iterable[BaseTool]):
+        ordered = sorted(tools, key=lambda tool: tool.name)
+        self.tools: Mapping[str, BaseTool] = MappingProxyType({tool.name: tool for tool in ordered})
+        # Deep-frozen so one agent cannot mutate schemas shared with the others
+        self.schemas: Tuple[dict, ...] = tuple(freeze(tool.to_openrouter_schema()) for tool in ordered)
+        self.mapping: Mapping[str, callable] = MappingProxyType({tool.name: tool.execute for tool in ordered})
+        self._views: Dict[frozenset, "ToolSet"] = {}
+        self._views_lock = threading.Lock()
+
+    def without(self, names: Optional[Iterable[str]] = None) -> "ToolSet":
+        """Return a cached view excluding the given tool names (all tools when names is None)"""
+        excluded = frozenset(self.tools) if names is None else frozenset(names)
+        if not excluded & set(self.tools):
+            return self
+
+        with self._views_lock:
+            view = self._views.get(excluded)
+            if view is None:
+                view = ToolSet(tool for name, tool in self.tools.items() if name not in excluded)
+                self._views[excluded] = view
+            return view
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+
+class ToolRegistry:
+    """
+    Process-wide tool registry
+
+    The tools directory is scanned and its modules imported once per
+    process. Instances are created once per configuration object (tools read
+    settings such as the search user agent or output directory from it).
+    """
+
+    # Number of distinct configs whose tool instances are kept alive
+    MAX_CACHED_CONFIGS = 8
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tool_classes: Optional[Tuple[Type[BaseTool], ...]] = None
+        self._load_errors: List[Tuple[str, str]] = []
+        self._toolsets: Dict[int, Tuple[dict, ToolSet]] = {}
+
+    def tool_classes(self) -> Tuple[Type[BaseTool], ...]:
+        """Discover BaseTool subclasses in the tools directory (first call only)"""
+        if self._tool_classes is None:
+            with self._lock:
+                if self._tool_classes is None:
+                    self._tool_classes = self._scan()
+        return self._tool_classes
+
+    def toolset(self, config: dict = None, silent: bool = True) -> ToolSet:
+        """Return the shared ToolSet for this config object"""
+        config = config if config is not None else _EMPTY_CONFIG
+        tool_classes = self.tool_classes()
+
+        with self._lock:
+            cached = self._toolsets.get(id(config))
+            if cached is not None and cached[0] is config:
+                toolset = cached[1]
+            else:
+                toolset = ToolSet(self._instantiate(tool_classes, config))
+                if len(self._toolsets) >= self.MAX_CACHED_CONFIGS:
+                    self._toolsets.pop(next(iter(self._toolsets)))
+                self._toolsets[id(config)] = (config, toolset)
+
+        if not silent:
+            for name in toolset.tools:
+                print(f"Loaded tool: {name}")
+            for filename, error in self._load_errors:
+                print(f"Warning: Could not load tool from {filename}: {error}")
+
+        return toolset
+
+    def _instantiate(self, tool_classes: Tuple[Type[BaseTool], ...], config: dict) -> List[BaseTool]:
+        tools = []
+        for tool_class in tool_classes:
             try:
-                # Import the module
-                module = importlib.import_module(f'.{module_name}', package='tools')
-                
-                # Find tool classes that inherit from BaseTool
-                for item_name in dir(module):
-                    item = getattr(module, item_name)
-                    if (isinstance(item, type) and 
-                        issubclass(item, BaseTool) and 
-                        item != BaseTool):
-                        
-                        # Instantiate the tool
-                        tool_instance = item(config or {})
-                        tools[tool_instance.name] = tool_instance
-                        if not silent:
-                            print(f"Loaded tool: {tool_instance.name}")
-                        
+                tools.append(tool_class(config))
             except Exception as e:
-                if not silent:
-                    print(f"Warning: Could not load tool from {filename}: {e}")
-    
-    return tools
\ No newline at end of file
+                self._load_errors.append((tool_class.__module__, str(e)))
+        return tools
+
+    def _scan(self) -> Tuple[Type[BaseTool], ...]:
+        tool_classes = []
+
+        # Get the tools directory path
+        tools_dir = os.path.dirname(__file__)
+
+        # Scan for Python files (excluding __init__.py and base_tool.py)
+        for filename in sorted(os.listdir(tools_dir)):
+            if filename.endswith('.py') and filename not in ['__init__.py', 'base_tool.py']:
+                module_name = filename[:-3]  # Remove .py extension
+
+                try:
+                    # Import the module
+                    module = importlib.import_module(f'.{module_name}', package='tools')
+
+                    # Find tool classes defined in this module that inherit from BaseTool
+                    for item_name in dir(module):
+                        item = getattr(module, item_name)
+                        if (isinstance(item, type) and
+                            issubclass(item, BaseTool) and
+                            item != BaseTool and
+                            item.__module__ == module.__name__):
+                            tool_classes.append(item)
+
+                except Exception as e:
+                    self._load_errors.append((filename, str(e)))
+
+        return tuple(tool_classes)
+
+
+# Process-wide registry used by all agents
+tool_registry = ToolRegistry()
+
+
+def discover_tools(config: dict = None, silent: bool = False) -> Dict[str, BaseTool]:
+    """Automatically discover and load all tools from the tools directory"""
+    return dict(tool_registry.toolset(config, silent=silent).tools)
+
+
+def run_tool(name: str, kwargs: dict) -> Any:
+    """Process pool entry point for "cpu" tools: execute a tool in the worker"""
+    return tool_registry.toolset(worker_config()).tools[name].execute(**kwargs)
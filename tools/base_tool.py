@@ -1,9 +1,16 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List
+from async_runtime import to_thread
+from concurrent.futures.process import BrokenProcessPool
+from process_pool import get_process_pool
 
 class BaseTool(ABC):
     """Base class for all tools"""
     
+    # "io": execute() runs on a worker thread (network, disk)
+    # "cpu": execute() runs in the shared process pool, so CPU-heavy work does not hold the GIL the other agents need
+    kind = "io"
+    
     @property
     @abstractmethod
     def name(self) -> str:
@@ -27,6 +34,18 @@ class BaseTool(ABC):
         """Execute the tool with given parameters"""
         pass
     
+    async def aexecute(self, **kwargs) -> Any:
+        """Execute the tool from the event loop (in a worker thread, or the process pool for "cpu" tools)"""
+        if self.kind == "cpu":
+            pool = get_process_pool(getattr(self, 'config', None))
+            if pool is not None:
+                from tools import run_tool
+                try:
+                    return await pool.arun(run_tool, self.name, kwargs)
+                except BrokenProcessPool:
+                    pass
+        return await to_thread(self.execute, **kwargs)
+    
     def to_openrouter_schema(self) -> Dict[str, Any]:
         """Convert tool to OpenRouter function schema"""
         return {
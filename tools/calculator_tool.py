@@ -3,7 +3,13 @@ import math
 import ast
 import operator
 
+# Largest integer power evaluated, in bits of the result (9**9**9 would take minutes)
+MAX_POWER_BITS = 100_000
+
 class CalculatorTool(BaseTool):
+    # Evaluation holds the GIL; keep it off the threads the other agents use
+    kind = "cpu"
+    
     def __init__(self, config: dict):
         self.config = config
         # Safe operators for evaluation
@@ -57,6 +63,12 @@ class CalculatorTool(BaseTool):
             "required": ["expression"]
         }
     
+    def _check_power(self, base, exponent):
+        """Refuse integer powers whose result would exceed MAX_POWER_BITS"""
+        if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+            if (abs(base).bit_length() - 1) * exponent > MAX_POWER_BITS:
+                raise ValueError(f"Power too large (result over {MAX_POWER_BITS} bits)")
+    
     def _safe_eval(self, node):
         """Safely evaluate an AST node"""
         if isinstance(node, ast.Constant):  # Numbers
@@ -70,6 +82,8 @@ class CalculatorTool(BaseTool):
             left = self._safe_eval(node.left)
             right = self._safe_eval(node.right)
             if type(node.op) in self.safe_operators:
+                if isinstance(node.op, ast.Pow):
+                    self._check_power(left, right)
                 return self.safe_operators[type(node.op)](left, right)
             else:
                 raise ValueError(f"Unsupported operation: {type(node.op)}")
@@ -0,0 +1,185 @@
+"""
+Incremental HTML-to-text extraction for search_web
+
+Pages are fed to the parser chunk by chunk as they download, and parsing
+stops as soon as enough text has been collected, so a multi-megabyte page
+costs roughly the bytes needed to fill the snippet. lxml's event-driven
+parser is used when available, falling back to the standard library parser.
+"""
+
+import codecs
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - listed in requirements.txt; html.parser is the fallback
+    etree = None
+
+# Content types worth downloading; anything else (PDF, images, archives...) is rejected up front
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+# Elements whose text is never part of the page content
+SKIPPED_TAGS = frozenset({'script', 'style'})
+
+
+def is_html_content_type(content_type: Optional[str]) -> bool:
+    """True if a Content-Type header names a type the extractor can read (missing header counts as HTML)"""
+    if not content_type:
+        return True
+    return content_type.split(';', 1)[0].strip().lower() in HTML_CONTENT_TYPES
+
+
+def charset_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """Charset declared in a Content-Type header, if any"""
+    for param in (content_type or '').split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset' and value.strip():
+            return value.strip().strip('"\'')
+    return None
+
+
+class _TextCollector:
+    """Collects text outside skipped elements until `limit` visible characters are seen"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.pieces: List[str] = []
+        self.visible_chars = 0
+        self.skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return self.visible_chars > self.limit
+
+    def start(self, tag, attrib=None):
+        if _local_name(tag) in SKIPPED_TAGS:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        if _local_name(tag) in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data: str):
+        if self.skip_depth or self.done:
+            return
+        self.pieces.append(data)
+        self.visible_chars += len(data) - sum(1 for char in data if char.isspace())
+
+    def close(self):
+        return None
+
+    def text(self) -> str:
+        # Same normalization as the BeautifulSoup path: collapse all whitespace runs
+        return ' '.join(''.join(self.pieces).split())
+
+
+def _local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ''
+    return tag.rsplit('}', 1)[-1].lower()
+
+
+class _StdlibParser(HTMLParser):
+    """html.parser adapter driving a _TextCollector"""
+
+    def __init__(self, collector: _TextCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class StreamingTextExtractor:
+    """
+    Feed raw HTML bytes as they arrive; stop once enough text is collected
+
+    Usage:
+        extractor = StreamingTextExtractor(limit=1000)
+        for chunk in response.iter_content(16384):
+            if extractor.feed(chunk):
+                break
+        text = extractor.close()
+    """
+
+    def __init__(self, limit: int = 1000, encoding: Optional[str] = None):
+        self.limit = limit
+        self.collector = _TextCollector(limit)
+        self.bytes_fed = 0
+
+        if etree is not None:
+            self._parser = etree.HTMLParser(target=self.collector, encoding=encoding)
+            self._decoder = None
+        else:
+            self._parser = _StdlibParser(self.collector)
+            self._decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+
+    @property
+    def done(self) -> bool:
+        return self.collector.done
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse one chunk; returns True when no more input is needed"""
+        if self.done:
+            return True
+        self.bytes_fed += len(chunk)
+        if self._decoder is None:
+            self._parser.feed(chunk)
+        else:
+            self._parser.feed(self._decoder.decode(chunk))
+        return self.done
+
+    def close(self) -> str:
+        """Finish parsing and return the normalized, length-limited text"""
+        try:
+            if self._decoder is not None:
+                self._parser.feed(self._decoder.decode(b'', final=True))
+            self._parser.close()
+        except Exception:
+            # Truncated documents are expected when we stop early
+            pass
+
+        text = self.collector.text()
+        return text[:self.limit] + "..." if len(text) > self.limit else text
+
+
+def extract_text(chunks: Iterable[bytes], limit: int = 1000, max_bytes: Optional[int] = None,
+                 encoding: Optional[str] = None) -> str:
+    """
+    Extract up to `limit` characters of visible text from an iterable of HTML chunks
+
+    Args:
+        chunks: Raw response body chunks
+        limit: Characters of text to keep (an ellipsis is appended when cut)
+        max_bytes: Stop reading after this many bytes
+        encoding: Declared charset, if known; otherwise detected from the document
+
+    Returns:
+        Whitespace-normalized text snippet
+    """
+    extractor = StreamingTextExtractor(limit, encoding)
+    for chunk in chunks:
+        if max_bytes is not None:
+            chunk = chunk[:max_bytes - extractor.bytes_fed]
+        if extractor.feed(chunk):
+            break
+        if max_bytes is not None and extractor.bytes_fed >= max_bytes:
+            break
+    return extractor.close()
+
+
+def extract_text_from_buffer(body: memoryview, limit: int = 1000, encoding: Optional[str] = None,
+                             chunk_size: int = 16384) -> str:
+    """
+    extract_text over a page body already in memory (e.g. a shared memory
+    block handed to a process pool worker), fed in chunk_size slices
+    """
+    return extract_text((bytes(body[start:start + chunk_size]) for start in range(0, len(body), chunk_size)),
+                        limit=limit, encoding=encoding)
@@ -0,0 +1,285 @@
+"""
+Local store of fetched pages shared by all agents, threads and processes
+
+Pages are keyed by normalized URL and hold compressed extracted text. The
+store is SQLite in WAL mode, so concurrent readers never block and several
+processes can share one file. Entries are revalidated with conditional GETs
+after their TTL, the total size is kept under a byte budget by evicting the
+least recently used pages, and concurrent requests for the same URL are
+coalesced so only one download runs while the others wait for it.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that never change page content
+TRACKING_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'gclid', 'fbclid', 'ref'}
+
+DEFAULT_PAGE_STORE_CONFIG = {
+    "enabled": True,
+    "path": ".cache/pages.sqlite3",
+    "max_bytes": 256 * 1024 * 1024,
+    "ttl": 24 * 3600,
+    "lease_timeout": 30,
+}
+
+
+class PageFetch(NamedTuple):
+    """Result of one (possibly conditional) download"""
+    status: int
+    text: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used as the store key (case, default ports, fragments, tracking params)"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if k.lower() not in TRACKING_PARAMS))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+class PageStore:
+    """SQLite-backed page store; safe to share across threads and processes"""
+
+    def __init__(self, path: str, max_bytes: int, ttl: float, lease_timeout: float = 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lease_timeout = lease_timeout
+        self.owner = uuid.uuid4().hex
+
+        self._local = threading.local()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages(accessed_at)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL)""")
+            # Running total of pages.size, kept by triggers in the same transaction as each change,
+            # so eviction need not sum the whole table on every insert
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("""CREATE TABLE IF NOT EXISTS pages_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total INTEGER NOT NULL)""")
+                conn.execute("INSERT OR IGNORE INTO pages_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM pages")
+                conn.execute("""CREATE TRIGGER IF NOT EXISTS pages_size_insert AFTER INSERT ON pages
+                    BEGIN UPDATE pages_size SET total = total + new.size; END""")
+                conn.execute("""CREATE TRIGGER IF NOT EXISTS pages_size_update AFTER UPDATE OF size ON pages
+                    BEGIN UPDATE pages_size SET total = total + new.size - old.size; END""")
+                conn.execute("""CREATE TRIGGER IF NOT EXISTS pages_size_delete AFTER DELETE ON pages
+                    BEGIN UPDATE pages_size SET total = total - old.size; END""")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread, in WAL mode"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def get_or_fetch(self, url: str, fetch: Callable[[Dict[str, str]], PageFetch], timeout: Optional[float] = None) -> str:
+        """
+        Return the page text, downloading it at most once across all waiters
+
+        Args:
+            url: Page URL (normalized internally)
+            fetch: Downloads the page; receives conditional-request headers and
+                returns a PageFetch (status 304 keeps the stored text)
+            timeout: Longest time to wait for another thread or process's download
+
+        Returns:
+            Extracted page text
+
+        Raises:
+            TimeoutError: If another download of the same URL did not finish in time
+        """
+        key = self._key(url)
+        deadline = time.monotonic() + (timeout if timeout is not None else self.lease_timeout)
+
+        while True:
+            row = self._lookup(key)
+            if row is not None and time.time() - row['fetched_at'] < self.ttl:
+                self._touch(key)
+                return row['text']
+
+            # Coalesce within this process
+            with self._inflight_lock:
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._inflight[key] = threading.Event()
+
+            if not leader:
+                if not event.wait(max(0.0, deadline - time.monotonic())):
+                    raise TimeoutError("page download in another thread did not finish in time")
+                leader_row = self._lookup(key)
+                if leader_row is not None:
+                    self._touch(key)
+                    return leader_row['text']
+                continue  # Leader failed; try ourselves
+
+            try:
+                # Another thread may have finished just before we became leader
+                row = self._lookup(key)
+                if row is not None and time.time() - row['fetched_at'] < self.ttl:
+                    self._touch(key)
+                    return row['text']
+
+                # Coalesce across processes with a lease row
+                while not self._acquire_lease(key):
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError("page download in another process did not finish in time")
+                    time.sleep(0.1)
+                    other_row = self._lookup(key)
+                    if other_row is not None and time.time() - other_row['fetched_at'] < self.ttl:
+                        self._touch(key)
+                        return other_row['text']
+                try:
+                    return self._download(key, url, row, fetch)
+                finally:
+                    self._release_lease(key)
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def _download(self, key: str, url: str, row: Optional[dict], fetch: Callable[[Dict[str, str]], PageFetch]) -> str:
+        validators = {}
+        if row is not None:
+            if row['etag']:
+                validators['If-None-Match'] = row['etag']
+            if row['last_modified']:
+                validators['If-Modified-Since'] = row['last_modified']
+
+        result = fetch(validators)
+        now = time.time()
+        conn = self._connect()
+
+        if result.status == 304:
+            if row is None:
+                # Nothing was sent to validate (e.g. a caching proxy answered), so there is no copy to reuse
+                raise ValueError("304 Not Modified for a page that is not stored")
+            conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            return row['text']
+
+        content = zlib.compress(result.text.encode('utf-8'))
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the size triggers
+        conn.execute(
+            "INSERT INTO pages (key, url, content, size, etag, last_modified, fetched_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET url = excluded.url, "
+            "content = excluded.content, size = excluded.size, etag = excluded.etag, "
+            "last_modified = excluded.last_modified, fetched_at = excluded.fetched_at, accessed_at = excluded.accessed_at",
+            (key, normalize_url(url), content, len(content), result.etag, result.last_modified, now, now)
+        )
+        self._evict()
+        return result.text
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        cursor = self._connect().execute(
+            "SELECT content, etag, last_modified, fetched_at FROM pages WHERE key = ?", (key,))
+        found = cursor.fetchone()
+        if found is None:
+            return None
+        return {
+            "text": zlib.decompress(found[0]).decode('utf-8'),
+            "etag": found[1],
+            "last_modified": found[2],
+            "fetched_at": found[3],
+        }
+
+    def _touch(self, key: str):
+        self._connect().execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (time.time(), key))
+
+    def _acquire_lease(self, key: str) -> bool:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self.owner, now + self.lease_timeout))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def _release_lease(self, key: str):
+        self._connect().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def _evict(self):
+        """Drop least recently used pages until the store fits its byte budget"""
+        conn = self._connect()
+        total = conn.execute("SELECT total FROM pages_size").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM pages ORDER BY accessed_at"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM pages WHERE key = ?", stale_keys)
+
+
+_stores: Dict[str, PageStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_page_store(config: dict) -> Optional[PageStore]:
+    """Return the shared PageStore for config['search']['page_store'], or None when disabled"""
+    store_config = dict(DEFAULT_PAGE_STORE_CONFIG)
+    store_config.update(config.get('search', {}).get('page_store', {}) or {})
+    if not store_config['enabled']:
+        return None
+
+    path = os.path.abspath(store_config['path'])
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = PageStore(path, store_config['max_bytes'], store_config['ttl'], store_config['lease_timeout'])
+            _stores[path] = store
+        return store
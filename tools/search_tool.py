@@ -1,21 +1,89 @@
 from .base_tool import BaseTool
+from .page_store import PageFetch, get_page_store
+from .html_extract import (StreamingTextExtractor, extract_text, extract_text_from_buffer,
+                           is_html_content_type, charset_from_content_type)
+from process_pool import SharedBuffer, get_process_pool
+from tracing import span, in_worker
+from async_runtime import time_left, check_deadline
 from ddgs import DDGS
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
 import requests
+import threading
+import time
 import json
 
+
+class _FetchResources:
+    """
+    Process-wide fetch resources shared by every SearchTool instance
+
+    One keep-alive session, one DDGS client and one fetch thread pool serve
+    all agents. Per-host and search-backend semaphores keep 4-32 parallel
+    agents from hammering the same site or tripping DuckDuckGo rate limits.
+    """
+
+    def __init__(self, search_config: dict):
+        self.fetch_workers = search_config.get('fetch_workers', 16)
+        self.per_host_limit = search_config.get('per_host_limit', 2)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.fetch_workers, pool_maxsize=self.fetch_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.ddgs = DDGS()
+        self.backend_semaphore = threading.BoundedSemaphore(search_config.get('backend_concurrency', 2))
+        self.executor = ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="search-fetch")
+
+        self._host_semaphores = {}
+        self._host_lock = threading.Lock()
+
+    def host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._host_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+
+
+_resources = None
+_resources_lock = threading.Lock()
+
+
+def _get_resources(search_config: dict) -> _FetchResources:
+    """Create the shared fetch resources on first use (first config wins)"""
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                _resources = _FetchResources(search_config)
+    return _resources
+
+
 class SearchTool(BaseTool):
     def __init__(self, config: dict):
         self.config = config
-    
+        search_config = config.get('search', {})
+        self.fetch_timeout = search_config.get('fetch_timeout', 10)
+        self.fetch_deadline = search_config.get('fetch_deadline', 15)
+        self.max_download_bytes = search_config.get('max_download_bytes', 2 * 1024 * 1024)
+        self.content_chars = search_config.get('content_chars', 1000)
+        self.inline_extract_bytes = search_config.get('inline_extract_bytes', 256 * 1024)
+        self.min_extract_seconds = search_config.get('min_extract_seconds', 2)
+
     @property
     def name(self) -> str:
         return "search_web"
-    
+
     @property
     def description(self) -> str:
         return "Search the web using DuckDuckGo for current information"
-    
+
     @property
     def parameters(self) -> dict:
         return {
@@ -33,58 +101,159 @@ class SearchTool(BaseTool):
             },
             "required": ["query"]
         }
-    
-    def execute(self, query: str, max_results: int = 5) -> list:
-        """Search the web using DuckDuckGo and fetch page content"""
+
+    def _fetch_content(self, url: str, deadline: float) -> str:
+        """Return a page's text snippet, from the shared page store when possible"""
+        with span("fetch", "local", url=url):
+            page_store = get_page_store(self.config)
+            if page_store is None:
+                return self._download(url, deadline, {}).text
+
+            return page_store.get_or_fetch(
+                url,
+                lambda validators: self._download(url, deadline, validators),
+                timeout=max(0.0, deadline - time.monotonic())
+            )
+
+    def _download(self, url: str, deadline: float, validators: dict) -> PageFetch:
+        """Download one page, respecting the per-host limit, and extract its text"""
+        resources = _get_resources(self.config.get('search', {}))
+        host_semaphore = resources.host_semaphore(url)
+
+        headers = {'User-Agent': self.config.get('search', {}).get('user_agent', 'Mozilla/5.0')}
+        headers.update(validators)
+
+        with span("per-host limit", "queue"):
+            acquired = host_semaphore.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        if not acquired:
+            raise TimeoutError("per-host fetch limit busy until search deadline")
         try:
-            # Use ddgs library
-            ddgs = DDGS()
-            results = ddgs.text(query, max_results=max_results)
-            
-            simplified_results = []
-            
-            for result in results:
+            with span("download", "network", url=url):
+                # Stream the body over the shared keep-alive session
+                response = resources.session.get(
+                    url,
+                    headers=headers,
+                    timeout=max(0.1, min(self.fetch_timeout, deadline - time.monotonic())),
+                    stream=True
+                )
                 try:
-                    # Fetch content with requests
-                    response = requests.get(
-                        result['href'], 
-                        headers={'User-Agent': self.config.get('search', {}).get('user_agent', 'Mozilla/5.0')},
-                        timeout=10
-                    )
                     response.raise_for_status()
-                    
-                    # Parse HTML with BeautifulSoup
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Remove script and style elements
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    
-                    # Get text content
-                    text = soup.get_text()
-                    # Clean up whitespace
-                    text = ' '.join(text.split())
-                    
-                    # Limit content length
-                    content_snippet = text[:1000] + "..." if len(text) > 1000 else text
-                    
-                    simplified_results.append({
-                        "title": result['title'],
-                        "url": result['href'],
-                        "snippet": result['body'],
-                        "content": content_snippet
-                    })
-                
-                except Exception as e:
+
+                    if response.status_code == 304:
+                        return PageFetch(status=304)
+
+                    # Reject PDFs, images, archives... before reading their bodies
+                    content_type = response.headers.get('Content-Type')
+                    if not is_html_content_type(content_type):
+                        raise ValueError(f"unsupported content type {content_type.split(';')[0]}")
+
+                    content_snippet = self._extract(
+                        response.iter_content(chunk_size=16384),
+                        charset_from_content_type(content_type),
+                        deadline
+                    )
+                finally:
+                    response.close()
+        finally:
+            host_semaphore.release()
+
+        return PageFetch(
+            status=response.status_code,
+            text=content_snippet,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+
+    def _extract(self, chunks, encoding, deadline: float) -> str:
+        """
+        Parse the page incrementally as it downloads, stopping at the byte cap
+        or once the snippet is full
+        
+        Most pages fill the snippet within their first few chunks. A page that
+        has not after inline_extract_bytes (script- or markup-heavy) is read
+        into shared memory up to the byte cap and parsed in the process pool,
+        so it does not hold the GIL the other agents need. The pool gets at
+        least min_extract_seconds, even when the download used up the fetch
+        deadline; if it still has no result, the text found in the first
+        inline_extract_bytes is returned instead.
+        """
+        pool = get_process_pool(self.config)
+        if pool is None:
+            return extract_text(chunks, limit=self.content_chars, max_bytes=self.max_download_bytes, encoding=encoding)
+        
+        extractor = StreamingTextExtractor(self.content_chars, encoding)
+        inline_chunks = []
+        for chunk in chunks:
+            chunk = chunk[:self.max_download_bytes - extractor.bytes_fed]
+            inline_chunks.append(chunk)
+            if extractor.feed(chunk) or extractor.bytes_fed >= self.max_download_bytes:
+                return extractor.close()
+            if extractor.bytes_fed >= self.inline_extract_bytes:
+                break
+        else:
+            return extractor.close()
+        
+        with SharedBuffer(self.max_download_bytes) as body:
+            for chunk in inline_chunks:
+                body.write(chunk)
+            for chunk in chunks:
+                body.write(chunk)
+                if body.full:
+                    break
+            try:
+                return pool.run(extract_text_from_buffer, body, self.content_chars, encoding,
+                                timeout=max(self.min_extract_seconds, deadline - time.monotonic()))
+            except TimeoutError:
+                return extractor.close()
+            except BrokenProcessPool:
+                with body.view() as view:
+                    return extract_text_from_buffer(view, self.content_chars, encoding)
+
+    def execute(self, query: str, max_results: int = 5) -> list:
+        """Search the web using DuckDuckGo and fetch page content concurrently"""
+        try:
+            # The calling agent may be near its deadline; nothing to do once it has passed
+            check_deadline()
+            resources = _get_resources(self.config.get('search', {}))
+
+            # Shared DDGS client, with a process-wide cap on concurrent searches (waited for up to the search deadline)
+            with span("search backend limit", "queue"):
+                acquired = resources.backend_semaphore.acquire(timeout=time_left(self.fetch_deadline))
+            if not acquired:
+                raise TimeoutError("search backend limit busy until search deadline")
+            try:
+                with span("search", "network", query=query):
+                    results = resources.ddgs.text(query, max_results=max_results)
+            finally:
+                resources.backend_semaphore.release()
+
+            # Fetch all pages at once; whatever has not arrived by the deadline (or the agent's) is skipped
+            fetch_deadline = time_left(self.fetch_deadline)
+            deadline = time.monotonic() + fetch_deadline
+            futures = [resources.executor.submit(in_worker(self._fetch_content, "fetch queue"), result['href'], deadline)
+                       for result in results]
+            done, _ = wait(futures, timeout=fetch_deadline)
+
+            simplified_results = []
+
+            for result, future in zip(results, futures):
+                if future in done and future.exception() is None:
+                    content = future.result()
+                elif future in done:
                     # If we can't fetch the page, still include the search result
-                    simplified_results.append({
-                        "title": result['title'],
-                        "url": result['href'],
-                        "snippet": result['body'],
-                        "content": f"Could not fetch content: {str(e)}"
-                    })
-            
+                    content = f"Could not fetch content: {str(future.exception())}"
+                else:
+                    future.cancel()
+                    content = f"Could not fetch content: no response within {fetch_deadline:.0f}s search deadline"
+
+                simplified_results.append({
+                    "title": result['title'],
+                    "url": result['href'],
+                    "snippet": result['body'],
+                    "content": content
+                })
+
             return simplified_results
-        
+
         except Exception as e:
-            return [{"error": f"Search failed: {str(e)}"}]
\ No newline at end of file
+            return [{"error": f"Search failed: {str(e)}"}]
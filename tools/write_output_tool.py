@@ -39,44 +39,32 @@ class WriteOutputTool(BaseTool):
             "required": ["query", "result"]
         }
     
+    def _resolve_filepath(self, query, filename=None):
+        """Output path for a query, creating the output directory"""
+        # Create output directory if it doesn't exist
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        # Generate filename if not provided
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Clean query for filename (remove special characters)
+            clean_query = "".join(c for c in query[:50] if c.isalnum() or c in (' ', '-', '_')).strip()
+            clean_query = clean_query.replace(' ', '_')
+            filename = f"{timestamp}_{clean_query}"
+        
+        # Ensure .md extension
+        if not filename.endswith('.md'):
+            filename += '.md'
+        
+        return os.path.join(self.output_dir, filename), filename
+    
     def execute(self, query, result, filename=None):
         """Write the orchestrator output to a markdown file"""
         try:
-            # Create output directory if it doesn't exist
-            os.makedirs(self.output_dir, exist_ok=True)
-            
-            # Generate filename if not provided
-            if not filename:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                # Clean query for filename (remove special characters)
-                clean_query = "".join(c for c in query[:50] if c.isalnum() or c in (' ', '-', '_')).strip()
-                clean_query = clean_query.replace(' ', '_')
-                filename = f"{timestamp}_{clean_query}"
-            
-            # Ensure .md extension
-            if not filename.endswith('.md'):
-                filename += '.md'
-            
-            filepath = os.path.join(self.output_dir, filename)
+            filepath, filename = self._resolve_filepath(query, filename)
             
             # Create markdown content
-            timestamp_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            markdown_content = f"""# Orchestrator Output
-
-**Generated:** {timestamp_str}  
-**Query:** {query}
-
----
-
-## Result
-
-{result}
-
----
-
-*Generated by Make It Heavy Multi-Agent Orchestrator*
-"""
+            markdown_content = _markdown_header(query) + result + MARKDOWN_FOOTER
             
             # Write to file
             with open(filepath, 'w', encoding='utf-8') as f:
@@ -93,4 +81,83 @@ class WriteOutputTool(BaseTool):
             return {
                 "success": False,
                 "error": f"Failed to write output: {str(e)}"
-            }
\ No newline at end of file
+            }
+    
+    def open_stream(self, query, filename=None):
+        """Start an output file that is appended to as the result streams in"""
+        filepath, _ = self._resolve_filepath(query, filename)
+        return StreamingOutputWriter(filepath, query)
+
+
+class StreamingOutputWriter:
+    """
+    Markdown output written incrementally while the result streams in
+    
+    Chunks are appended and flushed to `<name>.partial.md`. finalize() adds
+    the footer and atomically renames the file to `<name>.md`; if the stream
+    is interrupted the partial file stays on disk with whatever arrived.
+    """
+    
+    def __init__(self, filepath, query):
+        self.filepath = filepath
+        self.partial_path = filepath[:-len('.md')] + '.partial.md'
+        self.chunks = []
+        self._file = open(self.partial_path, 'w', encoding='utf-8')
+        self._file.write(_markdown_header(query))
+        self._file.flush()
+    
+    @property
+    def text(self):
+        """Everything streamed so far"""
+        return "".join(self.chunks)
+    
+    def write(self, chunk):
+        """Append one chunk and flush it to disk"""
+        self.chunks.append(chunk)
+        self._file.write(chunk)
+        self._file.flush()
+    
+    def finalize(self):
+        """Write the footer and move the complete file into place; returns its path"""
+        self._file.write(MARKDOWN_FOOTER)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.partial_path, self.filepath)
+        return self.filepath
+    
+    def abort(self, reason):
+        """Keep the partial file, noting why it is incomplete; returns its path"""
+        if not self._file.closed:
+            self._file.write(f"\n\n---\n\n*Output incomplete: {reason}*\n")
+            self._file.close()
+        return self.partial_path
+    
+    def discard(self):
+        """Remove the partial file (nothing worth keeping was streamed)"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+def _markdown_header(query):
+    timestamp_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"""# Orchestrator Output
+
+**Generated:** {timestamp_str}  
+**Query:** {query}
+
+---
+
+## Result
+
+"""
+
+
+MARKDOWN_FOOTER = """
+
+---
+
+*Generated by Make It Heavy Multi-Agent Orchestrator*
+"""
\ No newline at end of file
@@ -0,0 +1,579 @@
+"""
+Hierarchical tracing spans for orchestrator runs
+
+When tracing.enabled is set, a Tracer is installed for the duration of an
+orchestrate run with collect_trace(). Code marks its work with
+
+    with span("tool search_web", tool="search_web"):
+        ...
+
+and each span records its parent (the span open in the same context), so
+agent tasks and worker threads started inside a span nest under it. With no
+tracer installed span() returns a shared no-op object: one context variable
+lookup per span.
+
+Leaf spans carry a kind that says where the time went:
+
+    queue    waiting for a worker thread, a semaphore or a rate limit
+    network  waiting on the API, a search backend or a page download
+    local    running local code (tool execution, parsing, compaction)
+
+Traces are written as Chrome trace-event JSON (chrome://tracing, Perfetto)
+and OTLP-compatible JSON lines. analyze() derives per-agent critical paths,
+the queue/network/local split of each agent's wall time and how much of the
+agent fan-out sat idle; `python tracing.py traces/<run>.trace.json` prints it.
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+KINDS = ('queue', 'network', 'local')
+
+DEFAULT_TRACING_CONFIG = {
+    "enabled": False,
+    "dir": "traces",
+    "formats": ["chrome", "otlp"],
+    "max_spans": 200000,
+}
+
+_current_tracer: contextvars.ContextVar = contextvars.ContextVar('tracer', default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar('trace_span', default=None)
+
+
+class Span:
+    """One timed operation; start and end are time.perf_counter() values"""
+
+    __slots__ = ('name', 'kind', 'span_id', 'parent_id', 'start', 'end', 'thread', 'attributes')
+
+    def __init__(self, name: str, kind: Optional[str], span_id: int, parent_id: Optional[int],
+                 start: float, attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = start
+        self.end = start
+        self.thread = threading.current_thread().name
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def set(self, **attributes):
+        """Add attributes (e.g. results known only once the work is done)"""
+        self.attributes.update(attributes)
+
+
+class _NoopSpan:
+    """Returned by span() when tracing is off; every operation does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _ActiveSpan:
+    """Context manager that opens a span and makes it the parent of nested spans"""
+
+    __slots__ = ('tracer', 'span', 'token')
+
+    def __init__(self, tracer: "Tracer", name: str, kind: Optional[str], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        parent = _current_span.get()
+        self.span = Span(name, kind, tracer.next_id(), parent.span_id if parent is not None else None,
+                         time.perf_counter(), attributes)
+        self.token = None
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.span.end = time.perf_counter()
+        if exc_type is not None:
+            self.span.attributes['error'] = exc_type.__name__
+        _current_span.reset(self.token)
+        self.tracer.add(self.span)
+        return False
+
+
+class Tracer:
+    """Thread-safe span store for one run"""
+
+    def __init__(self, max_spans: int = 200000):
+        self.trace_id = uuid.uuid4().hex
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Anchors for converting perf_counter values to wall-clock time
+        self.epoch_ns = time.time_ns()
+        self.perf_anchor = time.perf_counter()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, span: Span):
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self.spans)
+
+    def _unix_ns(self, perf: float) -> int:
+        return self.epoch_ns + int((perf - self.perf_anchor) * 1e9)
+
+    def export(self, directory: str, basename: str, formats: List[str]) -> List[str]:
+        """Write the trace in the given formats ('chrome', 'otlp'); returns the file paths"""
+        os.makedirs(directory, exist_ok=True)
+        spans = self.finished_spans()
+        paths = []
+        if 'chrome' in formats:
+            path = os.path.join(directory, f"{basename}.trace.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_chrome(spans), f, default=str)
+            paths.append(path)
+        if 'otlp' in formats:
+            path = os.path.join(directory, f"{basename}.otlp.jsonl")
+            with open(path, 'w', encoding='utf-8') as f:
+                for span in spans:
+                    f.write(json.dumps(self.to_otlp(span), default=str) + "\n")
+            paths.append(path)
+        return paths
+
+    def to_chrome(self, spans: List[Span]) -> Dict[str, Any]:
+        """Chrome trace-event JSON; concurrent siblings are spread over separate rows"""
+        lanes = _assign_lanes(spans)
+        events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "make-it-superheavy"}}]
+        for lane, label in sorted(set(lanes.values())):
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": label}})
+        for span in spans:
+            args = dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id,
+                        kind=span.kind, thread=span.thread)
+            events.append({
+                "name": span.name,
+                "cat": span.kind or "span",
+                "ph": "X",
+                "ts": (span.start - self.perf_anchor) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": 1,
+                "tid": lanes[span.span_id][0],
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"trace_id": self.trace_id, "dropped_spans": self.dropped}}
+
+    def to_otlp(self, span: Span) -> Dict[str, Any]:
+        """One span as an OTLP/JSON ExportTraceServiceRequest (one per JSONL line)"""
+        attributes = dict(span.attributes, thread=span.thread)
+        if span.kind:
+            attributes['superheavy.kind'] = span.kind
+        otlp_span = {
+            "traceId": self.trace_id,
+            "spanId": f"{span.span_id:016x}",
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self._unix_ns(span.start)),
+            "endTimeUnixNano": str(self._unix_ns(span.end)),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+        }
+        if span.parent_id is not None:
+            otlp_span["parentSpanId"] = f"{span.parent_id:016x}"
+        if 'error' in span.attributes:
+            otlp_span["status"] = {"code": 2, "message": str(span.attributes['error'])}
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "make-it-superheavy"}}]},
+            "scopeSpans": [{"scope": {"name": "superheavy.tracing"}, "spans": [otlp_span]}],
+        }]}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _assign_lanes(spans: List[Span]) -> Dict[int, tuple]:
+    """
+    Map span_id -> (row, row label) for the Chrome view
+
+    Chrome requires spans on one row to nest, so a span stays on its parent's
+    row unless a non-ancestor span there still overlaps it (parallel agents,
+    concurrent tool calls), in which case it moves to the first free row.
+    Rows are labelled after the agent (or "run") that first used them.
+    """
+    by_id = {span.span_id: span for span in spans}
+    lanes: Dict[int, int] = {}
+    labels: Dict[int, str] = {}
+    span_labels: Dict[int, str] = {}
+    open_spans: Dict[int, List[Span]] = {}
+
+    for span in sorted(spans, key=lambda s: (s.start, -s.end)):
+        ancestors = set()
+        parent_id = span.parent_id
+        while parent_id is not None and parent_id in by_id:
+            ancestors.add(parent_id)
+            parent_id = by_id[parent_id].parent_id
+
+        if span.attributes.get('agent') is not None:
+            span_labels[span.span_id] = f"agent {span.attributes['agent']}"
+        else:
+            span_labels[span.span_id] = span_labels.get(span.parent_id, "run")
+
+        # Agents get a row of their own; other spans try their parent's row first
+        parent_lane = lanes.get(span.parent_id)
+        if span.attributes.get('agent') is not None:
+            candidates = [lane for lane in sorted(open_spans) if lane != parent_lane]
+        else:
+            candidates = ([parent_lane] if parent_lane is not None else []) + sorted(open_spans)
+        lane = None
+        for candidate in candidates:
+            active = [other for other in open_spans.get(candidate, []) if other.end > span.start]
+            open_spans[candidate] = active
+            if all(other.span_id in ancestors for other in active):
+                lane = candidate
+                break
+        if lane is None:
+            lane = len(open_spans) + 1
+        open_spans.setdefault(lane, []).append(span)
+        lanes[span.span_id] = lane
+        labels.setdefault(lane, span_labels[span.span_id])
+    return {span_id: (lane, labels[lane]) for span_id, lane in lanes.items()}
+
+
+def current_tracer() -> Optional[Tracer]:
+    """The tracer of the run this code is executing in, if any"""
+    return _current_tracer.get()
+
+
+def span(name: str, kind: Optional[str] = None, **attributes):
+    """
+    Time the block as a span (a shared no-op when tracing is off)
+
+    Args:
+        name: Span name, e.g. "llm moonshotai/kimi-k2" or "tool search_web"
+        kind: 'queue', 'network' or 'local' for leaf work; None for structure
+        **attributes: Extra data shown in the trace viewers
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return NOOP_SPAN
+    return _ActiveSpan(tracer, name, kind, attributes)
+
+
+def record_span(name: str, kind: Optional[str], start: float, end: float, **attributes):
+    """Record an already finished span (e.g. a queue wait measured after the fact)"""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return
+    parent = _current_span.get()
+    finished = Span(name, kind, tracer.next_id(), parent.span_id if parent is not None else None, start, attributes)
+    finished.end = end
+    tracer.add(finished)
+
+
+def _run_queued(queue_name: str, submitted: float, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    record_span(queue_name, 'queue', submitted, time.perf_counter())
+    return func(*args, **kwargs)
+
+
+def in_worker(func: Callable[..., Any], queue_name: str) -> Callable[..., Any]:
+    """
+    Wrap func for submission to a thread pool
+
+    The wrapper runs func in a copy of the submitting context (so its spans
+    nest under the current span and it sees the run's ledger) and records the
+    time it waited for a free worker as a queue span.
+    """
+    context = contextvars.copy_context()
+    submitted = time.perf_counter()
+
+    def run(*args, **kwargs):
+        return context.run(_run_queued, queue_name, submitted, func, args, kwargs)
+    return run
+
+
+class collect_trace:
+    """
+    Install a Tracer for the block when tracing is enabled (yields None otherwise)
+
+    Usage:
+        with collect_trace(config.get('tracing')) as tracer:
+            ...
+    """
+
+    def __init__(self, tracing_config: Optional[Dict[str, Any]]):
+        settings = get_tracing_config(tracing_config)
+        self.tracer = Tracer(settings['max_spans']) if settings['enabled'] else None
+        self.token = None
+
+    def __enter__(self) -> Optional[Tracer]:
+        if self.tracer is not None:
+            self.token = _current_tracer.set(self.tracer)
+        return self.tracer
+
+    def __exit__(self, *exc_info):
+        if self.token is not None:
+            _current_tracer.reset(self.token)
+        return False
+
+
+def get_tracing_config(tracing_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge config['tracing'] over the defaults"""
+    settings = dict(DEFAULT_TRACING_CONFIG)
+    settings.update(tracing_config or {})
+    return settings
+
+
+# ---------------------------------------------------------------------------
+# Analysis
+
+
+def _union(intervals: List[tuple]) -> List[tuple]:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(interval: tuple, holes: List[tuple]) -> List[tuple]:
+    """Parts of interval not covered by the (merged, sorted) holes"""
+    start, end = interval
+    parts = []
+    for hole_start, hole_end in holes:
+        if hole_end <= start or hole_start >= end:
+            continue
+        if hole_start > start:
+            parts.append((start, hole_start))
+        start = max(start, hole_end)
+    if start < end:
+        parts.append((start, end))
+    return parts
+
+
+def _children_index(spans: List[Span]) -> Dict[Optional[int], List[Span]]:
+    children: Dict[Optional[int], List[Span]] = {}
+    for span in spans:
+        children.setdefault(span.parent_id, []).append(span)
+    return children
+
+
+def _subtree(root: Span, children: Dict[Optional[int], List[Span]]) -> List[Span]:
+    found, stack = [], [root]
+    while stack:
+        span = stack.pop()
+        found.append(span)
+        stack.extend(children.get(span.span_id, []))
+    return found
+
+
+def time_breakdown(root: Span, children: Dict[Optional[int], List[Span]]) -> Dict[str, float]:
+    """
+    Split root's wall time into queue / network / local / other
+
+    Each span contributes its self time (time no child covers) under its own
+    kind; where several spans overlap (concurrent tool calls) the instant is
+    counted once, preferring local over network over queue.
+    """
+    self_intervals = {kind: [] for kind in KINDS}
+    for span in _subtree(root, children):
+        if span.kind not in self_intervals:
+            continue
+        covered = _union([(child.start, child.end) for child in children.get(span.span_id, [])])
+        self_intervals[span.kind].extend(_subtract((span.start, span.end), covered))
+
+    breakdown = {}
+    claimed: List[tuple] = []
+    for kind in ('local', 'network', 'queue'):
+        # Clip to root; instants already claimed by a higher-priority kind are skipped
+        intervals = [(max(s, root.start), min(e, root.end)) for s, e in _union(self_intervals[kind]) if e > root.start and s < root.end]
+        own = [part for interval in intervals for part in _subtract(interval, claimed)]
+        breakdown[kind] = sum(end - start for start, end in own)
+        claimed = _union(claimed + own)
+    breakdown['other'] = max(0.0, root.duration - sum(breakdown.values()))
+    return breakdown
+
+
+def critical_path(root: Span, children: Dict[Optional[int], List[Span]]) -> List[Dict[str, Any]]:
+    """
+    Chain of spans that determined root's duration, as chronological segments
+
+    Walks back from root's end, each time descending into the child that
+    finished last; time not covered by that chain is root's own time.
+    """
+    segments: List[Dict[str, Any]] = []
+    cursor = root.end
+    kids = sorted(children.get(root.span_id, []), key=lambda s: s.end, reverse=True)
+    while True:
+        pick = next((kid for kid in kids if kid.end <= cursor + 1e-6 and kid.start < cursor), None)
+        if pick is None:
+            break
+        if cursor - pick.end > 1e-6:
+            segments.append({"name": root.name, "kind": root.kind, "seconds": cursor - pick.end})
+        segments.extend(reversed(critical_path(pick, children)))
+        cursor = pick.start
+    if cursor - root.start > 1e-6:
+        segments.append({"name": root.name, "kind": root.kind, "seconds": cursor - root.start})
+    segments.reverse()
+    return segments
+
+
+def _path_summary(segments: List[Dict[str, Any]], top: int = 3) -> Dict[str, Any]:
+    by_kind = {kind: 0.0 for kind in KINDS + ('other',)}
+    by_name: Dict[str, float] = {}
+    for segment in segments:
+        by_kind[segment['kind'] or 'other'] += segment['seconds']
+        by_name[segment['name']] = by_name.get(segment['name'], 0.0) + segment['seconds']
+    heaviest = sorted(by_name.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"seconds": sum(by_kind.values()), "by_kind": by_kind,
+            "heaviest": [{"name": name, "seconds": seconds} for name, seconds in heaviest]}
+
+
+def analyze(spans: List[Span]) -> Dict[str, Any]:
+    """
+    Summarize a trace
+
+    Returns:
+        Dict with wall_time, the run's breakdown and critical path, one entry
+        per agent (duration, breakdown, critical path) and fan-out parallelism
+        (average active agents, idle agent-seconds, network concurrency)
+    """
+    if not spans:
+        return {"wall_time": 0.0, "breakdown": {}, "critical_path": _path_summary([]), "agents": [], "parallelism": {}}
+
+    children = _children_index(spans)
+    roots = [span for span in spans if span.parent_id is None]
+    root = max(roots, key=lambda s: s.duration)
+
+    agents = sorted((span for span in spans if span.attributes.get('agent') is not None),
+                    key=lambda s: s.attributes['agent'])
+    agent_reports = []
+    for agent in agents:
+        agent_reports.append({
+            "agent": agent.attributes['agent'],
+            "name": agent.name,
+            "seconds": agent.duration,
+            "breakdown": time_breakdown(agent, children),
+            "critical_path": _path_summary(critical_path(agent, children)),
+        })
+
+    parallelism: Dict[str, Any] = {}
+    if agents:
+        window_start = min(agent.start for agent in agents)
+        window_end = max(agent.end for agent in agents)
+        window = window_end - window_start
+        busy = sum(agent.duration for agent in agents)
+        parallelism = {
+            "agents": len(agents),
+            "window": window,
+            "average_active": busy / window if window > 0 else float(len(agents)),
+            "idle_agent_seconds": len(agents) * window - busy,
+            "idle_fraction": 1 - busy / (len(agents) * window) if window > 0 else 0.0,
+        }
+
+    network = [(span.start, span.end) for span in spans if span.kind == 'network']
+    if network:
+        events = sorted([(start, 1) for start, _ in network] + [(end, -1) for _, end in network])
+        active = peak = 0
+        weighted = 0.0
+        previous = events[0][0]
+        for moment, change in events:
+            weighted += active * (moment - previous)
+            active += change
+            peak = max(peak, active)
+            previous = moment
+        covered = sum(end - start for start, end in _union(network))
+        parallelism["network_concurrency_avg"] = weighted / covered if covered else 0.0
+        parallelism["network_concurrency_peak"] = peak
+
+    return {
+        "wall_time": root.duration,
+        "breakdown": time_breakdown(root, children),
+        "critical_path": _path_summary(critical_path(root, children)),
+        "agents": agent_reports,
+        "parallelism": parallelism,
+    }
+
+
+def _format_split(breakdown: Dict[str, float]) -> str:
+    return " ".join(f"{kind} {breakdown.get(kind, 0.0):.1f}s" for kind in KINDS + ('other',))
+
+
+def format_analysis(analysis: Dict[str, Any]) -> List[str]:
+    """Human-readable lines for an analyze() result"""
+    if not analysis.get('wall_time'):
+        return ["(empty trace)"]
+    lines = [f"run {analysis['wall_time']:.1f}s: {_format_split(analysis['breakdown'])}"]
+    path = analysis['critical_path']
+    heaviest = ", ".join(f"{item['name']} {item['seconds']:.1f}s" for item in path['heaviest'])
+    lines.append(f"critical path: {heaviest}")
+    for agent in analysis['agents']:
+        agent_path = agent['critical_path']
+        heaviest = ", ".join(f"{item['name']} {item['seconds']:.1f}s" for item in agent_path['heaviest'])
+        lines.append(f"{agent['name']:<9} {agent['seconds']:>6.1f}s: {_format_split(agent['breakdown'])} | path: {heaviest}")
+    parallelism = analysis['parallelism']
+    if parallelism.get('agents'):
+        lines.append(f"fan-out: {parallelism['average_active']:.1f}/{parallelism['agents']} agents active on average, "
+                     f"{parallelism['idle_agent_seconds']:.1f} idle agent-seconds ({parallelism['idle_fraction']:.0%})")
+    if 'network_concurrency_avg' in parallelism:
+        lines.append(f"network: {parallelism['network_concurrency_avg']:.1f} requests in flight on average, "
+                     f"{parallelism['network_concurrency_peak']} at peak")
+    return lines
+
+
+def load_chrome_trace(path: str) -> List[Span]:
+    """Rebuild spans from a trace written by Tracer.export"""
+    with open(path, 'r', encoding='utf-8') as f:
+        trace = json.load(f)
+    spans = []
+    for event in trace.get('traceEvents', []):
+        if event.get('ph') != 'X':
+            continue
+        args = dict(event.get('args', {}))
+        span_id = args.pop('span_id')
+        parent_id = args.pop('parent_id', None)
+        kind = args.pop('kind', None)
+        thread = args.pop('thread', None)
+        loaded = Span(event['name'], kind, span_id, parent_id, event['ts'] / 1e6, args)
+        loaded.end = loaded.start + event['dur'] / 1e6
+        loaded.thread = thread
+        spans.append(loaded)
+    return spans
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python tracing.py traces/<run>.trace.json")
+        sys.exit(1)
+    for line in format_analysis(analyze(load_chrome_trace(sys.argv[1]))):
+        print(line)
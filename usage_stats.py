@@ -0,0 +1,256 @@
+"""
+Per-run ledger of LLM calls and tool calls
+
+A UsageCollector is installed for the duration of a run with
+collect_usage(); every LLM call and tool call made inside it (including
+calls from agent tasks and worker threads started within the run, which
+inherit the context) is recorded in that collector only, so concurrent runs
+never mix their entries.
+
+Entries are tagged with the current phase ("decompose", "agent 2 iteration
+3", "synthesis"...), set with phase() / set_phase() by the orchestrator and
+the agent loop.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+_current_collector: contextvars.ContextVar = contextvars.ContextVar('usage_collector', default=None)
+_current_phase: contextvars.ContextVar = contextvars.ContextVar('usage_phase', default=None)
+
+
+def current_phase() -> Optional[str]:
+    """Phase label of the code currently running, if any"""
+    return _current_phase.get()
+
+
+def set_phase(name: Optional[str]):
+    """Label subsequent calls in this context (task or thread) with a phase"""
+    _current_phase.set(name)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Label every call made inside the block with a phase"""
+    token = _current_phase.set(name)
+    try:
+        yield
+    finally:
+        _current_phase.reset(token)
+
+
+def phase_group(name: Optional[str]) -> str:
+    """Coarse phase used for summaries ("agent 2 iteration 3" -> "agent 2")"""
+    if not name:
+        return "other"
+    return name.split(" iteration ", 1)[0]
+
+
+class UsageCollector:
+    """Thread-safe ledger for one run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.compactions: List[Dict[str, Any]] = []
+
+    def _offset(self) -> float:
+        return round(time.perf_counter() - self._started, 3)
+
+    def add(self, metrics: Dict[str, Any]):
+        """Record one LLM call (see streaming.call_metrics)"""
+        entry = {
+            "phase": current_phase(),
+            "model": metrics.get('model'),
+            "prompt_tokens": 0 if metrics.get('cache_hit') else metrics.get('prompt_tokens', 0),
+            "completion_tokens": 0 if metrics.get('cache_hit') else metrics.get('completion_tokens', 0),
+            "cached_tokens": 0 if metrics.get('cache_hit') else metrics.get('cached_tokens', 0),
+            "cache_write_tokens": 0 if metrics.get('cache_hit') else metrics.get('cache_write_tokens', 0),
+            "latency": round(metrics.get('latency', 0.0), 3),
+            "ttft": round(metrics['ttft'], 3) if metrics.get('ttft') is not None else None,
+            # Served from the local response cache: no tokens were sent or paid for
+            "cost": 0.0 if metrics.get('cache_hit') else metrics.get('cost'),
+            "response_cache_hit": bool(metrics.get('cache_hit')),
+            "upstream": metrics.get('upstream'),
+            "finished_at": self._offset(),
+        }
+        with self._lock:
+            self.llm_calls.append(entry)
+
+    def add_tool_call(self, name: str, duration: float, ok: bool):
+        """Record one tool execution"""
+        entry = {
+            "phase": current_phase(),
+            "tool": name,
+            "duration": round(duration, 3),
+            "ok": ok,
+            "finished_at": self._offset(),
+        }
+        with self._lock:
+            self.tool_calls.append(entry)
+
+    def add_compaction(self, stats: Dict[str, Any]):
+        """Record one context compaction (see context_compaction.ContextCompactor)"""
+        with self._lock:
+            self.compactions.append(dict(stats, phase=current_phase()))
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals, per-phase / per-model / per-tool breakdowns and the prompt-cache hit rate"""
+        with self._lock:
+            llm_calls = list(self.llm_calls)
+            tool_calls = list(self.tool_calls)
+            compactions = list(self.compactions)
+
+        prompt_tokens = sum(call['prompt_tokens'] for call in llm_calls)
+        cached_tokens = sum(call['cached_tokens'] for call in llm_calls)
+        costs = [call['cost'] for call in llm_calls]
+
+        phases: Dict[str, Dict[str, Any]] = {}
+        for call in llm_calls:
+            totals = phases.setdefault(phase_group(call['phase']), _empty_phase())
+            totals['llm_calls'] += 1
+            totals['llm_seconds'] += call['latency']
+            totals['prompt_tokens'] += call['prompt_tokens']
+            totals['completion_tokens'] += call['completion_tokens']
+            totals['cost'] += call['cost'] or 0.0
+        for call in tool_calls:
+            totals = phases.setdefault(phase_group(call['phase']), _empty_phase())
+            totals['tool_calls'] += 1
+            totals['tool_seconds'] += call['duration']
+
+        models: Dict[str, Dict[str, Any]] = {}
+        for call in llm_calls:
+            totals = models.setdefault(call['model'], {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                       "completion_tokens": 0, "cost": 0.0})
+            totals['calls'] += 1
+            totals['prompt_tokens'] += call['prompt_tokens']
+            totals['cached_tokens'] += call['cached_tokens']
+            totals['completion_tokens'] += call['completion_tokens']
+            totals['cost'] += call['cost'] or 0.0
+
+        tools: Dict[str, Dict[str, Any]] = {}
+        for call in tool_calls:
+            totals = tools.setdefault(call['tool'], {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0})
+            totals['calls'] += 1
+            totals['errors'] += 0 if call['ok'] else 1
+            totals['seconds'] += call['duration']
+            totals['max_seconds'] = max(totals['max_seconds'], call['duration'])
+
+        return {
+            "wall_time": round(time.perf_counter() - self._started, 3),
+            "calls": len(llm_calls),
+            "response_cache_hits": sum(1 for call in llm_calls if call['response_cache_hit']),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_write_tokens": sum(call['cache_write_tokens'] for call in llm_calls),
+            "completion_tokens": sum(call['completion_tokens'] for call in llm_calls),
+            "prompt_cache_hit_rate": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+            # None when a model has no entry in the price table
+            "cost": sum(costs) if all(cost is not None for cost in costs) else None,
+            "tool_calls": len(tool_calls),
+            "compactions": len(compactions),
+            "compaction_tokens_saved": sum(stats.get('tokens_saved', 0) for stats in compactions),
+            "phases": {name: _round_totals(totals) for name, totals in phases.items()},
+            "models": {name: _round_totals(totals) for name, totals in models.items()},
+            "tools": {name: _round_totals(totals) for name, totals in tools.items()},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Full ledger: summary plus every recorded entry"""
+        summary = self.summary()
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "summary": summary,
+                "llm_calls": list(self.llm_calls),
+                "tool_calls": list(self.tool_calls),
+                "compactions": list(self.compactions),
+            }
+
+
+def _empty_phase() -> Dict[str, Any]:
+    return {"llm_calls": 0, "llm_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+            "cost": 0.0, "tool_calls": 0, "tool_seconds": 0.0}
+
+
+def _round_totals(totals: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: round(value, 6) if isinstance(value, float) else value for key, value in totals.items()}
+
+
+def current_collector() -> Optional[UsageCollector]:
+    """The collector of the run this code is executing in, if any"""
+    return _current_collector.get()
+
+
+def record_usage(metrics: Dict[str, Any]):
+    """Add a call's metrics to the current run's collector (no-op outside a run)"""
+    collector = _current_collector.get()
+    if collector is not None:
+        collector.add(metrics)
+
+
+def record_tool_call(name: str, duration: float, ok: bool = True):
+    """Add a tool execution to the current run's collector (no-op outside a run)"""
+    collector = _current_collector.get()
+    if collector is not None:
+        collector.add_tool_call(name, duration, ok)
+
+
+@contextmanager
+def timed_tool_call(name: str) -> Iterator[None]:
+    """Record the duration of the tool execution inside the block (failed if it raises)"""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record_tool_call(name, time.perf_counter() - started, ok)
+
+
+def record_compaction(stats: Dict[str, Any]):
+    """Add a context compaction to the current run's collector (no-op outside a run)"""
+    collector = _current_collector.get()
+    if collector is not None:
+        collector.add_compaction(stats)
+
+
+@contextmanager
+def collect_usage() -> Iterator[UsageCollector]:
+    """Collect usage of every LLM call made inside the block"""
+    collector = UsageCollector()
+    token = _current_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _current_collector.reset(token)
+
+
+def format_usage(summary: Dict[str, Any]) -> str:
+    """One-line human summary of a run's token usage"""
+    line = (f"{summary['calls']} LLM calls • {summary['prompt_tokens']:,} input tokens "
+            f"({summary['cached_tokens']:,} cached, {summary['prompt_cache_hit_rate']:.0%}) • "
+            f"{summary['completion_tokens']:,} output tokens")
+    if summary['cost'] is not None:
+        line += f" • ~${summary['cost']:.4f}"
+    if summary['compactions']:
+        line += f" • {summary['compactions']} compactions (~{summary['compaction_tokens_saved']:,} tokens trimmed)"
+    if summary['response_cache_hits']:
+        line += f" • {summary['response_cache_hits']} served from response cache"
+    return line
+
+
+def format_phases(summary: Dict[str, Any]) -> List[str]:
+    """Per-phase breakdown lines (calls, time in LLM and tools, tokens, cost)"""
+    lines = []
+    for name, totals in summary['phases'].items():
+        lines.append(f"{name:<12} {totals['llm_calls']:>3} calls {totals['llm_seconds']:>7.1f}s LLM "
+                     f"{totals['tool_calls']:>3} tools {totals['tool_seconds']:>7.1f}s "
+                     f"{totals['prompt_tokens']:>9,} in {totals['completion_tokens']:>8,} out ${totals['cost']:.4f}")
+    return lines
\ No newline at end of file